@@ -0,0 +1,32 @@
+"""detect_table_files 在不同大小的 CSV / XLSX 上的耗时"""
+from dumbydraw.prompt import detect_table_files
+
+from .datasets import synthetic_csv, synthetic_xlsx
+from .harness import format_size
+
+# 更大的 xlsx 生成一次就要几分钟，且 Excel 本身有行数上限
+XLSX_MAX_SIZE = 64 * 1024 ** 2
+
+
+def _quiet_detect(path):
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        return detect_table_files([path])
+
+
+def bench_detect_csv(b):
+    for size in b.sizes:
+        path = synthetic_csv(b.data_dir, size)
+        repeat = 5 if size <= 64 * 1024 ** 2 else 2
+        info = _quiet_detect(path)[path]
+        b.measure(f"detect_table_files[csv {format_size(size)}]", lambda: _quiet_detect(path), repeat=repeat,
+                  large=bool(info.get("large")))
+
+
+def bench_detect_xlsx(b):
+    for size in b.sizes:
+        if size > XLSX_MAX_SIZE:
+            continue
+        path = synthetic_xlsx(b.data_dir, size)
+        b.measure(f"detect_table_files[xlsx {format_size(size)}]", lambda: _quiet_detect(path), repeat=3)
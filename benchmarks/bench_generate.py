@@ -0,0 +1,44 @@
+"""用本地 mock-llm 测 generate() 的端到端延迟和取消延迟（不联网）"""
+import time
+import threading
+
+from dumbydraw.engine import get_engine
+from dumbydraw.generator import generate
+from dumbydraw.mockllm import MockLLMServer
+
+
+def _start(server):
+    host, port = get_engine().submit(server.start("127.0.0.1", 0)).result()
+    return f"http://{host}:{port}/v1"
+
+
+def _generate(base_url, on_line=None):
+    return get_engine().submit(generate(base_url, "mock-model", "mock", "plot a sine wave", "system",
+                                        echo=on_line is not None, on_line=on_line))
+
+
+def bench_generate_mock(b):
+    repeat = 3 if b.quick else 10
+    server = MockLLMServer(ttft=0.0, tps=0)
+    base_url = _start(server)
+    try:
+        b.measure("generate() overhead[mock, instant]", lambda: _generate(base_url).result(), repeat=repeat)
+
+        server.ttft, server.tps = 0.2, 200.0
+        b.measure("generate() end-to-end[ttft 0.2s, 200 tok/s]", lambda: _generate(base_url).result(),
+                  repeat=repeat)
+
+        def cancel_once() -> float:
+            first = threading.Event()
+            job = _generate(base_url, on_line=lambda line: first.set())
+            first.wait(10)
+            t0 = time.perf_counter()
+            job.cancel()
+            while not job.done():
+                time.sleep(0.0005)
+            return time.perf_counter() - t0
+
+        server.ttft, server.tps = 0.0, 20.0
+        b.record("generate() cancel latency[streaming]", [cancel_once() for _ in range(repeat)])
+    finally:
+        get_engine().submit(server.stop()).result()
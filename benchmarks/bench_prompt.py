@@ -0,0 +1,33 @@
+"""系统提示词构建的耗时和大小"""
+import io
+import os
+import shutil
+import contextlib
+
+from dumbydraw.prompt import build_system_prompt, detect_table_files, format_file_info, get_sys_info
+
+from .datasets import synthetic_csv
+
+
+def _build(files):
+    with contextlib.redirect_stdout(io.StringIO()):
+        prompt = build_system_prompt(get_sys_info())
+        prompt += format_file_info(detect_table_files(files))
+    return prompt
+
+
+def bench_prompt_construction(b):
+    source = synthetic_csv(b.data_dir, 256 * 1024)
+    copies = os.path.join(b.data_dir, "prompt_tables")
+    os.makedirs(copies, exist_ok=True)
+    paths = []
+    for i in range(50):
+        path = os.path.join(copies, f"table_{i}.csv")
+        if not os.path.exists(path):
+            shutil.copyfile(source, path)
+        paths.append(path)
+    for n_files in (1, 10, 50):
+        files = paths[:n_files]
+        prompt = _build(files)
+        b.measure(f"prompt construction[{n_files} tables]", lambda: _build(files), repeat=5,
+                  prompt_chars=len(prompt), prompt_bytes=len(prompt.encode("utf-8")))
@@ -0,0 +1,53 @@
+"""CodeRunner 从提交到第一行输出的延迟"""
+import sys
+import time
+import queue
+import importlib.util
+
+from dumbydraw.engine import get_engine, run_process
+from dumbydraw.runner import CodeRunner
+
+READY = "dumbydraw-bench-ready"
+
+
+def _first_output_latency(figure_queue=None, code=f"print({READY!r})", timeout=60.0) -> float:
+    log_queue = queue.Queue()
+    runner = CodeRunner(log_queue, figure_queue)
+    t0 = time.perf_counter()
+    runner.run_code_in_background(code)
+    deadline = t0 + timeout
+    while time.perf_counter() < deadline:
+        try:
+            line = log_queue.get(timeout=0.001)
+        except queue.Empty:
+            continue
+        if READY in line:
+            latency = time.perf_counter() - t0
+            while runner.running:
+                time.sleep(0.005)
+            return latency
+    runner.stop_execution()
+    raise TimeoutError("no output from CodeRunner")
+
+
+def _raw_spawn_latency() -> float:
+    """不经过 bootstrap 的裸解释器启动，作为基线"""
+    first = {}
+    t0 = time.perf_counter()
+
+    def on_line(line):
+        first.setdefault("t", time.perf_counter())
+
+    get_engine().submit(run_process([sys.executable, "-c", f"print({READY!r})"], on_line, lambda line: None)).result()
+    return first["t"] - t0
+
+
+def bench_spawn_latency(b):
+    repeat = 3 if b.quick else 10
+    b.record("spawn[python -c baseline]", [_raw_spawn_latency() for _ in range(repeat)])
+    b.record("CodeRunner spawn-to-first-output", [_first_output_latency() for _ in range(repeat)])
+    if importlib.util.find_spec("matplotlib") is None:
+        return
+    code = f"import matplotlib.pyplot as plt\nprint({READY!r})"
+    b.record("CodeRunner spawn-to-first-output[capture+pyplot]",
+             [_first_output_latency(queue.Queue(), code) for _ in range(repeat)])
@@ -0,0 +1,30 @@
+"""EmittingStream（stdout 重定向到日志队列）的吞吐量"""
+import queue
+
+from dumbydraw.runner import EmittingStream
+
+
+def _print_like(lines):
+    stream = EmittingStream(queue.Queue())
+    for line in lines:
+        stream.write(line)
+        stream.write("\n")
+    stream.flush()
+
+
+def _block_write(text):
+    stream = EmittingStream(queue.Queue())
+    stream.write(text)
+    stream.flush()
+
+
+def bench_emitting_stream(b):
+    n = 20_000 if b.quick else 100_000
+    lines = [f"line {i}: loss=0.{i % 997:03d} acc=0.{i % 991:03d}" for i in range(n)]
+    result = b.measure(f"EmittingStream.write[{n} print() lines]", lambda: _print_like(lines), repeat=5)
+    result["lines_per_s"] = round(n / result["median"])
+
+    block_lines = 10_000
+    text = "\n".join(lines[:block_lines]) + "\n"
+    result = b.measure(f"EmittingStream.write[one {block_lines}-line block]", lambda: _block_write(text), repeat=5)
+    result["lines_per_s"] = round(block_lines / result["median"])
@@ -0,0 +1,47 @@
+"""基准测试用的合成数据，生成一次后缓存在 data_dir 里"""
+import os
+
+import numpy as np
+
+from .harness import format_size
+
+
+def synthetic_csv(data_dir: str, size: int, columns: int = 8) -> str:
+    """生成大约 size 字节的 CSV（数值列 + 一个分类列）"""
+    path = os.path.join(data_dir, f"synthetic_{format_size(size)}.csv")
+    if os.path.exists(path) and os.path.getsize(path) >= size * 0.9:
+        return path
+
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    header = ",".join(["group"] + [f"value_{i}" for i in range(columns - 1)]) + "\n"
+    # 格式化一块 5 万行，之后重复写入，几 GB 的文件也能很快生成
+    block_rows = 50_000
+    values = rng.standard_normal((block_rows, columns - 1))
+    groups = rng.choice(["a", "b", "c", "d"], block_rows)
+    block = "\n".join(g + "," + ",".join(f"{v:.6f}" for v in row) for g, row in zip(groups, values)) + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(header)
+        written = len(header)
+        while written < size:
+            text = block
+            if written + len(text) > size:
+                text = text[:size - written]
+                text = text[:text.rfind("\n") + 1]
+                if not text:
+                    break
+            f.write(text)
+            written += len(text)
+    return path
+
+
+def synthetic_xlsx(data_dir: str, size: int, columns: int = 8) -> str:
+    """把同样大小的 CSV 转成 xlsx（xlsx 压缩后会明显更小，文件名仍以源 CSV 大小标记）"""
+    import pandas as pd
+
+    path = os.path.join(data_dir, f"synthetic_{format_size(size)}.xlsx")
+    if os.path.exists(path):
+        return path
+    df = pd.read_csv(synthetic_csv(data_dir, size, columns))
+    df.to_excel(path, index=False, engine="openpyxl")
+    return path
@@ -0,0 +1,98 @@
+"""
+极简基准测试框架（不依赖 pytest-benchmark / asv）。
+
+每个 bench_*.py 模块里的 bench_* 函数接收一个 Bench 对象：
+
+    def bench_something(b):
+        for size in b.sizes:
+            b.measure(f"something[{size}]", lambda: work(size), repeat=5)
+
+结果由 run.py 汇总，追加到 JSON 历史文件里。
+"""
+import gc
+import time
+import statistics
+
+from typing import Callable, Dict, List, Optional
+
+
+class Bench:
+    def __init__(self, sizes: List[int], data_dir: str, quick: bool = False):
+        self.sizes = sizes
+        self.data_dir = data_dir
+        self.quick = quick
+        self.results: List[dict] = []
+
+    def measure(self, name: str, fn: Callable[[], object], repeat: int = 5, number: int = 1,
+                setup: Optional[Callable[[], object]] = None, unit: str = "s", **extra) -> dict:
+        """
+        运行 fn number 次为一轮，共 repeat 轮，记录每轮平均耗时。
+        extra 里的数值（例如 prompt 字符数）原样写进结果
+        """
+        if self.quick:
+            repeat = min(repeat, 2)
+        timings = []
+        for _ in range(repeat):
+            if setup:
+                setup()
+            gc.collect()
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            timings.append((time.perf_counter() - t0) / number)
+        return self.record(name, timings, unit=unit, **extra)
+
+    def record(self, name: str, timings: List[float], unit: str = "s", **extra) -> dict:
+        """记录外部测得的耗时（例如子进程首行输出延迟）"""
+        result = {
+            "name": name,
+            "unit": unit,
+            "repeat": len(timings),
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.mean(timings),
+            "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        }
+        result.update(extra)
+        self.results.append(result)
+        print(f"  {name:<48} median {format_seconds(result['median']):>10}   min {format_seconds(result['min']):>10}"
+              + "".join(f"   {k}={v}" for k, v in extra.items()), flush=True)
+        return result
+
+
+def format_seconds(value: float) -> str:
+    if value < 1e-3:
+        return f"{value * 1e6:.1f}us"
+    if value < 1:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value:.3f}s"
+
+
+def parse_size(text: str) -> int:
+    """'1MB' / '2GB' / '512KB' -> 字节数"""
+    text = text.strip().upper()
+    for suffix, factor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for suffix, factor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if size >= factor:
+            return f"{size / factor:g}{suffix}"
+    return f"{size}B"
+
+
+def compare(current: Dict[str, dict], previous: Dict[str, dict], threshold: float = 0.10) -> List[str]:
+    """和上一次结果比较，返回变慢超过 threshold 的条目说明"""
+    regressions = []
+    for name, result in current.items():
+        old = previous.get(name)
+        if not old or not old.get("median"):
+            continue
+        change = result["median"] / old["median"] - 1
+        if change > threshold:
+            regressions.append(f"{name}: {format_seconds(old['median'])} -> {format_seconds(result['median'])} "
+                               f"(+{change * 100:.0f}%)")
+    return regressions
@@ -0,0 +1,115 @@
+"""
+DumbyDraw 自身热点路径的基准测试。
+
+    python -m benchmarks.run                  # 默认 1MB / 16MB
+    python -m benchmarks.run --full           # 1MB / 16MB / 256MB / 2GB
+    python -m benchmarks.run --only detect --sizes 1MB,64MB
+
+每次结果追加到 benchmarks/results/history.jsonl，并和上一次比较，
+中位数变慢超过 --threshold 的条目会列出来（--fail-on-regression 时返回非 0）。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from .harness import Bench, compare, parse_size  # noqa: E402
+
+MODULES = ["bench_detect", "bench_stream", "bench_runner", "bench_prompt", "bench_generate"]
+DEFAULT_SIZES = "1MB,16MB"
+FULL_SIZES = "1MB,16MB,256MB,2GB"
+DEFAULT_HISTORY = os.path.join(ROOT, "benchmarks", "results", "history.jsonl")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def package_version() -> str:
+    with open(os.path.join(ROOT, "pyproject.toml"), encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("version"):
+                return line.split("=", 1)[1].strip().strip('"')
+    return ""
+
+
+def load_previous(history: str) -> dict:
+    if not os.path.exists(history):
+        return {}
+    last = None
+    with open(history, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    if not last:
+        return {}
+    return {r["name"]: r for r in last["results"]}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--sizes", default=None, help=f"data sizes, default {DEFAULT_SIZES}")
+    parser.add_argument("--full", action="store_true", help=f"use {FULL_SIZES}")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats")
+    parser.add_argument("--only", default=None, help="run benchmarks whose name contains this text")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dumbydraw_bench_data"))
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--no-history", action="store_true", help="do not append to the history file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in (args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)).split(",")]
+    bench = Bench(sizes, args.data_dir, quick=args.quick)
+
+    for module_name in MODULES:
+        module = importlib.import_module(f"benchmarks.{module_name}")
+        for name in sorted(n for n in dir(module) if n.startswith("bench_")):
+            if args.only and args.only not in name and args.only not in module_name:
+                continue
+            print(f"▶ {module_name}.{name}", flush=True)
+            try:
+                getattr(module, name)(bench)
+            except ImportError as e:
+                print(f"  skipped: {e}")
+
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "version": package_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.node(),
+        "cpus": os.cpu_count(),
+        "results": bench.results,
+    }
+
+    regressions = compare({r["name"]: r for r in bench.results}, load_previous(args.history), args.threshold)
+    if regressions:
+        print("\n⚠️ slower than the previous run:")
+        for line in regressions:
+            print(f"  {line}")
+
+    if not args.no_history:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"\n📊 results appended to {args.history}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
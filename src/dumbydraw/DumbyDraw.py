@@ -1,82 +1,58 @@
 import sys
 import os
-import json
 import queue
-import tempfile
+import sqlite3
+import asyncio
+import shutil
 import subprocess
-import threading
-import requests
-import zipfile
 import time
 import atexit
 from pathlib import Path
-import pandas as pd
 import platform
 
 from typing import Tuple, List
 
 from PySide6.QtWidgets import (QApplication, QMainWindow, QMessageBox,
-                               QFileDialog, QListWidgetItem, QListWidget,
+                               QFileDialog,
                                QSizePolicy, QProgressDialog, QVBoxLayout,
                                QLabel, QDialog, QDialogButtonBox, QHBoxLayout,
-                               QPlainTextEdit, QPushButton, QCheckBox)
-from PySide6.QtCore import QThread, QObject, QTimer, Signal, Qt, QUrl
-from PySide6.QtGui import QDesktopServices
+                               QPlainTextEdit, QPushButton, QCheckBox, QTabBar)
+from PySide6.QtCore import QObject, QTimer, Signal, Qt, QUrl
+from PySide6.QtGui import QDesktopServices, QAction, QKeySequence
 
 # 根据你的导入方式选择
 # from deepseek import DeepSeek
 # from GUI import Ui_MainWindow
-from .deepseek import DeepSeek
+from .config import load_config, save_config as store_config, data_path, default_baseurl
+from .download import download_file, format_bytes, DownloadError, DownloadCanceled
+from .engine import get_engine
+from .generator import AnalyseWorker, RemoteAnalyseWorker, probe_providers
+from .prompt import (get_sys_info, build_system_prompt, detect_table_files, describe_inputs,
+                     build_edit_query, build_optimize_query, CONNECTION_TEST_PROMPT)
+from .runner import CodeRunner, ResourceLimits, EmittingStream, KernelSession
+from .scheduler import JobScheduler, RunJob, default_parallelism
+from .jobsview import JobTab, JobsPanel
+from .cache import ResultCache, DEFAULT_MAX_MB
+from .deps import DependencyResolver
+from .budget import TokenBudget
+from .providers import Router
+from .validate import validate_code
+from .gallery import FigureGallery
+from .workspace import get_workspace, DEFAULT_MAX_MB as DEFAULT_WORKSPACE_MB
+from .filesview import FileListModel, FileListView, FileExpander
+from .history import get_history
+from .historyview import HistoryDialog
+from .retrieval import find_examples, DEFAULT_EXAMPLES
+from .startup import mark, profiling, warm_up
 from .GUI import Ui_MainWindow
 
 
-# =========================================
-# 系统信息获取
-#==========================================
-def get_sys_info():
-    venv_path = sys.prefix
-    # print(f"当前虚拟环境路径: {venv_path}")
-    executable = sys.executable
-    # print(f"Python解释器地址: {executable}")
-    os_info = sys.platform
-    # print(f"操作系统是{os_info}")
-    conda_env_path = os.environ.get('CONDA_PREFIX', None)
-    if conda_env_path:
-        conda_env_path = f"CONDA_PREFIX是{conda_env_path}"
-      
-    info = (f"\n用户当前平台信息：\n\n当前虚拟环境路径: {venv_path}\n Python解释器地址: {executable}\n 操作系统是{os_info}\n{conda_env_path}")
-    print(info)
-    return info
-
-
-# =====================================================
-# stdout / stderr 行缓冲重定向
-# =====================================================
-class EmittingStream:
-    def __init__(self, log_queue: queue.Queue):
-        self.log_queue = log_queue
-        self._buffer = ""
-
-    def write(self, text):
-        if not text:
-            return
-
-        self._buffer += text
-
-        while "\n" in self._buffer:
-            line, self._buffer = self._buffer.split("\n", 1)
-            if line.strip():
-                self.log_queue.put(line)
-
-    def flush(self):
-        if self._buffer.strip():
-            self.log_queue.put(self._buffer)
-        self._buffer = ""
-
-
 # =====================================================
 # 升级 Worker（负责在后台下载和解压）
 # =====================================================
+# 下载的升级包放在 ~/.dumbydraw/upgrade，没下载完的部分下次续传
+UPGRADE_DIR = "upgrade"
+
 class UpgradeWorker(QObject):
     """后台升级工作者 - 只负责下载和解压"""
     progress_signal = Signal(str)  # 进度更新信号
@@ -92,54 +68,51 @@ class UpgradeWorker(QObject):
         self._stop_flag = True
         self.progress_signal.emit("🛑 Stopping upgrade...")
 
-    def run(self):
-        """执行升级任务 - 只下载和解压"""
+    async def run(self):
+        """执行升级任务 - 只下载和解压（在 engine 事件循环里运行）"""
+        import zipfile
+
         temp_dir = None
+        loop = asyncio.get_event_loop()
         try:
-            # GitHub 上 DumbyDraw 的源码 zip 包 URL
-            url = 'https://github.com/Masterchiefm/DumbyDraw/archive/refs/heads/main.zip'
+            # GitHub 上 DumbyDraw 的源码 zip 包 URL（可以用 DUMBYDRAW_UPGRADE_URL 指向本地服务测试）
+            url = os.environ.get("DUMBYDRAW_UPGRADE_URL",
+                                 'https://github.com/Masterchiefm/DumbyDraw/archive/refs/heads/main.zip')
 
             self.progress_signal.emit("🔗 Connecting to GitHub...")
             if self._stop_flag:
                 self.finished_signal.emit(False, "Upgrade canceled", "")
                 return
 
-            # 下载源代码压缩包
+            # 下载源代码压缩包：没变化时用上次下载的，断开后续传
             self.progress_signal.emit("📥 Downloading update package...")
-            response = requests.get(url, stream=True, timeout=30)
-            if response.status_code != 200:
-                self.finished_signal.emit(False, f"Download failed, status code: {response.status_code}", "")
-                return
-
-            # 获取总大小
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-
-            # 创建临时目录存储下载的压缩包
-            temp_dir = tempfile.mkdtemp(prefix="dumbydraw_upgrade_")
-            zip_file_path = os.path.join(temp_dir, 'DumbyDraw.zip')
-
-            with open(zip_file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if self._stop_flag:
-                        self.finished_signal.emit(False, "Upgrade canceled", "")
-                        return
-
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            self.progress_signal.emit(f"📥 Downloading: {percent:.1f}%")
+            result = await download_file(url, data_path(UPGRADE_DIR), "DumbyDraw.zip",
+                                         on_progress=self.progress_signal.emit,
+                                         should_stop=lambda: self._stop_flag)
+            if not result.changed:
+                self.progress_signal.emit("✅ Update package unchanged since the last download, reusing it")
+            elif result.resumed_from:
+                self.progress_signal.emit(f"✅ Resumed download from {format_bytes(result.resumed_from)}, "
+                                          f"sha256 {result.sha256[:12]}...")
+            else:
+                self.progress_signal.emit(f"✅ Downloaded {format_bytes(result.size)} in {result.seconds:.1f}s, "
+                                          f"sha256 {result.sha256[:12]}...")
 
             if self._stop_flag:
                 self.finished_signal.emit(False, "Upgrade canceled", "")
                 return
 
             self.progress_signal.emit("📦 Extracting files...")
+            # 固定解压到 ~/.dumbydraw/upgrade/extracted，每次先清掉上次的，不在临时目录里越积越多
+            # （升级脚本可能在程序退出后才运行，所以不放进退出时会删除的会话工作目录）
+            temp_dir = data_path(UPGRADE_DIR, "extracted")
 
-            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
+            def extract():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                with zipfile.ZipFile(result.path, 'r') as zip_ref:
+                    zip_ref.extractall(temp_dir)
+
+            await loop.run_in_executor(None, extract)
 
             self.progress_signal.emit("✅ Download and extraction complete")
 
@@ -147,17 +120,18 @@ class UpgradeWorker(QObject):
             extracted_dir = os.path.join(temp_dir, 'DumbyDraw-main')
             self.finished_signal.emit(True, "✅ Download and extraction complete", extracted_dir)
 
-        except requests.RequestException as e:
-            self.finished_signal.emit(False, f"❌ Network error: {e}", "")
+        except asyncio.CancelledError:
+            self.finished_signal.emit(False, "Upgrade canceled", "")
+            raise
+        except DownloadCanceled:
+            self.finished_signal.emit(False, "Upgrade canceled (the partial download is kept for next time)", "")
+        except DownloadError as e:
+            self.finished_signal.emit(False, f"❌ {e}", "")
         except Exception as e:
             self.finished_signal.emit(False, f"❌ Error during upgrade: {e}", "")
-            # 清理临时目录
+            # 清理解压了一半的目录
             if temp_dir and os.path.exists(temp_dir):
-                import shutil
-                try:
-                    shutil.rmtree(temp_dir)
-                except:
-                    pass
+                shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 # =====================================================
@@ -222,7 +196,7 @@ class UpgradeDialog(QDialog):
         self.setLayout(layout)
 
         self.upgrade_worker = None
-        self.upgrade_thread = None
+        self.upgrade_job = None
         self.upgrade_canceled = False
         self.extracted_dir = ""
         self.script_path = ""
@@ -230,17 +204,14 @@ class UpgradeDialog(QDialog):
 
     def start_upgrade(self):
         """开始升级过程"""
-        self.upgrade_thread = QThread()
         self.upgrade_worker = UpgradeWorker()
-        self.upgrade_worker.moveToThread(self.upgrade_thread)
 
-        # 连接信号
+        # 连接信号（worker 在主线程创建，跨线程 emit 时自动排队）
         self.upgrade_worker.progress_signal.connect(self.update_progress)
         self.upgrade_worker.finished_signal.connect(self.upgrade_finished)
-        self.upgrade_thread.started.connect(self.upgrade_worker.run)
 
-        # 启动线程
-        self.upgrade_thread.start()
+        # 提交到 engine 的事件循环
+        self.upgrade_job = get_engine().submit(self.upgrade_worker.run(), limit="net", name="upgrade")
 
     def update_progress(self, message):
         """更新进度显示"""
@@ -321,10 +292,7 @@ After installation, restart DumbyDraw to use the new version.
         self.cancel_button.hide()
         self.close_button.show()
 
-        # 清理线程
-        if self.upgrade_thread:
-            self.upgrade_thread.quit()
-            self.upgrade_thread.wait()
+        self.upgrade_job = None
 
     def create_windows_upgrade_script(self, extracted_dir, python_path):
         """创建Windows升级脚本（使用当前Python环境）"""
@@ -462,6 +430,8 @@ read -r
         self.upgrade_canceled = True
         if self.upgrade_worker:
             self.upgrade_worker.stop()
+        if self.upgrade_job:
+            self.upgrade_job.cancel()
         self.reject()
 
     def closeEvent(self, event):
@@ -491,206 +461,6 @@ read -r
             print(f"Error running upgrade script: {e}")
 
 
-# =====================================================
-# 后台 Worker（负责生成代码）
-# =====================================================
-class AnalyseWorker(QObject):
-    def __init__(self, baseurl, model, api_key, user_query, system_prompt, result_queue):
-        super().__init__()
-        self.baseurl = baseurl
-        self.model = model
-        self.api_key = api_key
-        self.user_query = user_query
-        self.system_prompt = system_prompt
-        self.result_queue = result_queue
-        self._stop_flag = False
-        self.client = None
-
-    def stop(self):
-        """停止AI生成"""
-        self._stop_flag = True
-        print("🛑 正在停止AI生成...")
-
-    def run(self):
-        try:
-            print("🚀 开始调用 AI 接口")
-
-            if self._stop_flag:
-                print("⏹️ AI生成已被停止")
-                return
-
-            self.client = DeepSeek(
-                base_url=self.baseurl,
-                model=self.model,
-                API_key=self.api_key
-            )
-            print(f"model={self.model}")
-            if self._stop_flag:
-                print("⏹️ AI生成已被停止")
-                return
-
-            code = self.client.get_response(
-                query=self.user_query,
-                prompt=self.system_prompt,
-                return_type="string",
-                model=self.model
-            )
-
-            if self._stop_flag:
-                print("⏹️ AI生成已被停止")
-                return
-
-            print("✅ AI 返回完成，开始清理代码")
-
-            code = code.strip()
-            if code.startswith("```python"):
-                code = code[9:]
-            elif code.startswith("```"):
-                code = code[3:]
-            if code.endswith("```"):
-                code = code[:-3]
-
-            if not self._stop_flag:
-                self.result_queue.put(code)
-                print("📦 代码已发送回主线程")
-
-        except Exception as e:
-            if not self._stop_flag:
-                print(f"❌ 后台异常: {e}")
-
-
-# =====================================================
-# 代码执行 Worker（在后台进程中执行代码）
-# =====================================================
-class CodeRunner:
-    def __init__(self, log_queue: queue.Queue):
-        self.log_queue = log_queue
-        self.process = None
-        self.running = False
-        self._stop_flag = False
-
-    def run_code_in_background(self, code: str):
-        """在后台进程中执行代码"""
-        if self.running:
-            return
-
-        self.running = True
-        self._stop_flag = False
-        thread = threading.Thread(target=self._execute_code, args=(code,))
-        thread.daemon = True
-        thread.start()
-
-    def _execute_code(self, code: str):
-        """实际执行代码的方法"""
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
-                f.write(code)
-                temp_file_path = f.name
-
-            self.log_queue.put(f"📝 临时文件已创建: {temp_file_path}")
-
-            python_exe = sys.executable
-            self.log_queue.put(f"🐍 使用Python解释器: {python_exe}")
-
-            if self._stop_flag:
-                self.log_queue.put("⏹️ 代码执行已被取消")
-                self._cleanup_temp_file(temp_file_path)
-                return
-
-            self.log_queue.put(f"⏹️ 代码正在后台运行...")
-            self.process = subprocess.Popen(
-                [python_exe, temp_file_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8'
-            )
-
-            while True:
-                if self._stop_flag:
-                    self.log_queue.put("⏹️ 正在停止代码执行...")
-                    self.process.terminate()
-                    break
-
-                stdout_line = self.process.stdout.readline()
-                if stdout_line:
-                    self.log_queue.put(stdout_line.rstrip('\n'))
-
-                stderr_line = self.process.stderr.readline()
-                if stderr_line:
-                    e = stderr_line.rstrip('\n')
-                    self.log_queue.put(f"❌ {e}")
-
-                if self.process.poll() is not None:
-                    for line in self.process.stdout.readlines():
-                        if line.strip():
-                            self.log_queue.put(line.rstrip('\n'))
-                    for line in self.process.stderr.readlines():
-                        if line.strip():
-                            e = line.rstrip('\n')
-                            self.log_queue.put(f"❌ {e}")
-                    break
-
-            if not self._stop_flag:
-                return_code = self.process.wait()
-                if return_code == 0:
-                    self.log_queue.put("✅ 代码执行完成")
-                else:
-                    self.log_queue.put(f"❌ 代码执行失败，返回码: {return_code}")
-
-        except Exception as e:
-            self.log_queue.put(f"❌ 执行代码时发生错误: {e}")
-        finally:
-            self.running = False
-            self.process = None
-
-    def _cleanup_temp_file(self, temp_file_path: str):
-        """清理临时文件"""
-        try:
-            os.unlink(temp_file_path)
-            self.log_queue.put(f"🗑️ 临时文件已删除: {temp_file_path}")
-        except Exception as e:
-            self.log_queue.put(f"⚠️ 无法删除临时文件: {e}")
-
-    def stop_execution(self):
-        """停止正在执行的代码"""
-        if self.running:
-            self._stop_flag = True
-            if self.process and self.process.poll() is None:
-                self.process.terminate()
-                self.log_queue.put("⏹️ 代码执行已停止")
-
-
-class FileDropListWidget(QListWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAcceptDrops(True)
-        self.setDragEnabled(False)
-        self.setDropIndicatorShown(True)
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-    def dragMoveEvent(self, event):
-        event.acceptProposedAction()
-
-    def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            path = url.toLocalFile()
-            if path and not self._is_in_list(path):
-                self.addItem(QListWidgetItem(path))
-        event.acceptProposedAction()
-
-    def _is_in_list(self, path: str) -> bool:
-        for i in range(self.count()):
-            if self.item(i).text() == path:
-                return True
-        return False
-
-
 # =====================================================
 # 主窗口
 # =====================================================
@@ -706,44 +476,109 @@ class MainWindow(QMainWindow):
         # ===== 队列 =====
         self.log_queue = queue.Queue()
         self.result_queue = queue.Queue()
+        self.figure_queue = queue.Queue()
+        self.profile_queue = queue.Queue()
+        self.done_queue = queue.Queue()
 
         # stdout / stderr 重定向
         sys.stdout = EmittingStream(self.log_queue)
         sys.stderr = EmittingStream(self.log_queue)
 
-        # ===== 代码执行器 =====
-        self.code_runner = CodeRunner(self.log_queue)
+        # ===== 代码执行：任务排队、并行运行，每个任务一个 CodeRunner =====
+        # 增量运行的任务共用一个常驻 kernel（调度器保证同一时间只有一个任务在用）
+        self.kernel = KernelSession()
+        self.scheduler = JobScheduler(self.make_runner, self.max_parallel_runs or
+                                      default_parallelism(self.resource_limits.memory_mb),
+                                      on_change=self.job_changed)
+        self.job_tabs = {}
+        # 主日志和 Figures 页同步显示最近提交的任务
+        self.foreground_job_id = None
+        self.jobs_changed = True
+
+        # ===== 历史记录 =====
+        self.history = get_history()
+        # 正在进行的生成任务的信息（类型、原始需求），代码返回时写入历史
+        self.history_context = None
+        # 当前编辑器里的代码对应的历史记录，修改 / 重新运行时作为 parent
+        self.current_entry_id = None
+        self.history_dialog = None
 
         # ===== AI生成相关 =====
         self.ai_worker = None
-        self.ai_thread = None
+        self.ai_job = None
+        # 状态栏显示的 AI 请求性能数据（telemetry.LLMMetrics），结束后显示一次最终结果
+        self.llm_metrics = None
+        self.llm_metrics_done = None
 
         # ===== 升级相关 =====
         self.upgrade_dialog = None
 
+        # ===== 后台预热 =====
+        self.warm_up_job = None
+
         # ===== 定时器 =====
         self.log_timer = QTimer(self)
         self.log_timer.timeout.connect(self.update_log)
+        self.log_timer.timeout.connect(self.update_figures)
+        self.log_timer.timeout.connect(self.check_profile)
+        self.log_timer.timeout.connect(self.check_runs)
+        self.log_timer.timeout.connect(self.update_jobs)
+        self.log_timer.timeout.connect(self.update_llm_status)
         self.log_timer.start(100)
+        # 任务列表里的排队 / 运行时间每秒刷新一次
+        self.jobs_timer = QTimer(self)
+        self.jobs_timer.timeout.connect(self.job_changed)
+        self.jobs_timer.start(1000)
 
         self.result_timer = QTimer(self)
         self.result_timer.timeout.connect(self.check_result)
         self.result_timer.start(100)
 
-        # 更新文件列表小部件
+        # 更新文件列表小部件：模型 + 视图，按路径哈希去重，同名模式的文件合成一行
         old_widget = self.ui.listWidget_files
         parent = old_widget.parent()
         layout = parent.layout()
 
-        new_widget = FileDropListWidget(parent)
+        self.file_model = FileListModel(self)
+        new_widget = FileListView(parent)
+        new_widget.setModel(self.file_model)
         new_widget.setSizePolicy(
             QSizePolicy.Expanding,
             QSizePolicy.Expanding
         )
+        new_widget.paths_dropped.connect(self.add_paths)
 
         layout.replaceWidget(old_widget, new_widget)
         old_widget.deleteLater()
         self.ui.listWidget_files = new_widget
+        # 正在后台展开的目录
+        self.file_expanders = []
+
+        # ===== 图片画廊 =====
+        self.figure_gallery = FigureGallery(self.ui.tabWidget)
+        self.figure_tab_index = self.ui.tabWidget.addTab(self.figure_gallery, "Figures")
+
+        # ===== 任务列表 =====
+        self.jobs_panel = JobsPanel(self.scheduler, self.ui.tabWidget)
+        self.jobs_panel.open_requested.connect(self.open_job_tab)
+        self.ui.tabWidget.addTab(self.jobs_panel, "Jobs")
+
+        # ===== 性能分析选项（放在运行按钮左边）=====
+        self.checkBox_profile = QCheckBox("Profile run")
+        self.checkBox_profile.setToolTip("Run under cProfile + line sampling and log the hotspots")
+        self.checkBox_optimise = QCheckBox("Optimise hotspots")
+        self.checkBox_optimise.setToolTip("After a profiled run, ask the AI to speed up the slowest code")
+        self.checkBox_fresh = QCheckBox("Fresh run")
+        self.checkBox_fresh.setToolTip("Ignore the cached result of unchanged code and inputs and run again")
+        self.checkBox_incremental = QCheckBox("Incremental")
+        self.checkBox_incremental.setToolTip("Keep a persistent kernel and re-run only the statements that changed "
+                                             "(and what depends on them); Stop resets the kernel")
+        self.checkBox_incremental.toggled.connect(lambda checked: checked or self.reset_kernel())
+        run_index = self.ui.horizontalLayout_11.indexOf(self.ui.pushButton_run_code)
+        self.ui.horizontalLayout_11.insertWidget(run_index, self.checkBox_incremental)
+        self.ui.horizontalLayout_11.insertWidget(run_index, self.checkBox_fresh)
+        self.ui.horizontalLayout_11.insertWidget(run_index, self.checkBox_optimise)
+        self.ui.horizontalLayout_11.insertWidget(run_index, self.checkBox_profile)
 
         # ===== 隐藏修改代码区域 ====
         self.ui.frame_edit_code.hide()
@@ -760,33 +595,15 @@ class MainWindow(QMainWindow):
         self.ui.pushButton_stop.clicked.connect(self.stop_all_processes)
         self.ui.actionupdate.triggered.connect(self.upgrade)
 
+        self.action_history = QAction("History", self)
+        self.action_history.setShortcut(QKeySequence("Ctrl+H"))
+        self.action_history.triggered.connect(self.show_history)
+        self.ui.menubar.addAction(self.action_history)
+
         # 显示版本号
         self.setWindowTitle(f"DumbyDraw v{self.__version__}")
         sys_info = get_sys_info()
-        self.system_prompt = f"""你是一个python绘图代码生成工具，你能根据用户的输入直接生成代码。
-你输出的内容只能有完整的代码，不能有代码之外的其它东西。
-输出必须是 markdown ``` ``` 包裹的代码，之外不能有任何说明，说明只能是代码里的注释。
-禁止 if __name__ == "__main__",代码结尾不要带plt.close()，即使保存了图片，也要plt.show().
-尽量只有一次plt.show(), 若图少于4，尽量合成一张大图
-除非用户指定了其它语言或者字体，否则务必使用英文作为图注、图题。中文一定要注意字体。
-代码中的注释与用户输入的语言一致，但是代码中的print("")不能是中文。
-注意用户输入的第几第几是人类语言，是从1开始，而不是python的从0开始
-你代码中可以用python内置工具以及以下的第三方工具：
-matplotlib==3.7.5
-seaborn
-pandas
-openpyxl
-pillow
-requests
-biopython
-numpy
-scipy
-cartopy
-你需要检查用的工具不在上表，如果不在，你需要在代码中使用try import，并在except中用sys.executable获取python路径，然后用python -m pip安装。并且指定用清华源https://mirrors.tuna.tsinghua.edu.cn/pypi/web/simple
-如果需要处理双端测序NGS数据，你需要自行写相应的代码实现，并一定要处理测序数据中间overlap而不能直接简单相加
-
-{sys_info}
-"""
+        self.system_prompt = build_system_prompt(sys_info)
 
     def upgrade(self):
         """在后台执行升级（只下载和解压，不安装）"""
@@ -810,57 +627,19 @@ cartopy
         检测列表中的文件是否是表格文件，并读取前15行内容
         返回包含表格信息的字典
         """
-        table_info = {}
-        files = [self.ui.listWidget_files.item(i).text() for i in range(self.ui.listWidget_files.count())]
-        
-        for file_path in files:
-            # 检查文件扩展名是否是常见的表格文件
-            file_ext = os.path.splitext(file_path)[1].lower()
-            if file_ext in ['.csv', '.xlsx', '.xls', '.xlsm', '.xlsb', '.ods', '.tsv']:
-                try:
-                    print(f"📊 检测到表格文件: {file_path}")
-                    
-                    # 根据文件扩展名选择读取方式
-                    if file_ext == '.csv':
-                        # 尝试读取前5行
-                        df = pd.read_csv(file_path)
-                    elif file_ext in ['.xlsx', '.xls', '.xlsm', '.xlsb']:
-                        # Excel文件读取第一个工作表的前15行
-                        df = pd.read_excel(file_path, engine='openpyxl')
-                    elif file_ext == '.ods':
-                        # ODS文件
-                        df = pd.read_excel(file_path, engine='odf')
-                    elif file_ext == '.tsv':
-                        # TSV文件
-                        df = pd.read_csv(file_path, sep='\t')
-                    else:
-                        continue
-                    
-                    # 获取表格信息
-                    num_rows, num_cols = df.shape
-                    # columns = df.columns.tolist()
-                    
-                    # 将DataFrame转换为字符串表示
-                    df_str = df.head(15).to_string(index=False)
-                    
-                    table_info[file_path] = {
-                        'path': file_path,
-                        'rows': num_rows,
-                        'columns': num_cols,
-                        'preview': df_str
-                    }
-                    
-                    print(f"✅ 成功读取表格文件: {file_path} ({num_rows}行, {num_cols}列)")
-                    
-                except Exception as e:
-                    print(f"⚠️ 读取表格文件 {file_path} 时出错: {e}")
-                    # 如果文件不是有效的表格，继续下一个文件
-                    continue
-            else:
-                table_info[file_path] = {
-                    'path':file_path
-                }
-        return table_info
+        return detect_table_files(self.file_paths())
+
+    def file_info(self, user_query: str, *reserved: str) -> str:
+        """
+        追加到系统提示词里的文件信息；拖进来的目录和大量文件汇总成清单。
+        扣掉基础提示词、需求和 reserved（例如 few-shot 示例）以后的 token 预算内，按和需求的相关程度缩短各文件的预览
+        """
+        budget = self.token_budget.available(self.system_prompt, user_query, *reserved)
+        return describe_inputs(self.file_model.inputs(), query=user_query, budget=budget)
+
+    def file_paths(self) -> List[str]:
+        """文件列表里的所有路径"""
+        return self.file_model.paths()
 
     def stop_all_processes(self):
         """停止所有正在运行的进程"""
@@ -872,6 +651,10 @@ cartopy
         # 停止代码执行
         self.stop_code_execution()
 
+        # 停止展开目录
+        for expander in self.file_expanders:
+            expander.stop()
+
         # 停止升级（如果有）
         if self.upgrade_dialog and self.upgrade_dialog.upgrade_worker:
             self.upgrade_dialog.upgrade_worker.stop()
@@ -884,19 +667,26 @@ cartopy
             self.ai_worker.stop()
             print("⏹️ AI生成已停止")
 
-        if self.ai_thread and self.ai_thread.isRunning():
-            self.ai_thread.quit()
-            self.ai_thread.wait(1000)
-            if self.ai_thread.isRunning():
-                self.ai_thread.terminate()
-            print("🧵 AI线程已停止")
+        if self.ai_job and not self.ai_job.done():
+            self.ai_job.cancel()
+            print("🧵 AI任务已取消")
 
         self.ai_worker = None
-        self.ai_thread = None
+        self.ai_job = None
 
     def stop_code_execution(self):
-        """停止代码执行"""
-        self.code_runner.stop_execution()
+        """取消所有排队和运行中的任务；没有任务时重置增量运行的 kernel"""
+        if self.scheduler.busy:
+            self.scheduler.cancel_all()
+            print("⏹️ 正在停止所有运行任务...")
+        else:
+            self.reset_kernel()
+
+    def reset_kernel(self):
+        """结束增量运行的常驻 kernel，下次从头运行"""
+        if self.kernel.process is not None:
+            get_engine().submit(self.kernel.close(), name="kernel-close")
+            print("🔄 kernel 已重置")
 
 
 
@@ -905,61 +695,86 @@ cartopy
         self.ui.textBrowser_log.clear()
         original_code = self.ui.plainTextEdit_code.toPlainText()
         user_query = self.ui.plainTextEdit_query.toPlainText()
-        system_prompt = self.system_prompt
-        table_info = self.detect_table_files()
-        if table_info:
-            system_prompt += "\n\n用户上传的文件信息如下：\n"
-            for file_path, info in table_info.items():
-                system_prompt += f"\n文件：{file_path}\n"
-                print(f"\n文件：{file_path}\n")
-                try:
-                    system_prompt += f"数据维度：{info['rows']}行 x {info['columns']}列\n"
-                    system_prompt += f"前15行数据预览：\n{info['preview']}\n"
-                    print(f"前15行数据预览：\n{info['preview']}\n")
-                except:
-                    print(f"{file_path}非表格数据")
-                
-                
-                
         edit_query = self.ui.plainTextEdit_edit_query.toPlainText()
-        user_query = f"你需要修改代码，这是原始需求：{user_query}, 这是原始代码：{original_code},这是修改的需求：{edit_query}"
+        self.history_context = {"kind": "edit", "query": user_query, "instruction": edit_query,
+                                "parent_id": self.current_entry_id}
+        user_query = build_edit_query(user_query, original_code, edit_query)
 
-        print("🧵 启动后台线程")
+        if self.server_url:
+            self.start_remote_worker(user_query)
+            return
 
+        system_prompt = self.system_prompt
+        system_prompt += self.file_info(user_query)
 
-        self.ai_thread = QThread(self)
+        print("🧵 提交后台任务")
+        self.start_ai_worker(user_query, system_prompt)
+
+    def start_ai_worker(self, user_query, system_prompt):
+        """在 engine 里启动本地 AI 生成任务"""
+        # 发送前显示估计的 token 数和费用
+        summary = self.token_budget.summary(system_prompt, user_query)
+        print(summary)
+        self.ui.statusbar.showMessage(summary)
         self.ai_worker = AnalyseWorker(
             self.baseurl,
             self.model,
             self.api_key,
             user_query,
             system_prompt,
-            self.result_queue
+            self.result_queue,
+            self.file_paths(),
+            self.router
         )
+        self.ai_job = get_engine().submit(self.ai_worker.run(), limit="llm", name="ai")
 
-        self.ai_worker.moveToThread(self.ai_thread)
-        self.ai_thread.started.connect(self.ai_worker.run)
-        self.ai_thread.start()
+    def start_remote_worker(self, user_query):
+        """配置了 server_url 时，把生成任务交给 dumbydraw serve"""
+        self.stop_ai_generation()
+        self.ai_worker = RemoteAnalyseWorker(
+            self.server_url,
+            self.model,
+            user_query,
+            self.file_paths(),
+            self.result_queue
+        )
+        self.ai_job = get_engine().submit(self.ai_worker.run(), limit="net", name="ai")
 
     def import_files(self):
         """导入文件"""
         file_urls, _ = QFileDialog.getOpenFileUrls(self, "选择文件")
-        for url in file_urls:
-            path = url.toLocalFile()
-            if path and not self.is_in_list(path):
-                item = QListWidgetItem(path)
-                self.ui.listWidget_files.addItem(item)
+        self.add_paths([url.toLocalFile() for url in file_urls if url.toLocalFile()])
+
+    def add_paths(self, paths: List[str]):
+        """加入文件；目录在后台递归展开，边扫边加入列表"""
+        dirs = [p for p in paths if os.path.isdir(p)]
+        self.file_model.add_paths([p for p in paths if p not in dirs])
+        if not dirs:
+            return
+        print(f"📂 正在展开目录: {', '.join(dirs)}")
+        for directory in dirs:
+            self.file_model.add_root(directory)
+        expander = FileExpander(dirs)
+        expander.batch_signal.connect(self.file_model.add_paths)
+        expander.progress_signal.connect(
+            lambda count, path: self.ui.statusbar.showMessage(f"📂 已找到 {count} 个文件: {path}"))
+        expander.finished_signal.connect(lambda count, canceled: self.expand_finished(expander, count, canceled))
+        self.file_expanders.append(expander)
+        get_engine().submit(expander.run(), name="expand-dirs")
+
+    def expand_finished(self, expander: FileExpander, count: int, canceled: bool):
+        if expander in self.file_expanders:
+            self.file_expanders.remove(expander)
+        message = f"{'⏹️ 已停止展开目录' if canceled else '✅ 目录展开完成'}，共 {count} 个文件"
+        self.ui.statusbar.showMessage(message, 5000)
+        print(message)
 
     def is_in_list(self, path):
-        for i in range(self.ui.listWidget_files.count()):
-            if self.ui.listWidget_files.item(i).text() == path:
-                return True
-        return False
+        return path in self.file_model
 
     def remove_selection(self):
-        """移除选中的文件"""
-        for item in self.ui.listWidget_files.selectedItems():
-            self.ui.listWidget_files.takeItem(self.ui.listWidget_files.row(item))
+        """移除选中的文件（分组的行整组移除）"""
+        self.file_model.remove_rows(self.ui.listWidget_files.selected_rows())
 
     def show_edit_code(self):
         if self.ui.radioButton_edit_code.isChecked():
@@ -975,90 +790,233 @@ cartopy
         if lines:
             self.ui.textBrowser_log.append("\n".join(lines))
 
+    def update_llm_status(self):
+        """AI 请求进行中时在状态栏实时显示首 token 时间、token 数和速度，结束后保留一会儿"""
+        metrics = getattr(self.ai_worker, "metrics", None) or self.llm_metrics
+        if metrics is None or metrics is self.llm_metrics_done:
+            return
+        if metrics.total is None:
+            self.llm_metrics = metrics
+            self.ui.statusbar.showMessage(f"🤖 {metrics.status_text()}")
+        else:
+            # 停止生成后 ai_worker 已经清空，仍然显示这次请求的最终状态
+            self.llm_metrics_done = metrics
+            self.llm_metrics = None
+            self.ui.statusbar.showMessage(f"🤖 {metrics.status_text()}", 15000)
+
+    def update_figures(self):
+        added = False
+        while not self.figure_queue.empty():
+            self.figure_gallery.add_figure(self.figure_queue.get())
+            added = True
+
+        if added:
+            self.ui.tabWidget.setCurrentIndex(self.figure_tab_index)
+
+    def run_code(self, code: str, entry_id=None):
+        """
+        提交一个运行任务（前面的任务还在运行时排队或并行），并切到前台：清空画廊，
+        主日志和 Figures 页显示它的输出；entry_id 为对应的历史记录，运行结束后写入结果。
+        先做静态检查：main 判断、顶层 plt.close() 这类能自动修的直接修好，编辑器里换成实际运行的代码；
+        有语法错误、读取不存在的文件等修不了的问题时不启动进程
+        """
+        check = validate_code(code, self.file_paths())
+        check.report(print)
+        if not check.ok:
+            print("⛔ 代码没有通过运行前检查，没有运行（修改后再点运行）")
+            return
+        if check.code != code:
+            code = check.code
+            self.ui.plainTextEdit_code.setPlainText(code)
+        incremental = self.checkBox_incremental.isChecked()
+        job = self.scheduler.submit(code, tag=entry_id, resource="kernel" if incremental else None,
+                                    profile=self.checkBox_profile.isChecked(), inputs=self.file_paths(),
+                                    use_cache=not self.checkBox_fresh.isChecked(), incremental=incremental)
+        self.figure_gallery.clear_figures()
+        self.foreground_job_id = job.id
+        self.add_job_tab(job)
+        if job.status == "queued":
+            print(f"⏳ {job.name} 排队中：已有 {len(self.scheduler.running())} 个任务在运行"
+                  f"（最多并行 {self.scheduler.max_parallel} 个）")
+
+    # ---------- 运行任务 ----------
+    def make_runner(self, job: RunJob) -> CodeRunner:
+        """调度器启动任务时调用：日志和图片写进任务自己的队列"""
+        runner = CodeRunner(job.log_queue, job.figure_queue, self.resource_limits, self.profile_queue,
+                            self.done_queue, self.result_cache, self.dependency_resolver)
+        if job.options.get("incremental"):
+            runner.kernel = self.kernel
+        return runner
+
+    def job_changed(self, job=None):
+        """任务状态变化（可能在 engine 线程），只做标记，由定时器刷新界面"""
+        self.jobs_changed = True
+
+    def add_job_tab(self, job: RunJob):
+        tab = JobTab(job)
+        tab.cancel_button.clicked.connect(lambda: self.scheduler.cancel(job.id))
+        self.job_tabs[job.id] = tab
+        index = self.ui.tabWidget.addTab(tab, job.name)
+        close_button = QPushButton("×")
+        close_button.setFlat(True)
+        close_button.setFixedSize(18, 18)
+        close_button.clicked.connect(lambda: self.close_job_tab(job.id))
+        self.ui.tabWidget.tabBar().setTabButton(index, QTabBar.RightSide, close_button)
+        self.prune_job_tabs()
+
+    def close_job_tab(self, job_id: int):
+        """关闭结果页；任务还没结束时先取消"""
+        tab = self.job_tabs.pop(job_id, None)
+        if tab is None:
+            return
+        if not tab.job.done:
+            self.scheduler.cancel(job_id)
+        self.ui.tabWidget.removeTab(self.ui.tabWidget.indexOf(tab))
+        tab.deleteLater()
+
+    def prune_job_tabs(self, keep: int = 8):
+        """结束的任务的结果页最多保留 keep 个，多了关掉最早的"""
+        finished = [job_id for job_id, tab in sorted(self.job_tabs.items()) if tab.job.done]
+        for job_id in finished[:max(0, len(self.job_tabs) - keep)]:
+            self.close_job_tab(job_id)
+
+    def open_job_tab(self, job_id: int):
+        tab = self.job_tabs.get(job_id)
+        if tab is not None:
+            self.ui.tabWidget.setCurrentWidget(tab)
+
+    def update_jobs(self):
+        """把每个任务的新日志、图片显示到它的结果页；前台任务同时显示在主日志和 Figures 页"""
+        for job_id, tab in list(self.job_tabs.items()):
+            lines, figures = tab.drain()
+            if job_id != self.foreground_job_id:
+                continue
+            if lines:
+                self.log_queue.put("\n".join(lines))
+            for figure in figures:
+                self.figure_queue.put(figure)
+        if self.jobs_changed:
+            self.jobs_changed = False
+            for tab in self.job_tabs.values():
+                tab.update_status()
+            self.jobs_panel.refresh()
+
+    def check_profile(self):
+        """分析模式运行结束：勾选了优化时把热点交给 AI 改写"""
+        if self.profile_queue.empty():
+            return
+
+        summary = self.profile_queue.get()
+        if not self.checkBox_optimise.isChecked():
+            return
+
+        print("🚀 根据性能分析结果请求 AI 优化代码")
+        original_code = self.ui.plainTextEdit_code.toPlainText()
+        user_query = build_optimize_query(self.ui.plainTextEdit_query.toPlainText(), original_code, summary)
+        # 优化后的代码不再自动分析，避免循环
+        self.checkBox_optimise.setChecked(False)
+        self.history_context = {"kind": "optimise", "query": self.ui.plainTextEdit_query.toPlainText(),
+                                "instruction": summary, "parent_id": self.current_entry_id}
+        if self.server_url:
+            self.start_remote_worker(user_query)
+            return
+        system_prompt = self.system_prompt + self.file_info(user_query)
+        self.stop_ai_generation()
+        self.start_ai_worker(user_query, system_prompt)
+
     def check_result(self):
         if self.result_queue.empty():
             return
 
         code = self.result_queue.get()
         self.ui.plainTextEdit_code.setPlainText(code)
+        entry_id = self.record_generation(code)
 
         try:
-            self.code_runner.run_code_in_background(code)
+            self.run_code(code, entry_id)
         except Exception as e:
             print(e)
 
     def direct_run(self):
         code = self.ui.plainTextEdit_code.toPlainText()
         print("▶ 在后台进程中执行代码")
-        self.code_runner.run_code_in_background(code)
+        entry_id = self.record_entry("run", self.ui.plainTextEdit_query.toPlainText(), code,
+                                     parent_id=self.current_entry_id)
+        self.run_code(code, entry_id)
 
     def generate_code(self):
         self.ui.textBrowser_log.clear()
         user_query = self.ui.plainTextEdit_query.toPlainText()
-        system_prompt = self.system_prompt + "注意需要使用的包是否需要安装"
-        table_info = self.detect_table_files()
-        if table_info:
-            system_prompt += "\n\n用户上传的文件信息如下：\n"
-            for file_path, info in table_info.items():
-                system_prompt += f"\n文件：{file_path}\n"
-                print(f"\n文件：{file_path}\n")
-                try:
-                    system_prompt += f"数据维度：{info['rows']}行 x {info['columns']}列\n"
-                    system_prompt += f"前15行数据预览：\n{info['preview']}\n"
-                    print(f"前15行数据预览：\n{info['preview']}\n")
-                except:
-                    print(f"{file_path}非表格数据")
-
-        print("🧵 启动后台线程")
-        self.stop_ai_generation()
+        self.history_context = {"kind": "generate", "query": user_query}
+        if self.server_url:
+            self.start_remote_worker(user_query)
+            return
 
-        self.ai_thread = QThread(self)
-        self.ai_worker = AnalyseWorker(
-            self.baseurl,
-            self.model,
-            self.api_key,
-            user_query,
-            system_prompt,
-            self.result_queue
-        )
+        # 先取 few-shot 示例，文件信息用剩下的 token 预算
+        examples = self.few_shot_examples(user_query)
+        system_prompt = self.system_prompt
+        system_prompt += self.file_info(user_query, examples)
+        system_prompt += examples
 
-        self.ai_worker.moveToThread(self.ai_thread)
-        self.ai_thread.started.connect(self.ai_worker.run)
-        self.ai_thread.start()
+        print("🧵 提交后台任务")
+        self.stop_ai_generation()
 
-    def get_config(self) -> Tuple[str, str, str]:
-        config_path = os.path.expanduser("~/.dumbydraw_config.json")  # 简化了配置文件名
+        self.start_ai_worker(user_query, system_prompt)
 
-        if not os.path.exists(config_path):
-            os.makedirs(os.path.dirname(config_path), exist_ok=True)
-            with open(config_path, "w", encoding="utf-8") as f:
-                json.dump({
-                    "baseurl": "",
-                    "model": "",
-                    "api_key": ""
-                }, f, indent=4)
+    def few_shot_examples(self, user_query: str) -> str:
+        """从历史记录里找相似的成功代码作为示例"""
+        if self.few_shot_count <= 0:
+            return ""
+        try:
+            examples = find_examples(self.history, user_query, self.few_shot_count)
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取历史记录失败: {e}")
+            return ""
+        if examples:
+            print(f"📚 加入了历史记录中相似的成功示例（{examples.count('```python')} 个）")
+        return examples
 
-        with open(config_path, "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+    def get_config(self) -> Tuple[str, str, str]:
+        cfg = load_config()
 
-        self.baseurl = cfg.get("baseurl", "")
+        self.baseurl = default_baseurl(cfg)
         self.model = cfg.get("model", "")
         self.api_key = cfg.get("api_key", "")
-
-        self.ui.lineEdit_baseurl.setText(self.baseurl)
+        # 可选：另外的接口 "providers": [{"name", "baseurl", "model", "api_key"}]，按实测延迟路由
+        self.router = Router.from_config(cfg)
+        # 可选：提示词的 token 预算和输入价格（每百万 token），"token_budget" 默认 0，不限制
+        self.token_budget = TokenBudget.from_config(cfg)
+        # 可选：dumbydraw serve 的地址，设置后生成任务交给服务端
+        self.server_url = cfg.get("server_url", "")
+        # 可选：生成代码运行时的资源限制
+        self.resource_limits = ResourceLimits.from_config(cfg)
+        # 可选：从历史记录里取几个相似的成功示例放进提示词，0 为关闭
+        self.few_shot_count = int(cfg.get("few_shot_examples", DEFAULT_EXAMPLES))
+        # 可选：运行结果缓存的大小上限（MB），0 为关闭
+        cache_mb = float(cfg.get("cache_mb", DEFAULT_MAX_MB))
+        self.result_cache = ResultCache(max_bytes=int(cache_mb * 1024 ** 2)) if cache_mb > 0 else None
+        # 可选：会话工作目录（脚本、图片、输出）的大小上限（MB），超出时删除最久没用的运行
+        get_workspace().max_bytes = int(float(cfg.get("workspace_mb", DEFAULT_WORKSPACE_MB)) * 1024 ** 2)
+        # 可选：运行前检查缺少的包，"dependencies": {"auto_install": true, "wheelhouse": "...", ...} 时自动安装
+        self.dependency_resolver = DependencyResolver.from_config(cfg)
+        # 可选：最多同时运行几个脚本，0 为按 CPU 核数和可用内存自动决定
+        self.max_parallel_runs = int(cfg.get("max_parallel_runs", 0))
+        if getattr(self, "scheduler", None) and self.max_parallel_runs:
+            self.scheduler.set_max_parallel(self.max_parallel_runs)
+
+        # 显示配置文件里的地址，保存时不会把环境变量 DUMBYDRAW_BASE_URL 写进配置
+        self.ui.lineEdit_baseurl.setText(cfg.get("baseurl", ""))
         self.ui.lineEdit_model.setText(self.model)
         self.ui.lineEdit_key.setText(self.api_key)
+        return self.baseurl, self.model, self.api_key
 
     def save_config(self):
         try:
-            config_path = os.path.expanduser("~/.dumbydraw_config.json")
-
-            with open(config_path, "w", encoding="utf-8") as f:
-                json.dump({
-                    "baseurl": self.ui.lineEdit_baseurl.text(),
-                    "model": self.ui.lineEdit_model.text(),
-                    "api_key": self.ui.lineEdit_key.text()
-                }, f, indent=4)
+            store_config({
+                "baseurl": self.ui.lineEdit_baseurl.text(),
+                "model": self.ui.lineEdit_model.text(),
+                "api_key": self.ui.lineEdit_key.text()
+            })
             print("✅ 配置保存成功")
             self.get_config()
         except Exception as e:
@@ -1066,30 +1024,85 @@ cartopy
 
     def check_connection(self):
         user_query = '画一个正弦函数'
-        system_prompt = """你是一个python绘图代码生成工具，你能根据用户的输入直接生成代码。
-           你输出的内容只能有代码，不能有代码之外的其它东西。
-           输出必须是 markdown ``` ``` 包裹的代码。
-           禁止 if __name__ == "__main__",代码结尾不要带plt.close()，即使保存了图片，也要plt.show()。尽量只有一个plt.show(),这样我才能把图都显示出来
-           除非用户指定了其它语言或者字体，否则务必使用英文作为图注、图题。
-           代码中的注释与用户输入的语言一致
-           """
-
-        print("🧵 启动后台线程")
+        system_prompt = CONNECTION_TEST_PROMPT
+
+        print("🧵 提交后台任务")
         self.stop_ai_generation()
+        self.history_context = None
 
-        self.ai_thread = QThread(self)
-        self.ai_worker = AnalyseWorker(
-            self.baseurl,
-            self.model,
-            self.api_key,
-            user_query,
-            system_prompt,
-            self.result_queue
-        )
+        self.start_ai_worker(user_query, system_prompt)
+        if len(self.router.providers) > 1:
+            # 配置了多个接口时，所有接口同时各请求一次，测一下首 token 延迟和速度
+            get_engine().submit(probe_providers(self.router, user_query, system_prompt), limit="net", name="probe")
 
-        self.ai_worker.moveToThread(self.ai_thread)
-        self.ai_thread.started.connect(self.ai_worker.run)
-        self.ai_thread.start()
+    # ---------- 历史记录 ----------
+    def record_entry(self, kind: str, query: str, code: str, **kwargs):
+        """写一条历史记录并设为当前记录；数据库出错时只打日志，不影响生成和运行"""
+        try:
+            entry_id = self.history.add(kind, query=query, code=code, files=self.file_paths(), **kwargs)
+        except sqlite3.Error as e:
+            print(f"⚠️ 写入历史记录失败: {e}")
+            return None
+        self.current_entry_id = entry_id
+        return entry_id
+
+    def record_generation(self, code: str):
+        """AI 返回代码时调用；连接测试等没有 history_context 的生成不记录"""
+        context = self.history_context
+        self.history_context = None
+        if context is None:
+            return None
+        stats = getattr(self.ai_worker, "stats", None) or {}
+        return self.record_entry(context["kind"], context["query"], code,
+                                 instruction=context.get("instruction", ""),
+                                 parent_id=context.get("parent_id"), model=self.model, llm=stats)
+
+    def check_runs(self):
+        """运行结束：把状态、耗时和输出写进对应的历史记录"""
+        while not self.done_queue.empty():
+            stats = self.done_queue.get()
+            if stats.get("tag") is None:
+                continue
+            try:
+                self.history.finish_run(stats["tag"], stats, stats.get("output", ""))
+            except sqlite3.Error as e:
+                print(f"⚠️ 写入历史记录失败: {e}")
+            if self.history_dialog is not None and self.history_dialog.isVisible():
+                self.history_dialog.refresh()
+
+    def show_history(self):
+        if self.history_dialog is None:
+            self.history_dialog = HistoryDialog(self.history, self)
+            self.history_dialog.restore_requested.connect(self.restore_history_entry)
+        else:
+            self.history_dialog.refresh()
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+
+    def restore_history_entry(self, entry: dict, run: bool):
+        """恢复历史记录里的需求和代码；run=True 时直接重新运行（不调用 AI）"""
+        self.ui.plainTextEdit_query.setPlainText(entry["query"])
+        self.ui.plainTextEdit_code.setPlainText(entry["code"])
+        self.current_entry_id = entry["id"]
+        missing = [f["path"] for f in entry["files"] if f["size"] is None or not os.path.exists(f["path"])]
+        self.file_model.add_paths(f["path"] for f in entry["files"])
+        print(f"📜 已恢复历史记录 #{entry['id']}")
+        if missing:
+            print(f"⚠️ 以下输入文件已不存在: {', '.join(missing)}")
+        if run:
+            self.direct_run()
+
+    def start_warm_up(self):
+        """窗口显示后在后台 import pandas / openai 等，第一次生成代码时不用再等"""
+        mark("first-paint")
+        self.warm_up_job = get_engine().submit(warm_up(), name="warm-up")
+        # 工作目录的垃圾回收也推迟到窗口显示之后，之后定期运行
+        self.workspace_gc_job = get_engine().submit(get_workspace().gc_loop(), name="workspace-gc")
+        if profiling():
+            # --startup-profile：预热完成后直接退出
+            self.warm_up_timer = QTimer(self)
+            self.warm_up_timer.timeout.connect(lambda: self.warm_up_job.done() and QApplication.quit())
+            self.warm_up_timer.start(50)
 
 
 # =====================================================
@@ -1097,8 +1110,13 @@ cartopy
 # =====================================================
 def main():
     app = QApplication(sys.argv)
+    mark("qt-ready")
     win = MainWindow()
     win.show()
+    mark("window-shown")
+    # 事件循环跑起来（窗口画出来）之后再在后台预热重量级模块
+    QTimer.singleShot(0, win.start_warm_up)
+    app.aboutToQuit.connect(get_engine().shutdown)
     sys.exit(app.exec())
 
 
@@ -0,0 +1,267 @@
+"""
+无界面批量模式：dumbydraw batch manifest.jsonl
+
+manifest 每行一个 JSON：
+    {"id": "fig1", "query": "画个箱线图", "files": ["data/a.csv"], "output": "out/fig1.png"}
+可选字段 "code" / "code_file"：直接运行给定代码，不调用 AI。
+相对路径以 manifest 所在目录为准。
+
+本模块不能 import PySide6。
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+from typing import List, Optional
+
+from .config import load_config, default_baseurl
+from .engine import get_engine, run_process
+from .generator import generate
+from .prompt import get_sys_info, build_system_prompt, describe_inputs
+from .runner import script_command, child_env
+from .deps import DependencyResolver
+from .providers import Router
+from .budget import TokenBudget, estimate_tokens
+from .validate import validate_code
+
+
+def load_manifest(path: str) -> List[dict]:
+    """读取 JSONL manifest，解析相对路径"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON: {e}")
+            if "output" not in job:
+                raise ValueError(f"{path}:{line_no}: missing 'output'")
+            if "query" not in job and "code" not in job and "code_file" not in job:
+                raise ValueError(f"{path}:{line_no}: need 'query', 'code' or 'code_file'")
+
+            job.setdefault("id", str(line_no))
+            job["files"] = [os.path.join(base_dir, p) for p in job.get("files", [])]
+            job["output"] = os.path.join(base_dir, job["output"])
+            if "code_file" in job:
+                job["code_file"] = os.path.join(base_dir, job["code_file"])
+            jobs.append(job)
+    return jobs
+
+
+class BatchRunner:
+    def __init__(self, baseurl: str, model: str, api_key: str, timeout: Optional[float] = None,
+                 deps: Optional[DependencyResolver] = None, router: Optional[Router] = None,
+                 budget: Optional[TokenBudget] = None):
+        self.baseurl = baseurl
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.deps = deps
+        # 多个接口时按测速路由；任务里指定了 model 的不路由
+        self.router = router
+        self.budget = budget or TokenBudget()
+        self.base_prompt = build_system_prompt(get_sys_info())
+
+    def log(self, job_id: str, message: str):
+        print(f"[{job_id}] {message}", flush=True)
+
+    async def run_job(self, job: dict) -> dict:
+        """生成 + 运行一个任务，返回计时报告"""
+        engine = get_engine()
+        job_id = job["id"]
+        output = job["output"]
+        report = {
+            "id": job_id,
+            "output": output,
+            "status": "ok",
+            "prompt_s": 0.0,
+            "llm_s": 0.0,
+            "run_s": 0.0,
+            "queued_s": 0.0,
+        }
+        t_start = time.perf_counter()
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        root, _ext = os.path.splitext(output)
+
+        try:
+            # ---------- 生成代码 ----------
+            if "code" in job:
+                code = job["code"]
+            elif "code_file" in job:
+                with open(job["code_file"], "r", encoding="utf-8") as f:
+                    code = f.read()
+            else:
+                t0 = time.perf_counter()
+                loop = asyncio.get_event_loop()
+                budget = self.budget.available(self.base_prompt, job["query"])
+                file_info = await loop.run_in_executor(None, lambda: describe_inputs(
+                    job["files"], echo=False, query=job["query"], budget=budget,
+                    log=lambda line: self.log(job_id, line)))
+                system_prompt = self.base_prompt + file_info
+                report["prompt_s"] = time.perf_counter() - t0
+                report["prompt_chars"] = len(system_prompt)
+                report["prompt_tokens_est"] = estimate_tokens(system_prompt) + estimate_tokens(job["query"])
+                self.log(job_id, self.budget.summary(system_prompt, job["query"]))
+
+                t_wait = time.perf_counter()
+                async with engine.limiter("llm"):
+                    report["queued_s"] += time.perf_counter() - t_wait
+                    self.log(job_id, "🚀 generating")
+                    t0 = time.perf_counter()
+                    llm = {}
+                    code = await generate(self.baseurl, job.get("model") or self.model, self.api_key,
+                                          job["query"], system_prompt, echo=False, stats=llm,
+                                          router=None if job.get("model") else self.router,
+                                          on_line=lambda line: self.log(job_id, line))
+                    report["llm_s"] = time.perf_counter() - t0
+                    report["model"] = llm.get("model")
+                    if "provider" in llm:
+                        report["provider"] = llm["provider"]
+                    # 首 token 时间、思考 / 输出 token 数、速度
+                    report["llm"] = llm.get("metrics")
+
+            check = validate_code(code, job.get("files", []), cwd=os.path.dirname(output) or None)
+            check.report(lambda line: self.log(job_id, line))
+            code = check.code
+            with open(root + ".py", "w", encoding="utf-8") as f:
+                f.write(code)
+            if not check.ok:
+                # 没通过静态检查的代码不启动解释器
+                report["status"] = "invalid"
+                report["issues"] = [str(issue) for issue in check.errors]
+            else:
+                # ---------- 运行代码 ----------
+                fd, script_path = tempfile.mkstemp(suffix=".py", prefix="dumbydraw_batch_")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(code)
+
+                log_lines = []
+                if self.deps is not None:
+                    t0 = time.perf_counter()
+                    await self.deps.ensure(code, lambda line: self.log(job_id, line))
+                    report["deps_s"] = time.perf_counter() - t0
+                t_wait = time.perf_counter()
+                try:
+                    async with engine.limiter("cpu"):
+                        report["queued_s"] += time.perf_counter() - t_wait
+                        self.log(job_id, "▶ running")
+                        t0 = time.perf_counter()
+                        return_code = await run_process(
+                            script_command(script_path, figure_path=output),
+                            on_stdout=log_lines.append,
+                            on_stderr=lambda line: log_lines.append(f"❌ {line}"),
+                            env=child_env(MPLBACKEND="Agg"),
+                            cwd=os.path.dirname(output) or None,
+                        )
+                        report["run_s"] = time.perf_counter() - t0
+                finally:
+                    os.unlink(script_path)
+                    with open(root + ".log", "w", encoding="utf-8") as f:
+                        f.write("\n".join(log_lines))
+
+                report["returncode"] = return_code
+                if return_code != 0:
+                    report["status"] = "failed"
+
+        except asyncio.TimeoutError:
+            report["status"] = "timeout"
+        except Exception as e:
+            report["status"] = "error"
+            report["error"] = str(e)
+
+        report["figures"] = self._collect_figures(output)
+        report["total_s"] = time.perf_counter() - t_start
+        self.log(job_id, f"{'✅' if report['status'] == 'ok' else '❌'} {report['status']} "
+                         f"({report['total_s']:.1f}s, {len(report['figures'])} figures)")
+        return report
+
+    @staticmethod
+    def _collect_figures(output: str) -> List[str]:
+        root, ext = os.path.splitext(output)
+        figures = []
+        if os.path.exists(output):
+            figures.append(output)
+        n = 2
+        while os.path.exists(f"{root}_{n}{ext}"):
+            figures.append(f"{root}_{n}{ext}")
+            n += 1
+        return figures
+
+    async def _run_with_timeout(self, job: dict) -> dict:
+        try:
+            return await asyncio.wait_for(self.run_job(job), self.timeout)
+        except asyncio.TimeoutError:
+            self.log(job["id"], "❌ timeout")
+            return {"id": job["id"], "output": job["output"], "status": "timeout", "total_s": self.timeout}
+
+    async def run_all(self, jobs: List[dict]) -> List[dict]:
+        return await asyncio.gather(*(self._run_with_timeout(job) for job in jobs))
+
+
+def build_parser(parser: Optional[argparse.ArgumentParser] = None) -> argparse.ArgumentParser:
+    parser = parser or argparse.ArgumentParser(prog="dumbydraw batch")
+    parser.add_argument("manifest", help="JSONL: query + files + output per line")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="concurrent AI requests")
+    parser.add_argument("--cpu-concurrency", type=int, default=os.cpu_count() or 1,
+                        help="concurrent script runs")
+    parser.add_argument("--timeout", type=float, default=None, help="per-job timeout in seconds")
+    parser.add_argument("--report", default=None, help="timing report path (default: <manifest>.report.json)")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--api-key", default=None)
+    return parser
+
+
+def run(args) -> int:
+    jobs = load_manifest(args.manifest)
+    cfg = load_config()
+    runner = BatchRunner(
+        baseurl=args.base_url or default_baseurl(cfg),
+        model=args.model or cfg.get("model", ""),
+        api_key=args.api_key or cfg.get("api_key", ""),
+        timeout=args.timeout,
+        deps=DependencyResolver.from_config(cfg),
+        # 命令行指定了接口时只用它
+        router=None if args.base_url or args.model else Router.from_config(cfg),
+        budget=TokenBudget.from_config(cfg),
+    )
+
+    engine = get_engine()
+    engine.set_limit("llm", args.llm_concurrency)
+    engine.set_limit("cpu", args.cpu_concurrency)
+
+    print(f"📋 {len(jobs)} jobs, llm={args.llm_concurrency}, cpu={args.cpu_concurrency}")
+    t0 = time.perf_counter()
+    reports = engine.submit(runner.run_all(jobs), name="batch").result()
+    wall = time.perf_counter() - t0
+
+    report_path = args.report or os.path.splitext(args.manifest)[0] + ".report.json"
+    failed = [r for r in reports if r["status"] != "ok"]
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "manifest": os.path.abspath(args.manifest),
+            "wall_s": wall,
+            "jobs": len(reports),
+            "failed": len(failed),
+            "results": reports,
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"📊 {len(reports) - len(failed)}/{len(reports)} ok in {wall:.1f}s, report: {report_path}")
+    engine.shutdown()
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
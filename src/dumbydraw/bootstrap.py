@@ -0,0 +1,268 @@
+"""
+生成代码的子进程启动器。
+
+用法: python bootstrap.py [--save-figures PATH] [--capture] [--capture-formats png,svg]
+                           [--limits JSON] [--report-usage] script.py
+
+--save-figures  plt.show() 改为把图保存到 PATH（多张图依次为 PATH、PATH_2 ...）
+--capture       强制 Agg 后端，plt.show() / savefig 渲染成图片字节，
+                以 "<MARKER_PREFIX>figure " 开头的一行 JSON 写回 stdout，由父进程的 runner 解析
+--limits        {"memory_mb": .., "cpu_seconds": .., "open_files": ..}，用 setrlimit 限制本进程（仅 POSIX）
+--report-usage  退出前把峰值内存和 CPU 时间以 "<MARKER_PREFIX>usage " 一行 JSON 写回 stdout
+--profile       用 cProfile 统计函数耗时，同时按行采样脚本本身，
+                退出前以 "<MARKER_PREFIX>profile " 一行 JSON 写回热点
+
+这个文件由解释器按路径直接运行，只能依赖标准库，不能 import dumbydraw 包本身。
+"""
+import io
+import os
+import sys
+import json
+import runpy
+import atexit
+import base64
+import argparse
+
+# 与 runner.MARKER_PREFIX 保持一致
+MARKER_PREFIX = "\x1edumbydraw:"
+FIGURE_MARKER = MARKER_PREFIX + "figure "
+USAGE_MARKER = MARKER_PREFIX + "usage "
+PROFILE_MARKER = MARKER_PREFIX + "profile "
+SAMPLE_INTERVAL = 0.005
+TOP_N = 15
+THUMBNAIL_DPI = 30
+
+
+def _encode(fig, fmt, **kwargs):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, bbox_inches="tight", **kwargs)
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def install_figure_hooks(save_path=None, capture=False, formats=("png",)):
+    """强制使用 Agg 后端，接管 plt.show() 和 Figure.savefig"""
+    os.environ["MPLBACKEND"] = "Agg"
+    try:
+        import matplotlib
+        matplotlib.use("Agg", force=True)
+        import matplotlib.pyplot as plt
+        from matplotlib.figure import Figure
+    except ImportError:
+        return
+
+    out = sys.__stdout__
+    state = {"saved": 0, "sent": 0}
+
+    def next_save_path():
+        root, ext = os.path.splitext(save_path)
+        ext = ext or ".png"
+        state["saved"] += 1
+        if state["saved"] == 1:
+            return root + ext
+        return f"{root}_{state['saved']}{ext}"
+
+    def send(fig, source, path=""):
+        state["sent"] += 1
+        payload = {
+            "index": state["sent"],
+            "source": source,
+            "path": path,
+            "size": [int(v) for v in fig.get_size_inches() * fig.dpi],
+            "thumb": _encode(fig, "png", dpi=THUMBNAIL_DPI),
+        }
+        for fmt in formats:
+            payload[fmt] = _encode(fig, fmt)
+        out.write(FIGURE_MARKER + json.dumps(payload) + "\n")
+        out.flush()
+        fig._dumbydraw_sent = True
+
+    original_savefig = Figure.savefig
+
+    def savefig(self, fname, *args, **kwargs):
+        result = original_savefig(self, fname, *args, **kwargs)
+        # 只拦截保存到文件的调用，避免 _encode 自己写 BytesIO 时递归
+        if capture and isinstance(fname, (str, os.PathLike)) and not getattr(self, "_dumbydraw_sent", False):
+            send(self, "savefig", os.path.abspath(os.fspath(fname)))
+        return result
+
+    def show(*args, **kwargs):
+        for num in plt.get_fignums():
+            fig = plt.figure(num)
+            if save_path:
+                original_savefig(fig, next_save_path(), bbox_inches="tight")
+            if capture and not getattr(fig, "_dumbydraw_sent", False):
+                send(fig, "show")
+            plt.close(fig)
+
+    Figure.savefig = savefig
+    plt.show = show
+
+    # 脚本忘了 plt.show() 时，退出前把剩下的图也处理掉
+    atexit.register(show)
+
+
+def apply_limits(limits):
+    """按 limits 设置 rlimit；Windows 没有 resource 模块，直接跳过"""
+    try:
+        import resource
+    except ImportError:
+        print("resource limits are not supported on this platform", file=sys.stderr)
+        return
+
+    def set_limit(name, value):
+        kind = getattr(resource, name, None)
+        if kind is None or not value:
+            return
+        soft, hard = resource.getrlimit(kind)
+        value = int(value)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(kind, (value, hard))
+
+    set_limit("RLIMIT_AS", (limits.get("memory_mb") or 0) * 1024 * 1024)
+    set_limit("RLIMIT_CPU", limits.get("cpu_seconds"))
+    set_limit("RLIMIT_NOFILE", limits.get("open_files"))
+
+
+def report_usage():
+    """退出时把本进程的资源占用写回父进程"""
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # Linux 的 ru_maxrss 单位是 KB，macOS 是字节
+    rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    out = sys.__stdout__
+    out.write(USAGE_MARKER + json.dumps({
+        "peak_rss": rss,
+        "cpu_user": usage.ru_utime,
+        "cpu_sys": usage.ru_stime,
+    }) + "\n")
+    out.flush()
+
+
+class LineSampler:
+    """
+    后台线程定时采样主线程的调用栈，把时间记到脚本自己的那一行上
+    （调用 pandas 等库时，时间算在脚本里发起调用的那一行）
+    """
+
+    def __init__(self, script, interval=SAMPLE_INTERVAL):
+        import threading
+        self.script = script
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._main_id = threading.main_thread().ident
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._main_id)
+            self.samples += 1
+            # 从最内层往外找，直到脚本文件里的帧
+            while frame is not None and frame.f_code.co_filename != self.script:
+                frame = frame.f_back
+            if frame is not None:
+                self.counts[frame.f_lineno] = self.counts.get(frame.f_lineno, 0) + 1
+
+
+def start_profiler(script):
+    """开始分析，返回在退出时写回结果的函数"""
+    import time
+    import cProfile
+    import pstats
+    import linecache
+
+    profiler = cProfile.Profile()
+    sampler = LineSampler(script)
+    t_start = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+
+    def report():
+        profiler.disable()
+        sampler.stop()
+        total = time.perf_counter() - t_start
+
+        lines = []
+        for lineno, count in sorted(sampler.counts.items(), key=lambda kv: -kv[1])[:TOP_N]:
+            lines.append({
+                "line": lineno,
+                # 采样间隔会因 GIL 竞争被拉长，按样本占比折算总耗时
+                "seconds": total * count / max(sampler.samples, 1),
+                "percent": 100.0 * count / max(sampler.samples, 1),
+                "source": linecache.getline(script, lineno).strip(),
+            })
+
+        functions = []
+        stats = pstats.Stats(profiler).stats
+        ranked = sorted(stats.items(), key=lambda kv: -kv[1][2])  # 按自身耗时 tottime 排序
+        for (filename, lineno, name), (cc, ncalls, tottime, cumtime, _callers) in ranked[:TOP_N]:
+            functions.append({
+                "function": name,
+                "file": filename,
+                "line": lineno,
+                "ncalls": ncalls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            })
+
+        out = sys.__stdout__
+        out.write(PROFILE_MARKER + json.dumps({
+            "total": total,
+            "samples": sampler.samples,
+            "interval": sampler.interval,
+            "lines": lines,
+            "functions": functions,
+        }) + "\n")
+        out.flush()
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bootstrap.py")
+    parser.add_argument("--save-figures", default=None)
+    parser.add_argument("--capture", action="store_true")
+    parser.add_argument("--capture-formats", default="png")
+    parser.add_argument("--limits", default=None)
+    parser.add_argument("--report-usage", action="store_true")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("script")
+    args = parser.parse_args(argv)
+    script = os.path.abspath(args.script)
+
+    # 最先注册，atexit 按相反顺序执行，保证统计包含退出前保存图片的开销
+    if args.report_usage:
+        atexit.register(report_usage)
+    if args.limits:
+        apply_limits(json.loads(args.limits))
+
+    if args.profile:
+        # 先于图片钩子注册，退出时在保存图片之后才写回结果，渲染耗时也算进去
+        atexit.register(start_profiler(script))
+
+    if args.save_figures:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_figures)), exist_ok=True)
+    if args.save_figures or args.capture:
+        formats = tuple(f.strip() for f in args.capture_formats.split(",") if f.strip())
+        install_figure_hooks(args.save_figures, args.capture, formats)
+
+    sys.argv = [script]
+    # sys.path[0] 原本是本文件所在的包目录，换成脚本目录，避免包内模块遮蔽第三方库
+    sys.path[0] = os.path.dirname(script)
+    runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
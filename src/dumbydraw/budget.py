@@ -0,0 +1,169 @@
+"""
+提示词的 token 预算：本地估计 token 数，文件很多时按和需求的相关程度给每个文件的描述分配篇幅。
+
+    budget = TokenBudget.from_config(cfg)                      # "token_budget": 32000, "price_per_mtok": 2.0
+    sections = [PromptSection(path, [完整, 缩短, 最简], relevance(query, path, columns))]
+    text, dropped = allocate(sections, budget.available(system_prompt, user_query))
+    print(budget.summary(system_prompt, user_query))           # 发送前显示 token 数和预计费用
+
+每个文件的描述有几档：完整（前 15 行预览）、缩短（前 5 行）、最简（只有路径、行列数和列名）。
+分配时先给所有文件最简的描述，放不下就从最不相关的开始去掉（只在最后列出文件名）；
+剩下的预算先按相关程度从高到低给需求里提到了文件名或列名的文件尽量完整的描述，
+其余文件再一档一档地升级（先都缩短，还有剩余再给完整的）。
+token 数按字符估计（中日韩文字约 0.6 token / 字，其它字符约 0.3 token / 字），不需要下载分词器，
+和服务端的计数会有一两成的出入。默认不设预算（完整预览），配置了 token_budget 才缩短。本模块不依赖 Qt。
+"""
+import os
+import re
+import math
+
+from typing import List, Optional, Sequence, Tuple
+
+
+# 0 为不限制：模型的上下文长度各不相同，默认不替用户缩短
+DEFAULT_BUDGET = 0
+# 输入 token 的价格（每百万 token），默认按 DeepSeek-V3 的输入价
+DEFAULT_PRICE = 2.0
+DEFAULT_CURRENCY = "¥"
+# 基础提示词和需求很长时，至少给文件信息留这么多 token
+MIN_FILE_TOKENS = 300
+CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数（BPE 分词器对中文约 0.6 token / 字，对英文和代码约 0.3 token / 字符）"""
+    if not text:
+        return 0
+    cjk = len(CJK.findall(text))
+    return math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+
+# =====================================================
+# 相关程度
+# =====================================================
+def _words(text: str) -> set:
+    return {w.lower() for w in WORD.findall(text)}
+
+
+def relevance(query: str, path: str, columns: Sequence[str] = ()) -> float:
+    """需求里提到文件名（或去掉扩展名的文件名）记 5 分，每提到一个列名记 2 分（上限 10 分）"""
+    if not query:
+        return 0.0
+    lowered = query.lower()
+    words = _words(query)
+    name = os.path.basename(path).lower()
+    stem = os.path.splitext(name)[0]
+    score = 0.0
+    if name in lowered or (len(stem) >= 3 and stem in lowered) or stem in words:
+        score += 5
+    hits = 0
+    for column in columns:
+        column = str(column).strip().lower()
+        if not column:
+            continue
+        # 英文列名按整词匹配（避免 "x" 命中任何需求），中文列名按子串匹配
+        if (column in words) if WORD.fullmatch(column) else (len(column) >= 2 and column in lowered):
+            hits += 1
+    return score + min(10.0, 2.0 * hits)
+
+
+# =====================================================
+# 分配
+# =====================================================
+class PromptSection:
+    """一段可以缩短的描述；levels 从详细到简略排列，最后一档是最简"""
+
+    def __init__(self, key: str, levels: List[str], score: float = 0.0):
+        self.key = key
+        self.levels = levels
+        self.score = score
+        self.tokens = [estimate_tokens(text) for text in levels]
+        # allocate 选中的档位，None 表示被去掉
+        self.level: Optional[int] = 0
+
+
+def allocate(sections: List[PromptSection], budget: Optional[int]) -> Tuple[str, List[PromptSection]]:
+    """
+    在预算内给每段选一档描述，返回 (拼好的文字, 放不下被去掉的段)；
+    budget 为 None 时都用最详细的一档。文字按原来的顺序排列
+    """
+    if budget is None:
+        for section in sections:
+            section.level = 0
+        return "".join(s.levels[0] for s in sections), []
+
+    ranked = sorted(range(len(sections)), key=lambda i: -sections[i].score)  # 稳定排序，同分保持原顺序
+    chosen = {i: len(sections[i].levels) - 1 for i in ranked}
+    used = sum(sections[i].tokens[-1] for i in ranked)
+    dropped: List[int] = []
+    # 最简描述都放不下：从最不相关的开始去掉
+    while used > budget and ranked:
+        i = ranked.pop()
+        used -= sections[i].tokens[-1]
+        del chosen[i]
+        dropped.append(i)
+
+    def upgrade(i: int, level: int) -> bool:
+        nonlocal used
+        extra = sections[i].tokens[level] - sections[i].tokens[chosen[i]]
+        if level < chosen[i] and used + extra <= budget:
+            chosen[i] = level
+            used += extra
+            return True
+        return False
+
+    # 需求里提到的文件按相关程度从高到低，尽量给最详细的描述
+    relevant = [i for i in ranked if sections[i].score > 0]
+    for i in relevant:
+        for level in range(len(sections[i].levels) - 1):
+            if upgrade(i, level):
+                break
+    # 其余的文件一档一档地升级：先都缩短，预算还有剩再给完整的
+    others = [i for i in ranked if sections[i].score <= 0]
+    depth = max((len(sections[i].levels) for i in others), default=1)
+    for level in range(depth - 2, -1, -1):
+        for i in others:
+            if level < len(sections[i].levels) - 1:
+                upgrade(i, level)
+    for i, section in enumerate(sections):
+        section.level = chosen.get(i)
+    text = "".join(sections[i].levels[chosen[i]] for i in sorted(chosen))
+    return text, [sections[i] for i in sorted(dropped)]
+
+
+# =====================================================
+# 配置和显示
+# =====================================================
+class TokenBudget:
+    def __init__(self, tokens: int = DEFAULT_BUDGET, price_per_mtok: float = DEFAULT_PRICE,
+                 currency: str = DEFAULT_CURRENCY):
+        # 整个请求（系统提示词 + 用户输入）的 token 上限，0 为不限制
+        self.tokens = tokens
+        self.price_per_mtok = price_per_mtok
+        self.currency = currency
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "TokenBudget":
+        """读取配置里的 "token_budget": 32000（默认 0，不限制）, "price_per_mtok": 2.0, "currency": "¥" """
+        return cls(int(cfg.get("token_budget", DEFAULT_BUDGET)), float(cfg.get("price_per_mtok", DEFAULT_PRICE)),
+                   cfg.get("currency", DEFAULT_CURRENCY))
+
+    def available(self, *texts: str) -> Optional[int]:
+        """除去已经确定的部分，还能给文件信息用多少 token；不限制时返回 None"""
+        if self.tokens <= 0:
+            return None
+        return max(MIN_FILE_TOKENS, self.tokens - sum(estimate_tokens(t) for t in texts))
+
+    def cost(self, tokens: int) -> float:
+        return tokens * self.price_per_mtok / 1e6
+
+    def summary(self, system_prompt: str, user_query: str) -> str:
+        """发送前在日志里显示的一行"""
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(user_query)
+        text = f"🧮 提示词约 {tokens} tokens"
+        if self.tokens > 0:
+            text += f"（预算 {self.tokens}）"
+        if self.price_per_mtok > 0:
+            text += f"，预计输入费用 {self.currency}{self.cost(tokens):.4f}"
+        return text
@@ -0,0 +1,242 @@
+"""
+运行结果缓存：代码、解释器和输入文件都没有变时，直接回放上次的输出、图片和生成的文件。
+
+    ~/.dumbydraw/cache/<key>/manifest.json    输出、图片信息、输入文件指纹
+    ~/.dumbydraw/cache/<key>/figure_1.png ...  图片字节
+    ~/.dumbydraw/cache/<key>/file_1 ...        脚本生成的文件
+
+key 由代码、解释器、运行选项和界面里添加的文件的指纹决定；代码里写死的路径在第一次运行时区分
+输入（运行前后没变）和输出（新建或被改写），输入的指纹存在 manifest 里，命中时再核对一遍。
+代码列目录（glob、os.walk、listdir）或拼接路径（f-string、% / format、os.path.join）时，
+读了哪些文件从代码里看不出来，dynamic_paths 返回 True，这样的代码不缓存。
+总大小超过上限时按最近使用时间淘汰。本模块只用标准库。
+"""
+import os
+import re
+import ast
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+from typing import Dict, List, Optional, Tuple
+
+from .config import data_path
+
+
+CACHE_DIR = "cache"
+MANIFEST = "manifest.json"
+DEFAULT_MAX_MB = 512
+_FIGURE_FORMATS = ("png", "svg", "thumb")
+# 列目录的函数 / 方法（glob.glob、Path.rglob、os.walk ...）
+LISTING_CALLS = {"glob", "iglob", "rglob", "walk", "listdir", "scandir", "iterdir"}
+PATH_LIKE = re.compile(r"[\\/]|\.[A-Za-z0-9]{1,5}$")
+
+
+def referenced_paths(code: str, cwd: Optional[str] = None) -> List[str]:
+    """代码里像文件路径的字符串常量（按子进程的工作目录转成绝对路径）"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+    cwd = cwd or os.getcwd()
+    paths = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            continue
+        text = node.value.strip()
+        if not text or len(text) > 1024 or "\n" in text or not (os.sep in text or "/" in text or "." in text):
+            continue
+        path = os.path.abspath(os.path.join(cwd, os.path.expanduser(text)))
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _path_like(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, str) and bool(PATH_LIKE.search(node.value))
+
+
+def dynamic_paths(code: str) -> bool:
+    """代码是否可能读取 referenced_paths 找不到的文件：列目录，或者用变量拼出路径"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    # f"{x:.2f}" 的格式说明也是 JoinedStr，不算路径
+    specs = {id(node.format_spec) for node in ast.walk(tree)
+             if isinstance(node, ast.FormattedValue) and node.format_spec is not None}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", "")
+            if name in LISTING_CALLS:
+                return True
+            # os.path.join(folder, name)、Path.joinpath(...)；", ".join(...) 不算
+            str_join = isinstance(func, ast.Attribute) and isinstance(func.value, ast.Constant)
+            if name in ("join", "joinpath") and not str_join and any(not isinstance(a, ast.Constant) for a in node.args):
+                return True
+            if name == "format" and isinstance(func, ast.Attribute) and _path_like(func.value):
+                return True
+        elif isinstance(node, ast.JoinedStr) and id(node) not in specs:
+            if any(_path_like(value) for value in node.values):
+                return True
+        elif isinstance(node, ast.BinOp):
+            operands = (node.left, node.right)
+            if isinstance(node.op, ast.Div) and any(isinstance(o, ast.Constant) and isinstance(o.value, str)
+                                                    for o in operands):
+                # Path 对象拼接：folder / "a.csv"
+                return True
+            if isinstance(node.op, (ast.Mod, ast.Add)) and any(_path_like(o) for o in operands) \
+                    and not all(isinstance(o, ast.Constant) for o in operands):
+                return True
+    return False
+
+
+def fingerprint(paths: List[str]) -> Dict[str, Tuple[int, int]]:
+    """{路径: (大小, 修改时间 ns)}，只包含存在的普通文件"""
+    prints = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if os.path.isfile(path):
+            prints[path] = (st.st_size, st.st_mtime_ns)
+    return prints
+
+
+class ResultCache:
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_MB * 1024 ** 2):
+        self.root = root or data_path(CACHE_DIR)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, code: str, inputs: List[str], python_exe: Optional[str] = None,
+            options: Optional[dict] = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(code.encode("utf-8"))
+        digest.update(f"\0{python_exe or sys.executable}\0{sys.version}\0".encode("utf-8"))
+        digest.update(json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+        for path, (size, mtime) in sorted(fingerprint([os.path.abspath(p) for p in inputs]).items()):
+            digest.update(f"\0{path}\0{size}\0{mtime}".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    # ---------- 读取 ----------
+    def get(self, key: str) -> Optional[dict]:
+        """
+        命中时返回 {"output", "wall", "created", "figures": [...], "files": [{"path", "blob"}]}，
+        图片字段已读成 bytes；代码引用的输入文件变了时视为未命中并删除这条缓存
+        """
+        entry_dir = os.path.join(self.root, key)
+        manifest_path = os.path.join(entry_dir, MANIFEST)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        stored = {path: tuple(value) for path, value in manifest.get("inputs", {}).items()}
+        if fingerprint(list(stored)) != stored:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        try:
+            for figure in manifest["figures"]:
+                for fmt, blob in figure.pop("blobs").items():
+                    with open(os.path.join(entry_dir, blob), "rb") as f:
+                        figure[fmt] = f.read()
+        except OSError:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        for item in manifest["files"]:
+            item["blob"] = os.path.join(entry_dir, item["blob"])
+        # 更新最近使用时间，淘汰时按它排序
+        os.utime(manifest_path)
+        return manifest
+
+    @staticmethod
+    def restore_files(entry: dict) -> List[str]:
+        """把缓存里的生成文件放回原处（已存在且大小相同的不动），返回恢复的路径"""
+        restored = []
+        for item in entry["files"]:
+            path = item["path"]
+            try:
+                if os.path.isfile(path) and os.path.getsize(path) == os.path.getsize(item["blob"]):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copyfile(item["blob"], path)
+                restored.append(path)
+            except OSError:
+                continue
+        return restored
+
+    # ---------- 写入 ----------
+    def put(self, key: str, output: str, wall: float, figures: List[dict], files: List[str],
+            inputs: Dict[str, Tuple[int, int]]):
+        """
+        figures: 子进程送回的图片（parse_marker_line 的结果）；files: 脚本生成的文件；
+        inputs: 代码引用的输入文件指纹。单个文件超过缓存上限的 1/4 时不缓存这次结果
+        """
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}_", dir=self.root)
+        try:
+            manifest = {"created": time.time(), "wall": wall, "output": output,
+                        "inputs": inputs, "figures": [], "files": []}
+            for n, figure in enumerate(figures, 1):
+                meta = {k: v for k, v in figure.items() if k not in _FIGURE_FORMATS}
+                meta["blobs"] = {}
+                for fmt in _FIGURE_FORMATS:
+                    if fmt in figure:
+                        blob = f"figure_{n}.{fmt}"
+                        with open(os.path.join(tmp_dir, blob), "wb") as f:
+                            f.write(figure[fmt])
+                        meta["blobs"][fmt] = blob
+                manifest["figures"].append(meta)
+            for n, path in enumerate(files, 1):
+                if not os.path.isfile(path) or os.path.getsize(path) > self.max_bytes // 4:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    return
+                blob = f"file_{n}"
+                shutil.copyfile(path, os.path.join(tmp_dir, blob))
+                manifest["files"].append({"path": path, "blob": blob})
+            with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+
+            entry_dir = os.path.join(self.root, key)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    # ---------- 淘汰 ----------
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """[(最近使用时间, 字节数, 目录)]"""
+        result = []
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            manifest_path = os.path.join(entry_dir, MANIFEST)
+            if name.startswith(".") or not os.path.isfile(manifest_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            result.append((os.path.getmtime(manifest_path), size, entry_dir))
+        return result
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for _, _, entry_dir in self.entries():
+            shutil.rmtree(entry_dir, ignore_errors=True)
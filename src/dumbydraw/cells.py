@@ -0,0 +1,294 @@
+"""
+增量运行：把脚本按顶层语句切成单元（cell），分析每个单元读写了哪些变量，
+在常驻的 kernel 进程里只重新执行代码或上游输入变了的单元。
+
+    cells = split_cells(code)
+    plan = plan_run(cells, state)      # 每个单元 run / skip，以及要从命名空间删掉的旧变量
+    ...                                # kernel 执行后
+    state.update(plan, results)
+
+规则（宁可多跑，不能跑错）：
+- 单元的签名 = 语句的 AST（注释和空行不影响）+ 它读写的每个变量在上游由哪个单元（的签名）产生；
+- 单元可以跳过：签名上次成功执行过，它写的变量当前仍是它产生的值，且本次运行里还没有别的单元改写过它读写的变量；
+- 需要执行的单元读到的变量如果已经被后面的单元改过（例如 df.drop(inplace=True)），就把产生这个变量的上游单元也重新执行；
+- 画图的单元（用到 plt / sns / fig / ax 等）每次都执行，kernel 在每次运行前关闭所有旧图。
+本模块只用标准库。
+"""
+import ast
+import hashlib
+import builtins
+
+from typing import Dict, List, Optional, Set
+
+
+# 方法名在这里或带 inplace=True 时，视为修改了调用它的变量
+MUTATING_METHODS = {
+    "append", "extend", "insert", "pop", "popitem", "remove", "clear", "update", "sort", "reverse",
+    "add", "discard", "setdefault", "fill", "resize", "put", "itemset", "setflags", "__setitem__",
+}
+# 这些模块的别名、以及由它们算出来的变量都和 matplotlib 的全局图状态有关
+PLOT_MODULES = ("matplotlib", "seaborn", "dumbydraw.plotting", "plotly", "cartopy")
+PLOT_METHODS = {"plot", "hist", "boxplot", "scatter", "imshow", "bar", "barh", "pie", "hexbin"}
+
+_BUILTINS = set(dir(builtins))
+
+
+class Cell:
+    def __init__(self, index: int, source: str, lineno: int, nodes: List[ast.stmt]):
+        self.index = index
+        self.source = source
+        self.lineno = lineno
+        self.dump = "\n".join(ast.dump(node) for node in nodes)
+        self.reads: Set[str] = set()
+        self.writes: Set[str] = set()
+        self.plot_modules: Set[str] = set()  # 本单元 import 的画图模块别名
+        self.calls_plot_method = False
+        self.sig = ""
+
+    def __repr__(self):
+        return f"Cell({self.index}, L{self.lineno}, reads={sorted(self.reads)}, writes={sorted(self.writes)})"
+
+
+# =====================================================
+# 切分与读写分析
+# =====================================================
+def split_cells(code: str) -> List[Cell]:
+    """按顶层语句切分；同一行上用分号隔开的语句合成一个单元。有语法错误时抛出 SyntaxError"""
+    tree = ast.parse(code)
+    lines = code.splitlines(keepends=True)
+    groups: List[List[ast.stmt]] = []
+    last_end = 0
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        if groups and start <= last_end:
+            groups[-1].append(node)
+        else:
+            groups.append([node])
+        last_end = max(last_end, node.end_lineno)
+
+    cells = []
+    for index, nodes in enumerate(groups):
+        start = min([nodes[0].lineno] + [d.lineno for d in getattr(nodes[0], "decorator_list", [])])
+        end = max(node.end_lineno for node in nodes)
+        cell = Cell(index, "".join(lines[start - 1:end]), start, nodes)
+        for node in nodes:
+            _analyse(node, cell)
+        cell.reads -= _BUILTINS
+        cells.append(cell)
+    return cells
+
+
+def _base_name(node) -> Optional[str]:
+    """a.b[c].d -> a"""
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Starred)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _analyse(node: ast.stmt, cell: Cell):
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        module = getattr(node, "module", None) or ""
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            cell.writes.add(name)
+            full = f"{module}.{alias.name}" if module else alias.name
+            if full.startswith(PLOT_MODULES):
+                cell.plot_modules.add(name)
+        return
+
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        cell.writes.add(node.name)
+        # 函数体里用到的外部变量（粗略：所有读到的名字，去掉参数和局部赋值）
+        local = set()
+        if not isinstance(node, ast.ClassDef):
+            args = node.args
+            for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+                if arg is not None:
+                    local.add(arg.arg)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                if isinstance(child.ctx, ast.Store):
+                    local.add(child.id)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load) and child.id not in local:
+                cell.reads.add(child.id)
+        for child in node.decorator_list + getattr(node, "bases", []):
+            for sub in ast.walk(child):
+                if isinstance(sub, ast.Name):
+                    cell.reads.add(sub.id)
+        return
+
+    scoped = _scoped_names(node)
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            if child.id in scoped:
+                continue
+            if isinstance(child.ctx, ast.Load):
+                cell.reads.add(child.id)
+            else:
+                cell.writes.add(child.id)
+        elif isinstance(child, (ast.Attribute, ast.Subscript)) and isinstance(child.ctx, (ast.Store, ast.Del)):
+            # df["x"] = ... / obj.attr = ... / del d[k]：修改了 df / obj / d
+            name = _base_name(child)
+            if name:
+                cell.reads.add(name)
+                cell.writes.add(name)
+        elif isinstance(child, ast.AugAssign):
+            name = _base_name(child.target)
+            if name:
+                cell.reads.add(name)
+                cell.writes.add(name)
+        elif isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute):
+            method = child.func.attr
+            if method in PLOT_METHODS:
+                cell.calls_plot_method = True
+            inplace = any(k.arg == "inplace" and isinstance(k.value, ast.Constant) and k.value.value is True
+                          for k in child.keywords)
+            if method in MUTATING_METHODS or inplace:
+                name = _base_name(child.func.value)
+                if name:
+                    cell.writes.add(name)
+        elif isinstance(child, ast.Global):
+            cell.writes.update(child.names)
+
+
+def _scoped_names(node) -> Set[str]:
+    """推导式、lambda 里绑定的局部名字，不算对外的读写"""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            for gen in child.generators:
+                for sub in ast.walk(gen.target):
+                    if isinstance(sub, ast.Name):
+                        names.add(sub.id)
+        elif isinstance(child, ast.Lambda):
+            args = child.args
+            for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+                if arg is not None:
+                    names.add(arg.arg)
+    return names
+
+
+def mark_plot_cells(cells: List[Cell]) -> Set[int]:
+    """画图相关的单元：读到画图模块别名或由它们算出的变量（fig、ax 等），或调用了 .plot() 之类的方法"""
+    plot_names: Set[str] = set()
+    result = set()
+    for cell in cells:
+        plot_names |= cell.plot_modules
+        if cell.calls_plot_method or (cell.reads & plot_names):
+            result.add(cell.index)
+            plot_names |= cell.writes - cell.plot_modules
+    return result
+
+
+def compute_signatures(cells: List[Cell]):
+    last_writer: Dict[str, str] = {}
+    for cell in cells:
+        digest = hashlib.sha1(cell.dump.encode("utf-8"))
+        for name in sorted(cell.reads | cell.writes):
+            digest.update(f"\0{name}={last_writer.get(name, '-')}".encode("utf-8"))
+        cell.sig = digest.hexdigest()[:16]
+        for name in cell.writes:
+            last_writer[name] = cell.sig
+
+
+# =====================================================
+# 执行计划
+# =====================================================
+class KernelState:
+    """kernel 命名空间的状态：每个变量当前的值由哪个单元签名产生、哪些单元成功执行过"""
+
+    def __init__(self):
+        self.producers: Dict[str, Optional[str]] = {}
+        self.done: Set[str] = set()
+        self.seconds: Dict[str, float] = {}
+
+    def reset(self):
+        self.__init__()
+
+    def update(self, plan: "RunPlan", results: List[dict]):
+        """results: kernel 返回的每个单元 {"index", "status", "seconds"}，失败后的单元没有结果"""
+        for name in plan.delete:
+            self.producers.pop(name, None)
+        by_index = {r["index"]: r for r in results}
+        for cell in plan.cells:
+            result = by_index.get(cell.index)
+            if result is None or plan.actions[cell.index] == "skip":
+                continue
+            if result["status"] == "ok":
+                for name in cell.writes:
+                    self.producers[name] = cell.sig
+                self.done.add(cell.sig)
+                self.seconds[cell.sig] = result.get("seconds", 0.0)
+            else:
+                # 执行了一半，写的变量处于未知状态
+                for name in cell.writes:
+                    self.producers[name] = None
+                break
+
+
+class RunPlan:
+    def __init__(self, cells: List[Cell], actions: Dict[int, str], delete: List[str]):
+        self.cells = cells
+        self.actions = actions
+        self.delete = delete
+
+    @property
+    def executed(self) -> List[Cell]:
+        return [c for c in self.cells if self.actions[c.index] == "run"]
+
+    @property
+    def skipped(self) -> List[Cell]:
+        return [c for c in self.cells if self.actions[c.index] == "skip"]
+
+
+def plan_run(cells: List[Cell], state: KernelState) -> RunPlan:
+    compute_signatures(cells)
+    sigs = {cell.sig for cell in cells}
+    # 产生它的单元已经不在脚本里了：旧值，删掉
+    delete = sorted(name for name, sig in state.producers.items() if sig not in sigs)
+    forced = mark_plot_cells(cells)
+
+    while True:
+        producers = {name: sig for name, sig in state.producers.items() if name not in delete}
+        rewritten: Set[str] = set()
+        last_writer: Dict[str, Cell] = {}
+        # 跳过的单元写的变量，命名空间里是后面某个（也会跳过的）单元改过之后的值，例如
+        # df = load() 之后有 df["x"] = ...；到那个单元之前，执行的单元都不能碰这个变量
+        ahead: Dict[str, Cell] = {}
+        actions: Dict[int, str] = {}
+        restart = False
+        for cell in cells:
+            touched = cell.reads | cell.writes
+            skip = (cell.index not in forced and cell.sig in state.done and not (touched & rewritten)
+                    and all(_holds(cell, name, producers.get(name), cells) for name in cell.writes))
+            if skip:
+                for name in cell.writes:
+                    if producers.get(name) == cell.sig:
+                        ahead.pop(name, None)
+                    else:
+                        ahead.setdefault(name, cell)
+            else:
+                # 要执行的单元读到的值必须是上游单元产生的那一个，否则上游也要重跑
+                for name in touched:
+                    writer = ahead.get(name) or last_writer.get(name)
+                    if writer is not None and producers.get(name) != writer.sig and writer.index not in forced:
+                        forced.add(writer.index)
+                        restart = True
+                if restart:
+                    break
+                for name in cell.writes:
+                    producers[name] = cell.sig
+                    rewritten.add(name)
+            actions[cell.index] = "skip" if skip else "run"
+            for name in cell.writes:
+                last_writer[name] = cell
+        if not restart:
+            return RunPlan(cells, actions, delete)
+
+
+def _holds(cell: Cell, name: str, producer: Optional[str], cells: List[Cell]) -> bool:
+    """跳过 cell 后 name 的值是否可用：就是它产生的，或者是它后面一个写 name 的单元产生的"""
+    if producer == cell.sig:
+        return True
+    return any(later.sig == producer and name in later.writes for later in cells[cell.index + 1:])
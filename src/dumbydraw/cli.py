@@ -0,0 +1,46 @@
+import sys
+import argparse
+
+
+# =====================================================
+# 命令行入口
+# =====================================================
+# 不带子命令时启动图形界面；子命令按需导入，批量模式不会加载 PySide6。
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="dumbydraw", description="AI-powered Python plotting tool")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="start the GUI once under -X importtime and report where start-up time goes")
+    sub = parser.add_subparsers(dest="command")
+
+    from . import batch, server, mockllm, telemetry
+    batch.build_parser(sub.add_parser("batch", help="run a JSONL manifest of prompts headless"))
+    server.build_parser(sub.add_parser("serve", help="run a local HTTP job server"))
+    mockllm.build_parser(sub.add_parser("mock-llm", help="run an OpenAI-compatible mock LLM for offline testing"))
+    telemetry.build_parser(sub.add_parser("metrics", help="summarise recorded LLM latency and throughput"))
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+
+    if args.command == "batch":
+        from . import batch
+        sys.exit(batch.run(args))
+    if args.command == "serve":
+        from . import server
+        sys.exit(server.run(args))
+    if args.command == "mock-llm":
+        from . import mockllm
+        sys.exit(mockllm.run(args))
+    if args.command == "metrics":
+        from . import telemetry
+        sys.exit(telemetry.run(args))
+
+    if args.startup_profile:
+        from .startup import profile_startup
+        sys.exit(profile_startup([a for a in argv if a != "--startup-profile"]))
+
+    from .DumbyDraw import main as gui_main
+    gui_main()
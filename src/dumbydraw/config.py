@@ -0,0 +1,52 @@
+import os
+import json
+
+
+# =====================================================
+# API 配置读写
+# =====================================================
+CONFIG_PATH = os.path.expanduser("~/.dumbydraw_config.json")  # 简化了配置文件名
+# 运行记录、历史等本地数据都放在这里
+DATA_DIR = os.path.expanduser(os.environ.get("DUMBYDRAW_HOME", "~/.dumbydraw"))
+
+
+def data_path(*parts: str) -> str:
+    """DATA_DIR 下的路径，目录不存在时自动创建"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, *parts)
+
+
+def default_baseurl(cfg: dict) -> str:
+    """
+    默认接口（界面里填的那个）的地址；设置了环境变量 DUMBYDRAW_BASE_URL 时用它，方便把程序指向本地的
+    dumbydraw mock-llm。只替换默认接口，"providers" 里的其它接口照旧，按延迟路由和对冲请求不受影响
+    """
+    return os.environ.get("DUMBYDRAW_BASE_URL") or cfg.get("baseurl", "")
+
+
+def load_config() -> dict:
+    """读取配置，不存在时先写一份空配置"""
+    if not os.path.exists(CONFIG_PATH):
+        os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
+        save_config({
+            "baseurl": "",
+            "model": "",
+            "api_key": ""
+        })
+
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_config(cfg: dict):
+    """写入配置，保留文件里已有但本次没有传入的字段"""
+    current = {}
+    if os.path.exists(CONFIG_PATH):
+        try:
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            current = {}
+    current.update(cfg)
+    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=4)
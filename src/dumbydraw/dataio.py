@@ -0,0 +1,257 @@
+"""
+大文件数据访问，供生成的代码使用（文件比内存大时不要 pd.read_csv 整个文件）：
+
+    from dumbydraw.dataio import iter_chunks, groupby_aggregate, memmap_array, sample_rows
+
+    for chunk in iter_chunks("big.csv", columns=["time", "value"]):
+        ...                                             # 每次一个 DataFrame
+    stats = groupby_aggregate("big.csv", by="Gender", agg={"Score": ["mean", "count"]})
+    arr = memmap_array("trace.bin", dtype="float32")    # 不读入内存的 numpy 数组
+    df = sample_rows("big.csv", n=200000)               # 均匀抽样，用来画散点
+"""
+import os
+
+import numpy as np
+
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Union
+
+if TYPE_CHECKING:
+    # pandas 只在函数里用到时才 import（import 本模块要快）
+    import pandas as pd
+
+
+DEFAULT_CHUNKSIZE = 1_000_000
+# 超过这个大小的文件在提示词里会引导 AI 使用本模块
+LARGE_FILE_BYTES = int(float(os.environ.get("DUMBYDRAW_LARGE_FILE_MB", "200")) * 1024 * 1024)
+
+_DELIMITED = {".csv": ",", ".tsv": "\t", ".txt": None}
+_EXCEL = {".xlsx", ".xlsm", ".xls", ".xlsb", ".ods"}
+# openpyxl 只能读这两种；其它格式用 pd.read_excel 整个读入再分块
+_OPENPYXL = {".xlsx", ".xlsm"}
+
+
+def file_size(path: str) -> int:
+    return os.path.getsize(path)
+
+
+def is_large(path: str, threshold: int = LARGE_FILE_BYTES) -> bool:
+    try:
+        return file_size(path) >= threshold
+    except OSError:
+        return False
+
+
+def estimate_rows(path: str, sample_bytes: int = 1 << 20) -> int:
+    """读文件开头一段，按平均行长估算总行数（不含表头）"""
+    size = file_size(path)
+    with open(path, "rb") as f:
+        head = f.read(sample_bytes)
+    lines = head.count(b"\n")
+    if lines == 0:
+        return 1 if size else 0
+    if len(head) >= size:
+        # 整个文件都读到了，直接数
+        return max(lines - 1 + (0 if head.endswith(b"\n") else 1), 0)
+    return max(int(size / (len(head) / lines)) - 1, 0)
+
+
+# =====================================================
+# 分块读取
+# =====================================================
+def iter_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE, columns: Optional[Sequence[str]] = None,
+                **read_kwargs) -> Iterator["pd.DataFrame"]:
+    """
+    逐块读取表格文件，每次产出一个 DataFrame。
+    支持 csv / tsv / txt / parquet / xlsx / xlsm（流式读取），xls / xlsb / ods 只能整个读入后再分块；
+    其它参数原样传给 pandas.read_csv
+    """
+    import pandas as pd
+
+    ext = os.path.splitext(path)[1].lower()
+    usecols = list(columns) if columns is not None else None
+
+    if ext in _DELIMITED:
+        sep = read_kwargs.pop("sep", _DELIMITED[ext])
+        if sep is None:
+            read_kwargs.setdefault("sep", None)
+            read_kwargs.setdefault("engine", "python")
+        else:
+            read_kwargs["sep"] = sep
+        reader = pd.read_csv(path, chunksize=chunksize, usecols=usecols, **read_kwargs)
+        with reader:
+            for chunk in reader:
+                yield chunk
+
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=usecols):
+            yield batch.to_pandas()
+
+    elif ext in _OPENPYXL:
+        # openpyxl 只读模式逐行流式读取，不会把整个工作簿放进内存
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook[read_kwargs["sheet_name"]] if "sheet_name" in read_kwargs else workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(h) for h in next(rows)]
+            buffer: List[tuple] = []
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) >= chunksize:
+                    yield _frame(buffer, header, usecols)
+                    buffer = []
+            if buffer:
+                yield _frame(buffer, header, usecols)
+        finally:
+            workbook.close()
+
+    elif ext in _EXCEL:
+        # xlrd / pyxlsb / odfpy 都不能流式读取，只能读整个工作表再按块切开
+        df = pd.read_excel(path, sheet_name=read_kwargs.get("sheet_name", 0), usecols=usecols)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+
+    else:
+        raise ValueError(f"iter_chunks does not support '{ext}' files")
+
+
+def _frame(rows, header, usecols):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=header)
+    return df[usecols] if usecols is not None else df
+
+
+# =====================================================
+# 二进制数组
+# =====================================================
+def memmap_array(path: str, dtype: Union[str, np.dtype] = "float64", shape=None, offset: int = 0,
+                 mode: str = "r", order: str = "C") -> np.ndarray:
+    """
+    内存映射二进制数组，只在访问时按页读入。
+    .npy 文件自动读取头部的 dtype/shape；裸二进制文件需给 dtype，shape 缺省时视为一维
+    """
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode=mode)
+    dtype = np.dtype(dtype)
+    if shape is None:
+        shape = ((file_size(path) - offset) // dtype.itemsize,)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape, offset=offset, order=order)
+
+
+def npy_header(path: str) -> dict:
+    """只读 .npy 头部，返回 shape 和 dtype"""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+    return {"shape": shape, "dtype": str(dtype), "fortran_order": fortran}
+
+
+# =====================================================
+# 分块统计
+# =====================================================
+_SUPPORTED_AGGS = {"sum", "count", "min", "max", "mean", "std", "var"}
+
+
+def groupby_aggregate(path: str, by: Union[str, List[str]], agg: Dict[str, Union[str, List[str]]],
+                      chunksize: int = DEFAULT_CHUNKSIZE, **read_kwargs) -> "pd.DataFrame":
+    """
+    分块 group-by 聚合，内存占用只和分组数有关。
+    agg: {列名: "mean" 或 ["mean", "std", ...]}，支持 sum/count/min/max/mean/std/var
+    返回与 df.groupby(by).agg(agg) 相同形状的结果（列为 MultiIndex: (列名, 统计量)）
+    """
+    import pandas as pd
+
+    by_cols = [by] if isinstance(by, str) else list(by)
+    wanted = {col: [funcs] if isinstance(funcs, str) else list(funcs) for col, funcs in agg.items()}
+    for col, funcs in wanted.items():
+        unknown = set(funcs) - _SUPPORTED_AGGS
+        if unknown:
+            raise ValueError(f"unsupported aggregations for {col}: {sorted(unknown)}")
+
+    # 每块只算可合并的中间量：sum / count / 平方和 / min / max
+    partials = []
+    columns = by_cols + [c for c in wanted if c not in by_cols]
+    for chunk in iter_chunks(path, chunksize=chunksize, columns=columns, **read_kwargs):
+        grouped = chunk.groupby(by_cols, sort=False)
+        parts = {}
+        for col, funcs in wanted.items():
+            values = chunk[col]
+            parts[(col, "sum")] = grouped[col].sum()
+            parts[(col, "count")] = grouped[col].count()
+            if {"std", "var"} & set(funcs):
+                parts[(col, "sumsq")] = (values * values).groupby([chunk[b] for b in by_cols], sort=False).sum()
+            if "min" in funcs:
+                parts[(col, "min")] = grouped[col].min()
+            if "max" in funcs:
+                parts[(col, "max")] = grouped[col].max()
+        partials.append(pd.DataFrame(parts))
+
+    if not partials:
+        return pd.DataFrame()
+
+    combined = pd.concat(partials)
+    level = list(range(len(by_cols)))
+    reducers = {key: ("min" if key[1] == "min" else "max" if key[1] == "max" else "sum") for key in combined.columns}
+    total = combined.groupby(level=level).agg(reducers)
+    total.columns = pd.MultiIndex.from_tuples(total.columns)
+
+    result = {}
+    for col, funcs in wanted.items():
+        n = total[(col, "count")]
+        s = total[(col, "sum")]
+        for func in funcs:
+            if func in ("sum", "count", "min", "max"):
+                result[(col, func)] = total[(col, func)]
+            elif func == "mean":
+                result[(col, func)] = s / n
+            else:
+                # 样本方差（ddof=1），与 pandas 默认一致
+                var = (total[(col, "sumsq")] - s * s / n) / (n - 1)
+                result[(col, func)] = np.sqrt(var.clip(lower=0)) if func == "std" else var
+    out = pd.DataFrame(result)
+    out.index.names = by_cols
+    return out.sort_index()
+
+
+def column_stats(path: str, columns: Optional[Sequence[str]] = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                 **read_kwargs) -> "pd.DataFrame":
+    """分块计算数值列的 count/mean/std/min/max（类似 describe）"""
+    import pandas as pd
+
+    count = total = sumsq = low = high = None
+    for chunk in iter_chunks(path, chunksize=chunksize, columns=columns, **read_kwargs):
+        numeric = chunk.select_dtypes("number")
+        c, s, q = numeric.count(), numeric.sum(), (numeric * numeric).sum()
+        mn, mx = numeric.min(), numeric.max()
+        if count is None:
+            count, total, sumsq, low, high = c, s, q, mn, mx
+        else:
+            count, total, sumsq = count.add(c, fill_value=0), total.add(s, fill_value=0), sumsq.add(q, fill_value=0)
+            low, high = pd.concat([low, mn], axis=1).min(axis=1), pd.concat([high, mx], axis=1).max(axis=1)
+    if count is None:
+        return pd.DataFrame()
+    mean = total / count
+    std = np.sqrt(((sumsq - total * total / count) / (count - 1)).clip(lower=0))
+    return pd.DataFrame({"count": count, "mean": mean, "std": std, "min": low, "max": high}).T
+
+
+def sample_rows(path: str, n: int = 100_000, seed: Optional[int] = 0, chunksize: int = DEFAULT_CHUNKSIZE,
+                columns: Optional[Sequence[str]] = None, **read_kwargs) -> "pd.DataFrame":
+    """分块均匀抽样 n 行（每行给一个随机键，保留键最小的 n 行），用于画散点等"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    kept = None
+    for chunk in iter_chunks(path, chunksize=chunksize, columns=columns, **read_kwargs):
+        chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+        kept = chunk if kept is None else pd.concat([kept, chunk])
+        if len(kept) > n:
+            kept = kept.nsmallest(n, "_sample_key")
+    if kept is None:
+        return pd.DataFrame()
+    return kept.sort_index().drop(columns="_sample_key")
@@ -1,13 +1,38 @@
+import os
 import time
+import asyncio
 
 API_key = ""
-from openai import OpenAI  # 假设使用OpenAI格式的SDK
+from openai import OpenAI, AsyncOpenAI, BadRequestError  # 假设使用OpenAI格式的SDK
+
+from .telemetry import LLMMetrics
+
+
+# 流式请求带 stream_options 让服务端在最后返回用量；有的兼容接口不认这个参数（400 且错误信息里提到它），
+# 按接口地址记下来，之后的请求（每次请求都会新建 DeepSeek）直接不带
+_NO_STREAM_USAGE = set()
+
+
+def _rejects_stream_options(error: BadRequestError) -> bool:
+    text = str(error)
+    return "stream_options" in text or "include_usage" in text
+
+
+def usage_dict(usage) -> dict:
+    """服务端返回的用量；有思考 token 数（completion_tokens_details.reasoning_tokens）时一起取出"""
+    data = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+    details = getattr(usage, "completion_tokens_details", None)
+    reasoning = getattr(details, "reasoning_tokens", None) if details is not None else None
+    if reasoning is not None:
+        data["reasoning_tokens"] = reasoning
+    return data
 
 
 class DeepSeek:
     def __init__(self, base_url="", API_key='', prompt='', model="deepseek-ai/DeepSeek-V3"):
+        # 没有给地址时才用环境变量（指向本地的 dumbydraw mock-llm），显式传入的接口（多个接口路由时）不能被覆盖
         if base_url == "":
-            self.base_url = "https://api.siliconflow.cn/v1/"
+            self.base_url = os.environ.get("DUMBYDRAW_BASE_URL") or "https://api.siliconflow.cn/v1/"
         else:
             self.base_url = base_url
 
@@ -20,6 +45,11 @@ class DeepSeek:
         self.client = OpenAI(
             api_key=self.API_key,
             base_url=self.base_url)  # 假设的API地址
+        self.async_client = None
+        # 最近一次 aget_response 的 token 用量（服务端在最后一个 chunk 里返回时才有）
+        self.last_usage = None
+        # 最近一次请求的性能数据（telemetry.LLMMetrics）
+        self.last_metrics = None
         self.prompt = prompt
         self.model = model
 
@@ -32,18 +62,26 @@ class DeepSeek:
             return_type: "string" or "list", 返回字符串还是列表
         Returns:
             response: str 或 list
+        性能数据（首 token 时间、token 数、速度）记在 self.last_metrics
         """
         system_prompt = prompt
+        metrics = self.last_metrics = LLMMetrics(model, self.base_url, len(system_prompt) + len(query))
+        usage = None
 
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            stream=True,  # 启用流式传输
-            temperature=temperature,
-        )
+        metrics.begin()
+        try:
+            response = self._create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": query}
+                ],
+                stream=True,  # 启用流式传输
+                temperature=temperature,
+            )
+        except Exception as e:
+            metrics.finish(status="error", error=str(e))
+            raise
 
         full_response = []
         print("Thinking:")
@@ -56,31 +94,44 @@ class DeepSeek:
                 print(line, flush=True)
             return ""
 
-        for chunk in response:
-            chunk_content = chunk.choices[0].delta.content
-            chunk_reasoning_content = chunk.choices[0].delta.reasoning_content
+        try:
+            for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = usage_dict(chunk.usage)
+                if not chunk.choices:
+                    continue
+                chunk_content = chunk.choices[0].delta.content
+                chunk_reasoning_content = getattr(chunk.choices[0].delta, "reasoning_content", None)
 
-            if chunk_reasoning_content:  # 过滤空内容
-                # 处理reasoning内容，按行输出
-                for char in chunk_reasoning_content:
-                    if char == '\n':
-                        current_line = flush_line(current_line)
-                    else:
-                        current_line += char
-                #full_response.append(chunk_reasoning_content)
-
-            if chunk_content:  # 过滤空内容
-                if not reason_complete:
-                    current_line = flush_line(current_line)  # 确保之前的行被输出
-                    print("\nEnd of Thinking\n\nOutput:\n")
-                    reason_complete = True
-                # 处理普通内容，按行输出
-                for char in chunk_content:
-                    if char == '\n':
-                        current_line = flush_line(current_line)
-                    else:
-                        current_line += char
-                full_response.append(chunk_content)
+                if chunk_reasoning_content:  # 过滤空内容
+                    metrics.reasoning(chunk_reasoning_content)
+                    # 处理reasoning内容，按行输出
+                    for char in chunk_reasoning_content:
+                        if char == '\n':
+                            current_line = flush_line(current_line)
+                        else:
+                            current_line += char
+                    #full_response.append(chunk_reasoning_content)
+
+                if chunk_content:  # 过滤空内容
+                    metrics.content(chunk_content)
+                    if not reason_complete:
+                        current_line = flush_line(current_line)  # 确保之前的行被输出
+                        print("\nEnd of Thinking\n\nOutput:\n")
+                        reason_complete = True
+                    # 处理普通内容，按行输出
+                    for char in chunk_content:
+                        if char == '\n':
+                            current_line = flush_line(current_line)
+                        else:
+                            current_line += char
+                    full_response.append(chunk_content)
+        except Exception as e:
+            metrics.finish(usage, status="error", error=str(e))
+            raise
+        finally:
+            response.close()
+        metrics.finish(usage)
 
         # 输出最后一行（如果有）
         flush_line(current_line)
@@ -91,6 +142,132 @@ class DeepSeek:
         else:
             return full_response
 
+    async def aget_response(self, query, temperature=0.2, prompt='', model="deepseek-ai/DeepSeek-V3", return_type="string",
+                            echo=True, on_line=None, on_first_token=None, metrics=None):
+        """
+        get_response 的异步版本，在 engine 的事件循环里流式读取。
+        任务被取消时会关闭连接，参数与返回值同 get_response；
+        echo=False 时不输出思考过程和输出（批量模式用），
+        on_line 给定时逐行交给它而不是 print（服务模式下写进任务日志），
+        on_first_token 在收到第一个思考或输出 token 时调用一次（测 TTFT 用）；
+        metrics（telemetry.LLMMetrics）给定时边收边记录，也可以之后从 self.last_metrics 取
+        """
+        emit = on_line or (lambda line: print(line, flush=True))
+        if self.async_client is None:
+            self.async_client = AsyncOpenAI(
+                api_key=self.API_key,
+                base_url=self.base_url)
+        if metrics is None:
+            metrics = LLMMetrics(model, prompt_chars=len(prompt) + len(query))
+        if not metrics.provider:
+            metrics.provider = self.base_url
+        self.last_metrics = metrics
+        self.last_usage = None
+
+        metrics.begin()
+        try:
+            response = await self._acreate(
+                model=model,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": query}
+                ],
+                stream=True,
+                temperature=temperature,
+            )
+        except asyncio.CancelledError:
+            metrics.finish(status="canceled")
+            raise
+        except Exception as e:
+            metrics.finish(status="error", error=str(e))
+            raise
+
+        full_response = []
+        if echo:
+            emit("Thinking:")
+        reason_complete = False
+        current_line = ""
+
+        def flush_line(line):
+            if line and echo:
+                emit(line)
+            return ""
+
+        try:
+            async for chunk in response:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    self.last_usage = usage_dict(usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                chunk_content = delta.content
+                chunk_reasoning_content = getattr(delta, "reasoning_content", None)
+
+                if on_first_token and (chunk_reasoning_content or chunk_content):
+                    on_first_token()
+                    on_first_token = None
+
+                if chunk_reasoning_content:
+                    metrics.reasoning(chunk_reasoning_content)
+                    for char in chunk_reasoning_content:
+                        if char == '\n':
+                            current_line = flush_line(current_line)
+                        else:
+                            current_line += char
+
+                if chunk_content:
+                    metrics.content(chunk_content)
+                    if not reason_complete:
+                        current_line = flush_line(current_line)
+                        if echo:
+                            emit("\nEnd of Thinking\n\nOutput:\n")
+                        reason_complete = True
+                    for char in chunk_content:
+                        if char == '\n':
+                            current_line = flush_line(current_line)
+                        else:
+                            current_line += char
+                    full_response.append(chunk_content)
+        except asyncio.CancelledError:
+            metrics.finish(self.last_usage, status="canceled")
+            raise
+        except Exception as e:
+            metrics.finish(self.last_usage, status="error", error=str(e))
+            raise
+        finally:
+            # 取消时主动关闭 HTTP 流
+            await response.close()
+        metrics.finish(self.last_usage)
+
+        flush_line(current_line)
+
+        if return_type == "string":
+            return ''.join(full_response)
+        else:
+            return full_response
+
+    def _create(self, **kwargs):
+        if self.base_url not in _NO_STREAM_USAGE:
+            try:
+                return self.client.chat.completions.create(stream_options={"include_usage": True}, **kwargs)
+            except BadRequestError as e:
+                if not _rejects_stream_options(e):
+                    raise
+                _NO_STREAM_USAGE.add(self.base_url)
+        return self.client.chat.completions.create(**kwargs)
+
+    async def _acreate(self, **kwargs):
+        """_create 的异步版本"""
+        if self.base_url not in _NO_STREAM_USAGE:
+            try:
+                return await self.async_client.chat.completions.create(stream_options={"include_usage": True}, **kwargs)
+            except BadRequestError as e:
+                if not _rejects_stream_options(e):
+                    raise
+                _NO_STREAM_USAGE.add(self.base_url)
+        return await self.async_client.chat.completions.create(**kwargs)
+
     def check_connection(self):
         t0 = time.ctime()
         response = self.get_response("你是谁")
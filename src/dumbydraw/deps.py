@@ -0,0 +1,313 @@
+"""
+运行前的依赖检查：用 ast 找出生成代码 import 的第三方模块，对照已安装包的索引，
+缺的包在脚本启动前装好（可以优先从本地 wheelhouse 装），脚本自己不再 pip install。
+包名来自 AI 生成的代码，可能被抢注成同名的恶意包，所以默认只报告缺什么，配置里开启 auto_install 后才安装。
+
+    resolver = DependencyResolver(wheelhouse="~/wheels", auto_install=True)
+    ok = await resolver.ensure(code, log=print)
+
+已安装包的索引（import 名 -> 发行包名）缓存在 ~/.dumbydraw/env_index.json，
+按解释器和各个 site-packages 目录的修改时间判断是否需要重建（装 / 卸包会改目录的 mtime）。
+安装分两步：各个缺的包并行 pip download 到 ~/.dumbydraw/wheels（网络慢时最费时间的部分），
+再用一次 pip install --no-index 从本地装好，避免多个 pip 同时改 site-packages。
+索引只针对当前解释器（runner 用 sys.executable 运行脚本）。本模块不依赖 Qt。
+"""
+import os
+import re
+import sys
+import ast
+import json
+import asyncio
+import sysconfig
+
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .config import data_path
+from .engine import get_engine, run_process
+
+
+INDEX_FILE = "env_index.json"
+WHEEL_DIR = "wheels"
+INDEX_VERSION = 1
+
+# import 名和 pip 包名不一样的常见情况
+PIP_NAMES = {
+    "cv2": "opencv-python",
+    "PIL": "pillow",
+    "sklearn": "scikit-learn",
+    "skimage": "scikit-image",
+    "Bio": "biopython",
+    "yaml": "pyyaml",
+    "bs4": "beautifulsoup4",
+    "docx": "python-docx",
+    "pptx": "python-pptx",
+    "Crypto": "pycryptodome",
+    "dateutil": "python-dateutil",
+    "attr": "attrs",
+    "OpenSSL": "pyOpenSSL",
+    "fitz": "pymupdf",
+    "umap": "umap-learn",
+    "igraph": "python-igraph",
+    "Levenshtein": "python-Levenshtein",
+    "pysam": "pysam",
+    "mpl_toolkits": "matplotlib",
+    "osgeo": "gdal",
+    "dotenv": "python-dotenv",
+    "serial": "pyserial",
+    "magic": "python-magic",
+}
+# 自己的包和解释器自带的伪模块，不需要检查
+IGNORED = {"dumbydraw", "__future__", "__main__"}
+
+
+def stdlib_modules() -> Set[str]:
+    names = set(sys.builtin_module_names)
+    if hasattr(sys, "stdlib_module_names"):
+        return names | set(sys.stdlib_module_names)
+    # Python 3.8 / 3.9：列出标准库目录
+    stdlib = sysconfig.get_paths()["stdlib"]
+    for entry in os.listdir(stdlib):
+        name, ext = os.path.splitext(entry)
+        if ext in ("", ".py") and name.isidentifier() and entry != "site-packages":
+            names.add(name)
+    dynload = os.path.join(stdlib, "lib-dynload")
+    if os.path.isdir(dynload):
+        names.update(entry.split(".")[0] for entry in os.listdir(dynload))
+    return names
+
+
+def imported_modules(code: str) -> Set[str]:
+    """代码里 import 的顶层模块名（包括写在函数、try 里的），不含相对导入；有语法错误时返回空集合"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def third_party_imports(code: str, cwd: Optional[str] = None) -> Set[str]:
+    """去掉标准库、本程序和工作目录里的本地模块"""
+    cwd = cwd or os.getcwd()
+    local = lambda name: (os.path.exists(os.path.join(cwd, name + ".py"))
+                          or os.path.isdir(os.path.join(cwd, name)))
+    return {name for name in imported_modules(code) - stdlib_modules() - IGNORED if not local(name)}
+
+
+def pip_name(module: str) -> str:
+    return PIP_NAMES.get(module, module.replace("_", "-"))
+
+
+# =====================================================
+# 已安装包的索引
+# =====================================================
+def site_dirs() -> List[str]:
+    """会影响 import 结果的目录（sys.path 里存在的目录，不含当前目录）"""
+    return [p for p in sys.path if p and os.path.isdir(p)]
+
+
+def _fingerprint(dirs: List[str]) -> List[Tuple[str, int]]:
+    prints = []
+    for path in dirs:
+        try:
+            prints.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            continue
+    return prints
+
+
+def _top_level_names(dist) -> Set[str]:
+    """发行包提供的顶层 import 名：优先 top_level.txt，没有时从 RECORD 里的文件推断"""
+    text = dist.read_text("top_level.txt")
+    if text:
+        return {line.strip().split("/")[0] for line in text.splitlines() if line.strip()}
+    names = set()
+    for path in dist.files or []:
+        parts = path.parts
+        if not parts or parts[0].endswith((".dist-info", ".egg-info", ".data")) or parts[0] in ("..", "__pycache__"):
+            continue
+        top = parts[0]
+        if len(parts) == 1:
+            if not top.endswith((".py", ".so", ".pyd")):
+                continue
+            top = top.split(".")[0]
+        if top.isidentifier():
+            names.add(top)
+    return names
+
+
+def build_index(dirs: Optional[List[str]] = None) -> dict:
+    """扫描当前解释器的已安装包，返回 {"modules": {import 名: 发行包名}, ...}"""
+    import pkgutil
+    from importlib import metadata
+
+    dirs = dirs if dirs is not None else site_dirs()
+    modules: Dict[str, str] = {}
+    for dist in metadata.distributions(path=dirs):
+        name = dist.metadata["Name"] or ""
+        for top in _top_level_names(dist):
+            modules.setdefault(top, name)
+    # 没有元数据的模块（直接放进 site-packages 的 .py、开发模式安装等）
+    for info in pkgutil.iter_modules(dirs):
+        modules.setdefault(info.name, "")
+    return {
+        "version": INDEX_VERSION,
+        "python": sys.executable,
+        "fingerprint": _fingerprint(dirs),
+        "modules": modules,
+    }
+
+
+class EnvironmentIndex:
+    """缓存的已安装包索引；site-packages 有变化时自动重建"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path(INDEX_FILE)
+        self._index: Optional[dict] = None
+
+    def _valid(self, index: Optional[dict]) -> bool:
+        if not index or index.get("version") != INDEX_VERSION or index.get("python") != sys.executable:
+            return False
+        return [tuple(item) for item in index.get("fingerprint", [])] == _fingerprint(site_dirs())
+
+    def load(self, refresh: bool = False) -> dict:
+        if not refresh and self._valid(self._index):
+            return self._index
+        index = None
+        if not refresh:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = None
+        if not self._valid(index):
+            index = build_index()
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(index, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+        self._index = index
+        return index
+
+    def missing(self, modules: Set[str]) -> List[str]:
+        installed = self.load()["modules"]
+        return sorted(m for m in modules if m not in installed)
+
+
+# =====================================================
+# 运行前检查 + 安装
+# =====================================================
+class DependencyResolver:
+    """
+    wheelhouse: 本地 wheel 目录，优先从这里找包；offline=True 时只用 wheelhouse 和已下载的 wheel；
+    index_url: pip 源（默认清华源）；auto_install=False（默认）时只报告缺什么，不安装
+    """
+
+    DEFAULT_INDEX_URL = "https://mirrors.tuna.tsinghua.edu.cn/pypi/web/simple"
+
+    def __init__(self, wheelhouse: Optional[str] = None, index_url: Optional[str] = None,
+                 offline: bool = False, auto_install: bool = False, index: Optional[EnvironmentIndex] = None):
+        self.wheelhouse = os.path.expanduser(wheelhouse) if wheelhouse else None
+        self.index_url = index_url or self.DEFAULT_INDEX_URL
+        self.offline = offline
+        self.auto_install = auto_install
+        self.index = index or EnvironmentIndex()
+        self.wheel_dir = data_path(WHEEL_DIR)
+        # 装失败过的包不再反复尝试（直到重启程序）
+        self.failed: Set[str] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "DependencyResolver":
+        """读取配置里的 "dependencies": {"wheelhouse": "...", "index_url": "...", "offline": false, "auto_install": false}"""
+        deps = cfg.get("dependencies") or {}
+        return cls(deps.get("wheelhouse"), deps.get("index_url"), bool(deps.get("offline", False)),
+                   bool(deps.get("auto_install", False)))
+
+    def find_links(self) -> List[str]:
+        args = []
+        for path in (self.wheelhouse, self.wheel_dir):
+            if path and os.path.isdir(path):
+                args += ["--find-links", path]
+        return args
+
+    async def missing(self, code: str, cwd: Optional[str] = None) -> List[str]:
+        loop = asyncio.get_event_loop()
+        modules = third_party_imports(code, cwd)
+        if not modules:
+            return []
+        return await loop.run_in_executor(None, self.index.missing, modules)
+
+    async def ensure(self, code: str, log: Callable[[str], None], cwd: Optional[str] = None) -> bool:
+        """检查并安装缺少的包；全部满足时返回 True（失败只记日志，脚本照常运行，由它报 ImportError）"""
+        missing = await self.missing(code, cwd)
+        if not missing:
+            return True
+        # 并行的任务缺同一个包时只装一次：拿到锁以后重新检查
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            missing = await self.missing(code, cwd)
+            if not missing:
+                return True
+            return await self._install(missing, log)
+
+    async def _install(self, missing: List[str], log: Callable[[str], None]) -> bool:
+        packages = sorted({pip_name(m) for m in missing} - self.failed)
+        log(f"📦 代码用到但没有安装的模块: {', '.join(missing)}")
+        if not self.auto_install or not packages:
+            log('⚠️ 没有自动安装（配置里没有开启 "dependencies": {"auto_install": true}，或之前安装失败过）')
+            return False
+
+        log(f"📦 运行前安装: {' '.join(packages)}" + (f"（优先使用 {self.wheelhouse}）" if self.wheelhouse else ""))
+        engine = get_engine()
+
+        async def fetch(package: str) -> bool:
+            async with engine.limiter("net"):
+                return await self._pip(["download", "--dest", self.wheel_dir, "--prefer-binary", package], log)
+
+        # 下载可以并行，安装只用一个 pip 进程
+        results = await asyncio.gather(*(fetch(p) for p in packages))
+        fetched = [p for p, ok in zip(packages, results) if ok]
+        for package, ok in zip(packages, results):
+            if not ok:
+                log(f"❌ 下载 {package} 失败")
+                self.failed.add(package)
+        if not fetched:
+            return False
+        if not await self._pip(["install", *fetched], log):
+            self.failed.update(fetched)
+            log(f"❌ 安装失败: {' '.join(fetched)}")
+            return False
+        loop = asyncio.get_event_loop()
+        still_missing = await loop.run_in_executor(None, self.index.missing, set(missing))
+        if still_missing:
+            log(f"⚠️ 安装后仍然找不到: {', '.join(still_missing)}（import 名和包名可能不一样，请手动安装）")
+            self.failed.update(pip_name(m) for m in still_missing)
+            return False
+        log("✅ 依赖已就绪")
+        return True
+
+    async def _pip(self, args: List[str], log: Callable[[str], None]) -> bool:
+        command = [sys.executable, "-m", "pip", *args, "--disable-pip-version-check", "--no-input"]
+        command += self.find_links()
+        if self.offline or args[0] == "install":
+            command.append("--no-index")
+        else:
+            command += ["--index-url", self.index_url]
+        # pip 的进度和 "Requirement already satisfied" 之类的行太多，只显示关键行
+        important = re.compile(r"^(Successfully|ERROR|error|Collecting|Saved)")
+        return_code = await run_process(
+            command,
+            on_stdout=lambda line: important.match(line) and log(f"   {line}"),
+            on_stderr=lambda line: line.strip() and log(f"   {line}"),
+        )
+        return return_code == 0
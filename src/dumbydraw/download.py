@@ -0,0 +1,269 @@
+"""
+可续传、带条件请求的下载（升级包用）。
+
+    result = await download_file(url, data_path("upgrade"), "main.zip", on_progress=print)
+    result.path / result.changed / result.resumed_from / result.sha256
+
+- 下载好的文件和元数据（ETag、Last-Modified、大小、sha256）放在目标目录里，下次带 If-None-Match /
+  If-Modified-Since 请求，服务器返回 304 时直接用本地文件（先核对 sha256，文件坏了就重新下载）；
+- 没下载完的部分存在 <name>.part，下次用 Range + If-Range 续传，服务器不支持或文件已经变了时从头下载；
+- 每次读的块大小按读取耗时在 64 KB ~ 4 MB 之间自动调整，进度回调最多每 0.25 秒一次；
+- 服务器给了 sha-256（Repr-Digest / Digest / X-Checksum-Sha256 头，或调用方传入）时校验，不一致删掉重下。
+只依赖 requests，不依赖 Qt，可以对着本地的 HTTP 服务测试。
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+
+from typing import Callable, Optional
+
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+# 每块读取时间低于 FAST 就加倍，高于 SLOW 就减半
+FAST_SECONDS = 0.05
+SLOW_SECONDS = 0.5
+PROGRESS_INTERVAL = 0.25
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadCanceled(DownloadError):
+    pass
+
+
+class DownloadResult:
+    def __init__(self, path: str, changed: bool, size: int, sha256: str, resumed_from: int = 0,
+                 seconds: float = 0.0):
+        self.path = path
+        # False 表示服务器返回 304，用的是之前下载的文件
+        self.changed = changed
+        self.size = size
+        self.sha256 = sha256
+        self.resumed_from = resumed_from
+        self.seconds = seconds
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def expected_digest(headers) -> Optional[str]:
+    """从响应头里取整个文件的 sha256（十六进制），没有时返回 None"""
+    for name in ("Repr-Digest", "Digest"):
+        value = headers.get(name)
+        if not value:
+            continue
+        for part in value.split(","):
+            algo, _, encoded = part.strip().partition("=")
+            if algo.strip().lower() == "sha-256" and encoded:
+                try:
+                    return base64.b64decode(encoded.strip().strip(":")).hex()
+                except ValueError:
+                    continue
+    value = headers.get("X-Checksum-Sha256")
+    return value.strip().lower() if value else None
+
+
+def sha256_file(path: str, block: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProgressThrottle:
+    """把每块一次的进度变成最多每 interval 秒一次的文字"""
+
+    def __init__(self, on_progress: Optional[Callable[[str], None]], total: Optional[int], start: int = 0,
+                 interval: float = PROGRESS_INTERVAL):
+        self.on_progress = on_progress
+        self.total = total
+        self.start = start
+        self.interval = interval
+        self.t_start = time.monotonic()
+        self._last = 0.0
+
+    def update(self, done: int, force: bool = False):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        speed = (done - self.start) / max(now - self.t_start, 1e-6)
+        text = f"📥 Downloading: {format_bytes(done)}"
+        if self.total:
+            text += f" / {format_bytes(self.total)} ({100.0 * done / self.total:.1f}%)"
+            if speed > 0 and done < self.total:
+                text += f", {(self.total - done) / speed:.0f}s left"
+        text += f", {format_bytes(speed)}/s"
+        self.on_progress(text)
+
+
+def _load_meta(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(path: str, meta: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+async def download_file(url: str, directory: str, name: str,
+                        on_progress: Optional[Callable[[str], None]] = None,
+                        should_stop: Optional[Callable[[], bool]] = None,
+                        sha256: Optional[str] = None, timeout: float = 30,
+                        session=None) -> DownloadResult:
+    """
+    下载 url 到 directory/name，返回 DownloadResult。
+    取消时抛出 DownloadCanceled（已下载的部分保留，下次续传），其它失败抛出 DownloadError
+    """
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    part_path = path + ".part"
+    meta_path = path + ".json"
+    meta = _load_meta(meta_path)
+    if meta.get("url") != url:
+        meta = {}
+    session = session or requests.Session()
+    loop = asyncio.get_event_loop()
+    t_start = time.monotonic()
+
+    def stopped() -> bool:
+        return bool(should_stop and should_stop())
+
+    # ---------- 条件请求 / 续传请求头 ----------
+    headers = {"Accept-Encoding": "identity"}
+    complete = meta.get("complete") and os.path.isfile(path)
+    if complete:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    offset = 0
+    if not complete and os.path.isfile(part_path) and (meta.get("etag") or meta.get("last_modified")):
+        offset = os.path.getsize(part_path)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            # 文件在服务器上变了时，If-Range 让服务器返回完整的 200 而不是错位的 206
+            headers["If-Range"] = meta.get("etag") or meta["last_modified"]
+
+    try:
+        response = await loop.run_in_executor(
+            None, lambda: session.get(url, headers=headers, stream=True, timeout=timeout))
+    except requests.RequestException as e:
+        raise DownloadError(f"Network error: {e}") from e
+
+    try:
+        if response.status_code == 304 and complete:
+            actual = await loop.run_in_executor(None, sha256_file, path)
+            if actual == meta.get("sha256"):
+                if sha256 and actual != sha256.lower():
+                    raise DownloadError(f"Checksum mismatch: expected sha256 {sha256}, got {actual}")
+                return DownloadResult(path, False, os.path.getsize(path), actual,
+                                      seconds=time.monotonic() - t_start)
+            # 本地文件坏了，去掉条件重新下载
+            meta = {}
+            _save_meta(meta_path, meta)
+            response.close()
+            return await download_file(url, directory, name, on_progress, should_stop, sha256, timeout, session)
+        if response.status_code == 416:
+            # 续传位置超出了文件大小（服务器上的文件变小了），从头下载
+            os.remove(part_path)
+            meta = {}
+            _save_meta(meta_path, meta)
+            response.close()
+            return await download_file(url, directory, name, on_progress, should_stop, sha256, timeout, session)
+        if response.status_code not in (200, 206):
+            raise DownloadError(f"Download failed, status code: {response.status_code}")
+
+        resumed = response.status_code == 206
+        if resumed:
+            content_range = response.headers.get("Content-Range", "")
+            if not content_range.startswith(f"bytes {offset}-"):
+                raise DownloadError(f"Unexpected Content-Range: {content_range}")
+            total = content_range.rpartition("/")[2]
+            total = int(total) if total.isdigit() else None
+        else:
+            offset = 0
+            length = response.headers.get("Content-Length")
+            total = int(length) if length and length.isdigit() else None
+
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag") or (meta.get("etag") if resumed else None),
+            "last_modified": response.headers.get("Last-Modified") or (meta.get("last_modified") if resumed else None),
+            "size": total,
+            "complete": False,
+        }
+        expected = (sha256 or expected_digest(response.headers) or "").lower() or None
+        _save_meta(meta_path, meta)
+
+        digest = hashlib.sha256()
+        if resumed:
+            def hash_existing():
+                with open(part_path, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(block)
+            await loop.run_in_executor(None, hash_existing)
+
+        progress = ProgressThrottle(on_progress, total, offset)
+        done = offset
+        chunk = MIN_CHUNK
+        raw = response.raw
+        with open(part_path, "ab" if resumed else "wb") as f:
+            while True:
+                if stopped():
+                    raise DownloadCanceled("Upgrade canceled")
+                t_read = time.monotonic()
+                try:
+                    data = await loop.run_in_executor(None, lambda: raw.read(chunk, decode_content=True))
+                except Exception as e:
+                    raise DownloadError(f"Network error after {format_bytes(done)}: {e}") from e
+                if not data:
+                    break
+                elapsed = time.monotonic() - t_read
+                f.write(data)
+                digest.update(data)
+                done += len(data)
+                progress.update(done)
+                if elapsed < FAST_SECONDS and len(data) == chunk:
+                    chunk = min(chunk * 2, MAX_CHUNK)
+                elif elapsed > SLOW_SECONDS:
+                    chunk = max(chunk // 2, MIN_CHUNK)
+        progress.update(done, force=True)
+    finally:
+        response.close()
+
+    if total is not None and done != total:
+        raise DownloadError(f"Connection closed after {format_bytes(done)} of {format_bytes(total)}; "
+                            f"run the upgrade again to resume")
+    actual = digest.hexdigest()
+    if expected and actual != expected:
+        os.remove(part_path)
+        _save_meta(meta_path, {})
+        raise DownloadError(f"Checksum mismatch: expected sha256 {expected}, got {actual}")
+
+    os.replace(part_path, path)
+    meta.update(complete=True, size=done, sha256=actual)
+    _save_meta(meta_path, meta)
+    return DownloadResult(path, True, done, actual, resumed_from=offset if resumed else 0,
+                          seconds=time.monotonic() - t_start)
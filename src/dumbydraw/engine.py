@@ -0,0 +1,347 @@
+import os
+import sys
+import asyncio
+import threading
+import collections
+import concurrent.futures
+
+from typing import Callable, Deque, Dict, Optional, List
+
+
+# =====================================================
+# 统一的 asyncio 引擎
+# =====================================================
+# 整个程序只有一个事件循环，跑在一个后台守护线程里。
+# AI 流式输出、子进程管道读取、升级下载都以协程的形式提交到这里，
+# 结果依旧通过 queue / Qt 信号送回主线程（主线程用 QTimer 轮询队列）。
+# 并发上限按名字分组（llm / cpu / net），超时与取消在 submit 里统一处理。
+
+DEFAULT_LIMITS = {
+    "llm": 4,
+    "cpu": max(1, os.cpu_count() or 1),
+    "net": 2,
+}
+
+
+class Job:
+    """
+    提交到引擎的一个任务。done()、result()、add_done_callback 都以协程真正结束为准：
+    取消时要等协程处理完 CancelledError（例如结束子进程）才算完成
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, name: str = ""):
+        self._future: concurrent.futures.Future = concurrent.futures.Future()
+        self._loop = loop
+        self._task: Optional[asyncio.Task] = None
+        self._cancel_requested = False
+        self.name = name
+
+    def cancel(self) -> bool:
+        """请求取消，协程里会收到 CancelledError；返回时协程可能还在清理，用 wait() 等它结束"""
+        if self._future.done():
+            return False
+        self._cancel_requested = True
+        self._loop.call_soon_threadsafe(self._cancel_task)
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等协程结束（不论成功、出错还是取消），超时返回 False"""
+        concurrent.futures.wait([self._future], timeout)
+        return self._future.done()
+
+    # 以下在事件循环线程里调用
+    def _start(self, coro, wrap: Callable):
+        if self._cancel_requested:
+            # 还没开始就被取消：协程不会运行，直接算结束
+            coro.close()
+            self._set_cancelled()
+            return
+        self._task = self._loop.create_task(wrap(coro))
+        self._task.add_done_callback(self._task_done)
+
+    def _set_cancelled(self):
+        self._future.cancel()
+        # 通知 concurrent.futures.wait 的等待者（Future.cancel 本身不会）
+        self._future.set_running_or_notify_cancel()
+
+    def _cancel_task(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def _task_done(self, task: asyncio.Task):
+        if task.cancelled():
+            self._set_cancelled()
+        elif task.exception() is not None:
+            self._future.set_exception(task.exception())
+        else:
+            self._future.set_result(task.result())
+
+    def cancelled(self) -> bool:
+        return self._future.cancelled()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout: Optional[float] = None):
+        return self._future.result(timeout)
+
+    def exception(self, timeout: Optional[float] = None):
+        return self._future.exception(timeout)
+
+    def add_done_callback(self, fn: Callable[["Job"], None]):
+        self._future.add_done_callback(lambda _f: fn(self))
+
+
+class AsyncEngine:
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self._limit_sizes = dict(DEFAULT_LIMITS)
+        if limits:
+            self._limit_sizes.update(limits)
+        self._semaphores: Dict[str, "Limiter"] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        """启动事件循环线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run_loop, name="dumbydraw-asyncio", daemon=True)
+            self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        if sys.platform == "win32":
+            # Windows 下只有 Proactor 循环支持子进程
+            loop = asyncio.ProactorEventLoop()
+        else:
+            loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    def shutdown(self, timeout: float = 2.0):
+        """停止事件循环并取消所有未完成的任务"""
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        self._loop = None
+        self._semaphores.clear()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    # ---------- 并发限制 ----------
+    def set_limit(self, name: str, size: int):
+        """修改某类任务的并发上限，可以在任何线程调用；调小时正在运行的任务不受影响，释放到新上限以下后才放行新的"""
+        size = self._limit_sizes[name] = max(1, int(size))
+        sem = self._semaphores.get(name)
+        if sem is None:
+            return
+        if self._loop is not None and self._loop.is_running() and threading.current_thread() is not self._thread:
+            self._loop.call_soon_threadsafe(sem.resize, size)
+        else:
+            sem.resize(size)
+
+    def get_limit(self, name: str) -> int:
+        return self._limit_sizes.get(name, 1)
+
+    def limiter(self, name: str) -> "Limiter":
+        """按名字取得并发信号量，只能在事件循环线程里调用（async with engine.limiter("cpu")）"""
+        sem = self._semaphores.get(name)
+        if sem is None:
+            sem = Limiter(self.get_limit(name))
+            self._semaphores[name] = sem
+        return sem
+
+    # ---------- 提交任务 ----------
+    def submit(self, coro, limit: Optional[str] = None, timeout: Optional[float] = None, name: str = "") -> Job:
+        """
+        把协程提交到事件循环，可以在任何线程调用
+        Args:
+            coro: 协程对象
+            limit: 并发分组名，例如 "llm" / "cpu" / "net"，None 表示不限制
+            timeout: 超时秒数，超时后协程被取消并抛出 asyncio.TimeoutError
+        Returns:
+            Job
+        """
+        job = Job(self.loop, name)
+        self._loop.call_soon_threadsafe(job._start, coro, lambda c: self._guard(c, limit, timeout))
+        return job
+
+    async def _guard(self, coro, limit, timeout):
+        if limit:
+            async with self.limiter(limit):
+                return await asyncio.wait_for(coro, timeout)
+        return await asyncio.wait_for(coro, timeout)
+
+    def call_soon(self, fn: Callable, *args):
+        """在事件循环线程里执行一个普通函数"""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+
+class Limiter:
+    """
+    可以调整上限的信号量（asyncio.Semaphore 的大小不能改）：先来先得，
+    调小时不打断已经持有的任务，等持有数降到新上限以下才放行排队的。只在事件循环线程里使用
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.holders = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+
+    def locked(self) -> bool:
+        return self.holders >= self.size
+
+    def resize(self, size: int):
+        self.size = max(1, int(size))
+        self._wake()
+
+    async def acquire(self) -> bool:
+        if self.holders < self.size and not self._waiters:
+            self.holders += 1
+            return True
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已经分到名额但同时被取消：名额还回去
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        return True
+
+    def release(self):
+        self.holders -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.holders < self.size:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.holders += 1
+                waiter.set_result(True)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+_engine: Optional[AsyncEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AsyncEngine:
+    """获取全局唯一的引擎实例"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncEngine()
+        _engine.start()
+        return _engine
+
+
+# =====================================================
+# 常用协程：子进程、阻塞迭代器
+# =====================================================
+# 单行最大长度，图片等数据会以一整行 base64 通过管道传回
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+async def _pump(stream: asyncio.StreamReader, on_line: Callable[[str], None]):
+    """逐行读取管道，直到 EOF"""
+    while True:
+        raw = await stream.readline()
+        if not raw:
+            break
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        on_line(line)
+
+
+async def terminate_process(process: asyncio.subprocess.Process, grace: float = 3.0):
+    """先 terminate，等待 grace 秒后仍未退出则 kill"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+
+async def run_process(args: List[str],
+                      on_stdout: Callable[[str], None],
+                      on_stderr: Callable[[str], None],
+                      env: Optional[dict] = None,
+                      cwd: Optional[str] = None,
+                      on_start: Optional[Callable[[asyncio.subprocess.Process], None]] = None) -> int:
+    """
+    启动子进程并同时读取 stdout / stderr，返回退出码。
+    任务被取消时会结束子进程再把 CancelledError 继续抛出。
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+        cwd=cwd,
+        limit=STREAM_LIMIT,
+    )
+    if on_start:
+        on_start(process)
+    try:
+        await asyncio.gather(
+            _pump(process.stdout, on_stdout),
+            _pump(process.stderr, on_stderr),
+        )
+        return await process.wait()
+    except asyncio.CancelledError:
+        await terminate_process(process)
+        raise
+
+
+_SENTINEL = object()
+
+
+async def iterate_blocking(iterator, loop: Optional[asyncio.AbstractEventLoop] = None):
+    """
+    把阻塞的迭代器（例如 requests 的 iter_content）变成异步迭代器，
+    每次 next() 在默认线程池里执行，不会卡住事件循环
+    """
+    loop = loop or asyncio.get_event_loop()
+    it = iter(iterator)
+    while True:
+        item = await loop.run_in_executor(None, next, it, _SENTINEL)
+        if item is _SENTINEL:
+            break
+        yield item
@@ -0,0 +1,178 @@
+"""
+文件列表的数据部分：按路径去重（dict 索引，O(1)），按「目录 + 文件名模式」分组显示，
+拖进来的目录在后台线程里递归展开。
+
+    store = FileStore()
+    new_rows, changed_rows = store.add(["/data/tile_0001.tif", "/data/tile_0002.tif"])
+    store.groups[0].label()      # "/data/tile_*.tif ×2"
+    store.paths()                # 按加入顺序的全部文件
+
+    for batch in iter_file_batches(["/data/experiment"]):   # 每批最多 BATCH_SIZE 个文件
+        store.add(batch)
+
+文件名里的数字换成 * 作为模式（tile_0001.tif -> tile_*.tif），同一目录下模式相同的文件合成一行，
+几千个切片只占几行，列表视图不会卡。本模块不依赖 Qt，界面部分在 filesview.py。
+"""
+import os
+import re
+import time
+
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+BATCH_SIZE = 500
+# 展开目录时跳过的系统文件
+IGNORED_NAMES = {".DS_Store", "Thumbs.db", "desktop.ini"}
+DIGITS = re.compile(r"\d+")
+
+
+def group_key(path: str) -> Tuple[str, str]:
+    """(目录, 文件名模式)；文件名里没有数字时模式就是文件名本身"""
+    directory, name = os.path.split(path)
+    return directory, DIGITS.sub("*", name)
+
+
+class FileGroup:
+    """同一目录下文件名模式相同的一组文件，界面里显示为一行"""
+
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.paths: List[str] = []
+
+    def label(self) -> str:
+        if len(self.paths) == 1:
+            return self.paths[0]
+        directory, pattern = self.key
+        return f"{os.path.join(directory, pattern)} ×{len(self.paths)}"
+
+    def tooltip(self, limit: int = 20) -> str:
+        lines = self.paths[:limit]
+        if len(self.paths) > limit:
+            lines.append(f"... 共 {len(self.paths)} 个文件")
+        return "\n".join(lines)
+
+
+class FileStore:
+    def __init__(self):
+        # 路径 -> 所在的组；dict 保持加入顺序，同时是去重用的哈希索引
+        self._paths: Dict[str, FileGroup] = {}
+        self.groups: List[FileGroup] = []
+        self._group_rows: Dict[Tuple[str, str], int] = {}
+        # 整个拖进来的目录，生成提示词时汇总成清单（manifest.py），而不是列出里面的每个文件
+        self.roots: List[str] = []
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._paths
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def paths(self) -> List[str]:
+        return list(self._paths)
+
+    def add_root(self, directory: str):
+        if directory not in self.roots:
+            self.roots.append(directory)
+
+    def _root_of(self, path: str) -> Optional[str]:
+        for root in self.roots:
+            if path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+
+    def inputs(self) -> List[str]:
+        """拖进来的目录 + 不在这些目录里的文件"""
+        if not self.roots:
+            return self.paths()
+        return self.roots + [p for p in self._paths if self._root_of(p) is None]
+
+    def add(self, paths) -> Tuple[List[int], Set[int]]:
+        """加入文件（已有的跳过），返回 (新增组的行号, 增加了文件的已有组的行号)"""
+        new_rows: List[int] = []
+        changed: Set[int] = set()
+        for path in paths:
+            if not path or path in self._paths:
+                continue
+            key = group_key(path)
+            row = self._group_rows.get(key)
+            if row is None:
+                row = len(self.groups)
+                self.groups.append(FileGroup(key))
+                self._group_rows[key] = row
+                new_rows.append(row)
+            elif row not in new_rows:
+                changed.add(row)
+            group = self.groups[row]
+            group.paths.append(path)
+            self._paths[path] = group
+        return new_rows, changed
+
+    def remove_rows(self, rows) -> int:
+        """删除几行（整组），返回删掉的文件数"""
+        rows = set(rows)
+        removed = 0
+        for row in rows:
+            for path in self.groups[row].paths:
+                del self._paths[path]
+                removed += 1
+        self.groups = [g for r, g in enumerate(self.groups) if r not in rows]
+        self._group_rows = {g.key: r for r, g in enumerate(self.groups)}
+        # 里面的文件都删掉了的目录也不再汇总
+        remaining = {self._root_of(p) for p in self._paths} if self.roots else set()
+        self.roots = [root for root in self.roots if root in remaining]
+        return removed
+
+    def clear(self):
+        self._paths.clear()
+        self.groups.clear()
+        self._group_rows.clear()
+        self.roots.clear()
+
+
+# =====================================================
+# 递归展开目录
+# =====================================================
+def iter_files(root: str, should_stop: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+    """递归列出目录下的文件（os.scandir，不跟随目录的符号链接，跳过隐藏目录），目录内按名字排序"""
+    stack = [root]
+    while stack:
+        if should_stop and should_stop():
+            return
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith("."):
+                        subdirs.append(entry.path)
+                elif entry.is_file() and entry.name not in IGNORED_NAMES:
+                    yield entry.path
+            except OSError:
+                continue
+        # 倒序入栈，先处理名字靠前的子目录
+        stack.extend(reversed(subdirs))
+
+
+def iter_file_batches(paths: List[str], should_stop: Optional[Callable[[], bool]] = None,
+                      batch_size: int = BATCH_SIZE, interval: float = 0.2) -> Iterator[List[str]]:
+    """
+    把文件和目录（递归展开）变成一批批文件路径；每批最多 batch_size 个，
+    或者距离上一批超过 interval 秒就先交出去，界面能边扫边显示
+    """
+    batch: List[str] = []
+    last = time.monotonic()
+    for path in paths:
+        files = iter_files(path, should_stop) if os.path.isdir(path) else iter([path])
+        for file in files:
+            batch.append(file)
+            if len(batch) >= batch_size or time.monotonic() - last > interval:
+                yield batch
+                batch = []
+                last = time.monotonic()
+    if batch:
+        yield batch
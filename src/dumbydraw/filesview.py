@@ -0,0 +1,150 @@
+import time
+import asyncio
+
+from typing import List
+
+from PySide6.QtWidgets import QListView, QAbstractItemView
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, Signal
+
+from .filestore import FileStore, iter_file_batches
+
+
+# =====================================================
+# 文件列表模型：每行一组文件（见 filestore.FileGroup）
+# =====================================================
+class FileListModel(QAbstractListModel):
+    """Qt.UserRole 返回这一行的全部路径"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = FileStore()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store.groups)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.store.groups):
+            return None
+        group = self.store.groups[index.row()]
+        if role == Qt.DisplayRole:
+            return group.label()
+        if role == Qt.ToolTipRole:
+            return group.tooltip()
+        if role == Qt.UserRole:
+            return list(group.paths)
+        return None
+
+    def add_paths(self, paths) -> int:
+        """加入文件（已有的跳过），返回实际加入的个数"""
+        n_before = len(self.store)
+        first_new = len(self.store.groups)
+        # 先改数据再通知视图：新的组都追加在末尾，是连续的一段
+        new_rows, changed = self.store.add(paths)
+        if new_rows:
+            self.beginInsertRows(QModelIndex(), first_new, first_new + len(new_rows) - 1)
+            self.endInsertRows()
+        for row in changed:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.ToolTipRole])
+        return len(self.store) - n_before
+
+    def remove_rows(self, rows) -> int:
+        rows = sorted(set(rows))
+        if not rows:
+            return 0
+        self.beginResetModel()
+        removed = self.store.remove_rows(rows)
+        self.endResetModel()
+        return removed
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.endResetModel()
+
+    def paths(self) -> List[str]:
+        return self.store.paths()
+
+    def inputs(self) -> List[str]:
+        return self.store.inputs()
+
+    def add_root(self, directory: str):
+        self.store.add_root(directory)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.store
+
+
+# =====================================================
+# 支持拖入文件 / 目录的列表视图
+# =====================================================
+class FileListView(QListView):
+    """拖进来的本地路径（文件或目录）通过 paths_dropped 交给主窗口处理"""
+    paths_dropped = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAcceptDrops(True)
+        self.setDragEnabled(False)
+        self.setDropIndicatorShown(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setUniformItemSizes(True)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.toLocalFile()]
+        if paths:
+            self.paths_dropped.emit(paths)
+        event.acceptProposedAction()
+
+    def selected_rows(self) -> List[int]:
+        return [index.row() for index in self.selectionModel().selectedIndexes()]
+
+
+# =====================================================
+# 后台展开目录
+# =====================================================
+class FileExpander(QObject):
+    """在线程池里递归扫描目录，分批把文件送回主线程（worker 在主线程创建，跨线程 emit 时自动排队）"""
+    batch_signal = Signal(list)  # 一批文件路径
+    progress_signal = Signal(int, str)  # 已找到的文件数, 当前批的最后一个路径
+    finished_signal = Signal(int, bool)  # 文件总数, 是否被取消
+
+    def __init__(self, paths: List[str]):
+        super().__init__()
+        self.paths = paths
+        self._stop_flag = False
+
+    def stop(self):
+        self._stop_flag = True
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        count = 0
+
+        def walk():
+            nonlocal count
+            last = 0.0
+            for batch in iter_file_batches(self.paths, lambda: self._stop_flag):
+                if self._stop_flag:
+                    break
+                count += len(batch)
+                self.batch_signal.emit(batch)
+                now = time.monotonic()
+                if now - last > 0.25:
+                    last = now
+                    self.progress_signal.emit(count, batch[-1])
+
+        try:
+            # 扫描整个目录树是一次阻塞调用，放进线程池，不占用 engine 的事件循环
+            await loop.run_in_executor(None, walk)
+        finally:
+            self.finished_signal.emit(count, self._stop_flag)
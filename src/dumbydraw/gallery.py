@@ -0,0 +1,94 @@
+from PySide6.QtWidgets import (QListWidget, QListWidgetItem, QListView, QDialog,
+                               QVBoxLayout, QHBoxLayout, QScrollArea, QLabel,
+                               QPushButton, QFileDialog, QApplication)
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QPixmap, QIcon
+
+
+# =====================================================
+# 图片画廊（显示子进程用 Agg 渲染后送回的图）
+# =====================================================
+class FigureGallery(QListWidget):
+    """缩略图列表；只保存原始字节，双击时才解码全分辨率图片"""
+    THUMB_SIZE = 180
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setIconSize(QSize(self.THUMB_SIZE, self.THUMB_SIZE))
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setSpacing(8)
+        self.setUniformItemSizes(True)
+        self._figures = []
+        self.itemDoubleClicked.connect(self.open_item)
+
+    def add_figure(self, figure: dict):
+        """figure: runner.parse_figure_line 的结果"""
+        pixmap = QPixmap()
+        pixmap.loadFromData(figure.get("thumb") or figure.get("png", b""))
+        if pixmap.width() > self.THUMB_SIZE or pixmap.height() > self.THUMB_SIZE:
+            pixmap = pixmap.scaled(self.THUMB_SIZE, self.THUMB_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        width, height = figure.get("size", (0, 0))
+        item = QListWidgetItem(QIcon(pixmap), f"Figure {figure.get('index', len(self._figures) + 1)}")
+        item.setToolTip(f"{width}x{height}" + (f"\n{figure['path']}" if figure.get("path") else ""))
+        item.setData(Qt.UserRole, len(self._figures))
+        self._figures.append(figure)
+        self.addItem(item)
+
+    def clear_figures(self):
+        self.clear()
+        self._figures = []
+
+    def figure_for(self, item: QListWidgetItem) -> dict:
+        return self._figures[item.data(Qt.UserRole)]
+
+    def open_item(self, item: QListWidgetItem):
+        FigureViewer(self.figure_for(item), self).show()
+
+
+class FigureViewer(QDialog):
+    """全分辨率查看，支持复制和另存为"""
+
+    def __init__(self, figure: dict, parent=None):
+        super().__init__(parent)
+        self.figure = figure
+        self.setWindowTitle(f"Figure {figure.get('index', '')}")
+        self.resize(900, 700)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+
+        layout = QVBoxLayout(self)
+        self.pixmap = QPixmap()
+        self.pixmap.loadFromData(figure.get("png", b""))
+        label = QLabel()
+        label.setAlignment(Qt.AlignCenter)
+        label.setPixmap(self.pixmap)
+        scroll = QScrollArea()
+        scroll.setWidget(label)
+        scroll.setWidgetResizable(True)
+        layout.addWidget(scroll)
+
+        buttons = QHBoxLayout()
+        copy_button = QPushButton("Copy")
+        copy_button.clicked.connect(self.copy_image)
+        buttons.addWidget(copy_button)
+        save_button = QPushButton("Save As...")
+        save_button.clicked.connect(self.save_as)
+        buttons.addWidget(save_button)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+    def copy_image(self):
+        QApplication.clipboard().setPixmap(self.pixmap)
+
+    def save_as(self):
+        filters = "PNG (*.png)"
+        if "svg" in self.figure:
+            filters += ";;SVG (*.svg)"
+        path, selected = QFileDialog.getSaveFileName(self, "Save figure", f"figure_{self.figure.get('index', 1)}.png", filters)
+        if not path:
+            return
+        fmt = "svg" if path.lower().endswith(".svg") or selected.startswith("SVG") else "png"
+        with open(path, "wb") as f:
+            f.write(self.figure[fmt])
@@ -0,0 +1,228 @@
+import time
+import asyncio
+
+from .validate import validate_code
+from .telemetry import LLMMetrics, record_metrics
+
+
+def clean_code(code: str) -> str:
+    """去掉 AI 返回内容外层的 markdown 代码块标记"""
+    code = code.strip()
+    if code.startswith("```python"):
+        code = code[9:]
+    elif code.startswith("```"):
+        code = code[3:]
+    if code.endswith("```"):
+        code = code[:-3]
+    return code
+
+
+async def generate(baseurl, model, api_key, user_query, system_prompt, echo=True, on_line=None,
+                   stats=None, router=None, on_metrics=None) -> str:
+    """
+    调用 AI 生成代码并清理，返回纯代码字符串。
+    stats 给定时填入 model、seconds、服务端返回的 prompt_tokens / completion_tokens，
+    以及 metrics（telemetry.LLMMetrics.to_dict()）；
+    router（providers.Router）给定时忽略 baseurl / model / api_key，按测速选接口，stats 里另外填 provider；
+    on_metrics 收到正在进行的请求的 LLMMetrics（界面状态栏实时显示用）
+    """
+    t0 = time.perf_counter()
+    prompt_chars = len(system_prompt) + len(user_query)
+    if router is not None and router.providers:
+        attempts = {}
+
+        async def call(provider, on_first_token, line, call_stats):
+            metrics = LLMMetrics(provider.model, provider.name, prompt_chars)
+            if on_metrics and not attempts:
+                on_metrics(metrics)
+            attempts[provider.key] = (call_stats, metrics)
+
+            def first_token():
+                # 先出 token 的请求会被选用，状态栏改为显示它
+                won = all(m.first_token is None for _u, m in attempts.values() if m is not metrics)
+                on_first_token()
+                if on_metrics and won:
+                    on_metrics(metrics)
+
+            return await _request(provider.baseurl, provider.model, provider.api_key, user_query, system_prompt,
+                                  echo, line, call_stats, first_token, metrics)
+
+        code, provider = await router.run(call, on_line=on_line, log=on_line or print)
+        model = provider.model
+        usage, metrics = attempts[provider.key]
+        if stats is not None:
+            stats["provider"] = provider.name
+    else:
+        usage = {}
+        metrics = LLMMetrics(model, prompt_chars=prompt_chars)
+        if on_metrics:
+            on_metrics(metrics)
+        code = await _request(baseurl, model, api_key, user_query, system_prompt, echo, on_line, usage,
+                              metrics=metrics)
+    if stats is not None:
+        stats.update(model=model, seconds=time.perf_counter() - t0)
+        stats.update(usage)
+        stats["metrics"] = metrics.to_dict()
+    return clean_code(code)
+
+
+async def _request(baseurl, model, api_key, user_query, system_prompt, echo, on_line, usage,
+                   on_first_token=None, metrics=None) -> str:
+    """
+    向一个接口发一次请求；usage 里填 token 用量（服务端没有返回时按收到的 chunk 数估计），
+    结束（包括出错和取消）时把性能数据追加到 llm_metrics.jsonl
+    """
+    # openai SDK import 较慢，用到时才加载（图形界面启动后会在后台预热）
+    from .deepseek import DeepSeek
+
+    client = DeepSeek(
+        base_url=baseurl,
+        model=model,
+        API_key=api_key
+    )
+    try:
+        code = await client.aget_response(
+            query=user_query,
+            prompt=system_prompt,
+            return_type="string",
+            model=model,
+            echo=echo,
+            on_line=on_line,
+            on_first_token=on_first_token,
+            metrics=metrics
+        )
+    finally:
+        if client.last_metrics is not None:
+            record_metrics(client.last_metrics)
+    usage.update(client.last_usage or {"completion_tokens": client.last_metrics.completion_tokens()})
+    return code
+
+
+async def probe_providers(router, user_query, system_prompt, log=print):
+    """连接测试：所有接口同时各请求一次，记录首 token 延迟和速度"""
+    async def call(provider, on_first_token, line, usage):
+        return await _request(provider.baseurl, provider.model, provider.api_key, user_query, system_prompt,
+                              False, line, usage, on_first_token)
+
+    log(f"📶 测试 {len(router.providers)} 个接口的速度")
+    results = await router.probe(call, log)
+    best = router.rank()[0]
+    log(f"🏁 {sum(error is None for _p, error in results)}/{len(results)} 个接口可用，当前首选 {best.name} ({best.model})")
+    return results
+
+
+# =====================================================
+# 后台 Worker（负责生成代码）
+# =====================================================
+class AnalyseWorker:
+    def __init__(self, baseurl, model, api_key, user_query, system_prompt, result_queue, files=None, router=None):
+        self.baseurl = baseurl
+        self.model = model
+        self.api_key = api_key
+        self.user_query = user_query
+        self.system_prompt = system_prompt
+        self.result_queue = result_queue
+        # 导入的文件，静态检查时核对代码里读取的路径
+        self.files = files or []
+        # 配置了多个接口时按测速路由（providers.Router）
+        self.router = router
+        # 生成耗时和 token 用量，写历史记录用
+        self.stats = {}
+        # 正在进行的请求的性能数据（telemetry.LLMMetrics），界面定时读取显示在状态栏
+        self.metrics = None
+        self._stop_flag = False
+
+    def check(self, code: str) -> str:
+        """静态检查并自动修复（几毫秒，不启动解释器）；修不了的问题由 run_code 拦下"""
+        result = validate_code(code, self.files)
+        result.report(print, warnings=False, errors=False)
+        return result.code
+
+    def set_metrics(self, metrics):
+        self.metrics = metrics
+
+    def stop(self):
+        """停止AI生成"""
+        self._stop_flag = True
+        print("🛑 正在停止AI生成...")
+
+    async def run(self):
+        try:
+            print("🚀 开始调用 AI 接口")
+
+            if self._stop_flag:
+                print("⏹️ AI生成已被停止")
+                return
+
+            if self.router is None or len(self.router.providers) <= 1:
+                print(f"model={self.model}")
+            code = await generate(
+                self.baseurl,
+                self.model,
+                self.api_key,
+                self.user_query,
+                self.system_prompt,
+                stats=self.stats,
+                router=self.router,
+                on_metrics=self.set_metrics
+            )
+
+            if self._stop_flag:
+                print("⏹️ AI生成已被停止")
+                return
+
+            if "provider" in self.stats:
+                print(f"✅ AI 返回完成（{self.stats['provider']}: {self.stats['model']}），代码已清理")
+            else:
+                print("✅ AI 返回完成，代码已清理")
+            code = self.check(code)
+
+            if not self._stop_flag:
+                self.result_queue.put(code)
+                print("📦 代码已发送回主线程")
+
+        except asyncio.CancelledError:
+            print("⏹️ AI生成已被停止")
+            raise
+        except Exception as e:
+            if not self._stop_flag:
+                print(f"❌ 后台异常: {e}")
+
+
+class RemoteAnalyseWorker(AnalyseWorker):
+    """配置了 server_url 时使用：把生成任务交给 dumbydraw serve，日志通过 SSE 取回"""
+
+    def __init__(self, server_url, model, user_query, files, result_queue):
+        super().__init__("", model, "", user_query, "", result_queue, files)
+        self.server_url = server_url
+
+    async def run(self):
+        from .server import ServerClient
+        from .engine import iterate_blocking
+
+        client = ServerClient(self.server_url)
+        loop = asyncio.get_event_loop()
+        job_id = None
+        try:
+            print(f"🌐 提交到服务: {self.server_url}")
+            t0 = time.perf_counter()
+            job_id = await loop.run_in_executor(
+                None, lambda: client.generate(self.user_query, self.files, model=self.model or None))
+            async for event, data in iterate_blocking(client.events(job_id)):
+                if event == "log":
+                    print(data)
+            result = await loop.run_in_executor(None, client.result, job_id)
+            self.stats.update(model=self.model, seconds=time.perf_counter() - t0)
+            if result["status"] == "done" and not self._stop_flag:
+                self.result_queue.put(self.check(result["code"]))
+                print("📦 代码已发送回主线程")
+            else:
+                print(f"❌ 服务端任务失败: {result.get('error') or result['status']}")
+        except asyncio.CancelledError:
+            print("⏹️ AI生成已被停止")
+            if job_id:
+                await loop.run_in_executor(None, client.cancel, job_id)
+            raise
+        except Exception as e:
+            if not self._stop_flag:
+                print(f"❌ 后台异常: {e}")
@@ -0,0 +1,216 @@
+"""
+本地历史记录：每次生成 / 修改 / 运行都写进 ~/.dumbydraw/history.sqlite3。
+
+需求、代码和日志用 SQLite FTS5 建全文索引（trigram 分词，中文也能按子串搜索），
+任何一条记录都可以直接恢复代码并重新运行，不需要再调用 AI。
+本模块只用标准库，图形界面、批量模式都可以用。
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from typing import Dict, List, Optional
+
+from .config import data_path
+
+
+HISTORY_FILE = "history.sqlite3"
+# 日志只保留末尾这么多字符，出错信息一般在最后
+MAX_LOG_CHARS = 200_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    kind TEXT NOT NULL,
+    parent_id INTEGER,
+    query TEXT NOT NULL DEFAULT '',
+    instruction TEXT NOT NULL DEFAULT '',
+    code TEXT NOT NULL DEFAULT '',
+    files TEXT NOT NULL DEFAULT '[]',
+    model TEXT NOT NULL DEFAULT '',
+    llm_seconds REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    status TEXT NOT NULL DEFAULT 'generated',
+    returncode INTEGER,
+    run_seconds REAL,
+    peak_rss INTEGER,
+    log TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS entries_created ON entries(created);
+"""
+
+# 外部内容表 + 触发器，entries 改动时自动同步索引
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    query, instruction, code, log, content='entries', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, query, instruction, code, log)
+    VALUES (new.id, new.query, new.instruction, new.code, new.log);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, query, instruction, code, log)
+    VALUES ('delete', old.id, old.query, old.instruction, old.code, old.log);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, query, instruction, code, log)
+    VALUES ('delete', old.id, old.query, old.instruction, old.code, old.log);
+    INSERT INTO entries_fts(rowid, query, instruction, code, log)
+    VALUES (new.id, new.query, new.instruction, new.code, new.log);
+END;
+"""
+
+# 列表里不需要的大字段
+_LIST_COLUMNS = ("id, created, kind, parent_id, query, instruction, model, llm_seconds, prompt_tokens, "
+                 "completion_tokens, status, returncode, run_seconds, peak_rss, length(code) AS code_chars")
+
+
+def file_fingerprints(paths: List[str]) -> List[dict]:
+    """输入文件的指纹（路径、大小、修改时间），文件不存在时 size 为 None"""
+    prints = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            prints.append({"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime})
+        except OSError:
+            prints.append({"path": os.path.abspath(path), "size": None, "mtime": None})
+    return prints
+
+
+class HistoryStore:
+    """线程安全（一个连接 + 锁），engine 线程和 Qt 主线程都可以直接调用"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path(HISTORY_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self.fts = self._create_fts()
+
+    def _create_fts(self) -> str:
+        """返回使用的分词器；SQLite 没有编译 FTS5 时返回空字符串，搜索退回 LIKE"""
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self._conn.executescript(_FTS_SCHEMA.format(tokenizer=tokenizer))
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        return ""
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- 写入 ----------
+    def add(self, kind: str, query: str = "", code: str = "", instruction: str = "",
+            files: Optional[List[str]] = None, parent_id: Optional[int] = None,
+            model: str = "", llm: Optional[dict] = None, status: str = "generated") -> int:
+        """
+        新增一条记录，返回 id。
+        kind: generate / edit / optimise / run；llm 为 generator.generate 填写的 stats
+        """
+        llm = llm or {}
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO entries (created, kind, parent_id, query, instruction, code, files, model, "
+                "llm_seconds, prompt_tokens, completion_tokens, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), kind, parent_id, query, instruction, code,
+                 json.dumps(file_fingerprints(files or []), ensure_ascii=False), model or llm.get("model", ""),
+                 llm.get("seconds"), llm.get("prompt_tokens"), llm.get("completion_tokens"), status))
+            return cursor.lastrowid
+
+    def finish_run(self, entry_id: int, stats: dict, log: str = ""):
+        """记录运行结果；stats 为 CodeRunner 的运行统计"""
+        returncode = stats.get("returncode")
+        status = stats.get("status", "ok")
+        if status == "ok" and returncode != 0:
+            status = "error"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET status = ?, returncode = ?, run_seconds = ?, peak_rss = ?, log = ? WHERE id = ?",
+                (status, returncode, stats.get("wall"), stats.get("peak_rss"), log[-MAX_LOG_CHARS:], entry_id))
+
+    def delete(self, entry_id: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+
+    # ---------- 读取 ----------
+    def get(self, entry_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["files"] = json.loads(entry["files"] or "[]")
+        return entry
+
+    def recent(self, limit: int = 200) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_LIST_COLUMNS} FROM entries ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, text: str, limit: int = 200, status: Optional[str] = None) -> List[dict]:
+        """
+        按空格分开的每个词都要出现（在需求、修改说明、代码或日志里）。
+        trigram 索引要求每个词至少 3 个字符，更短的词用 LIKE 扫描
+        """
+        terms = text.split()
+        if not terms:
+            rows = self.recent(limit)
+            return [r for r in rows if status is None or r["status"] == status]
+
+        where, params = [], []
+        if self.fts and all(len(t) >= 3 for t in terms):
+            match = " AND ".join('"{}"'.format(t.replace('"', '""')) for t in terms)
+            where.append("id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+            params.append(match)
+        else:
+            for term in terms:
+                like = "%{}%".format(term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"))
+                where.append("(" + " OR ".join(f"{col} LIKE ? ESCAPE '\\'"
+                                               for col in ("query", "instruction", "code", "log")) + ")")
+                params.extend([like] * 4)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = f"SELECT {_LIST_COLUMNS} FROM entries WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def successful(self, limit: int = 5000) -> List[dict]:
+        """成功运行过的记录（新的在前），给 retrieval 建索引用；优化记录的修改说明是性能报告，不返回"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, query, CASE WHEN kind = 'optimise' THEN '' ELSE instruction END AS instruction, "
+                "code FROM entries WHERE status = 'ok' ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def successful_version(self) -> tuple:
+        """成功记录的数量和最大 id，变化时检索索引需要重建"""
+        with self._lock:
+            return tuple(self._conn.execute("SELECT COUNT(*), MAX(id) FROM entries WHERE status = 'ok'").fetchone())
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM entries GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+
+_store: Optional[HistoryStore] = None
+
+
+def get_history() -> HistoryStore:
+    """进程内共用的 HistoryStore"""
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+    return _store
@@ -0,0 +1,139 @@
+import time
+
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QComboBox,
+                               QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView,
+                               QPlainTextEdit, QPushButton, QSplitter, QTabWidget, QLabel)
+from PySide6.QtCore import Qt, QTimer, Signal
+
+from .history import HistoryStore
+
+
+# =====================================================
+# 历史记录浏览 / 搜索 / 恢复
+# =====================================================
+class HistoryDialog(QDialog):
+    """列表 + 代码/日志预览；恢复时发出 restore_requested(记录, 是否立即运行)"""
+    restore_requested = Signal(dict, bool)
+
+    COLUMNS = ["Time", "Kind", "Status", "Query", "Model", "Tokens", "LLM", "Run"]
+    STATUSES = ["", "ok", "error", "timeout", "canceled", "generated"]
+
+    def __init__(self, store: HistoryStore, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("History")
+        self.resize(1100, 700)
+
+        layout = QVBoxLayout(self)
+        bar = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search queries, code and logs...")
+        self.status_combo = QComboBox()
+        self.status_combo.addItems([s or "all" for s in self.STATUSES])
+        self.count_label = QLabel()
+        bar.addWidget(self.search_edit, 1)
+        bar.addWidget(self.status_combo)
+        bar.addWidget(self.count_label)
+        layout.addLayout(bar)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+
+        self.preview_tabs = QTabWidget()
+        self.code_view = QPlainTextEdit()
+        self.code_view.setReadOnly(True)
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.preview_tabs.addTab(self.code_view, "Code")
+        self.preview_tabs.addTab(self.log_view, "Log")
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.preview_tabs)
+        splitter.setSizes([350, 350])
+        layout.addWidget(splitter, 1)
+
+        buttons = QHBoxLayout()
+        self.restore_button = QPushButton("Restore")
+        self.restore_button.setToolTip("Load the query and code back into the main window")
+        self.run_button = QPushButton("Restore && Run")
+        self.run_button.setToolTip("Load the code and run it again without calling the AI")
+        self.delete_button = QPushButton("Delete")
+        buttons.addWidget(self.restore_button)
+        buttons.addWidget(self.run_button)
+        buttons.addStretch()
+        buttons.addWidget(self.delete_button)
+        layout.addLayout(buttons)
+
+        # 输入停顿 200ms 后再搜索
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.refresh)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.status_combo.currentIndexChanged.connect(self.refresh)
+        self.table.itemSelectionChanged.connect(self.show_selected)
+        self.table.itemDoubleClicked.connect(lambda item: self.restore(run=False))
+        self.restore_button.clicked.connect(lambda: self.restore(run=False))
+        self.run_button.clicked.connect(lambda: self.restore(run=True))
+        self.delete_button.clicked.connect(self.delete_selected)
+
+        self.refresh()
+
+    def refresh(self):
+        status = self.STATUSES[self.status_combo.currentIndex()] or None
+        rows = self.store.search(self.search_edit.text(), status=status)
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            tokens = ""
+            if row["prompt_tokens"] is not None:
+                tokens = f"{row['prompt_tokens']}+{row['completion_tokens']}"
+            values = [
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created"])),
+                row["kind"],
+                row["status"] + (f" ({row['returncode']})" if row["returncode"] not in (None, 0) else ""),
+                (row["instruction"] or row["query"]).replace("\n", " ")[:200],
+                row["model"],
+                tokens,
+                f"{row['llm_seconds']:.1f}s" if row["llm_seconds"] is not None else "",
+                f"{row['run_seconds']:.1f}s" if row["run_seconds"] is not None else "",
+            ]
+            for c, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, row["id"])
+                self.table.setItem(r, c, item)
+        self.table.resizeColumnsToContents()
+        self.count_label.setText(f"{len(rows)} entries")
+        self.code_view.clear()
+        self.log_view.clear()
+
+    def selected_entry(self):
+        items = self.table.selectedItems()
+        if not items:
+            return None
+        return self.store.get(items[0].data(Qt.UserRole))
+
+    def show_selected(self):
+        entry = self.selected_entry()
+        if entry is None:
+            return
+        self.code_view.setPlainText(entry["code"])
+        self.log_view.setPlainText(entry["log"])
+
+    def restore(self, run: bool):
+        entry = self.selected_entry()
+        if entry is None:
+            return
+        self.restore_requested.emit(entry, run)
+
+    def delete_selected(self):
+        entry = self.selected_entry()
+        if entry is None:
+            return
+        self.store.delete(entry["id"])
+        self.refresh()
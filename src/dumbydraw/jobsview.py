@@ -0,0 +1,147 @@
+import time
+
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QSplitter, QLabel,
+                               QPushButton, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView,
+                               QSpinBox)
+from PySide6.QtCore import Qt, Signal
+
+from .gallery import FigureGallery
+from .scheduler import JobScheduler, RunJob, QUEUED, RUNNING
+
+
+# =====================================================
+# 单个任务的结果页：日志 + 图片
+# =====================================================
+class JobTab(QWidget):
+    # 日志最多保留的行数，并行跑很多任务时避免占满内存
+    MAX_LOG_LINES = 20000
+
+    def __init__(self, job: RunJob, parent=None):
+        super().__init__(parent)
+        self.job = job
+        layout = QVBoxLayout(self)
+        header = QHBoxLayout()
+        self.status_label = QLabel()
+        self.cancel_button = QPushButton("Cancel")
+        header.addWidget(self.status_label, 1)
+        header.addWidget(self.cancel_button)
+        layout.addLayout(header)
+
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(self.MAX_LOG_LINES)
+        self.gallery = FigureGallery()
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.log_view)
+        splitter.addWidget(self.gallery)
+        splitter.setSizes([400, 200])
+        layout.addWidget(splitter, 1)
+        self.update_status()
+
+    def drain(self) -> tuple:
+        """把任务队列里的新日志和图片显示出来，返回 (日志行, 图片) 供主窗口同步显示"""
+        lines, figures = [], []
+        while not self.job.log_queue.empty():
+            lines.append(self.job.log_queue.get())
+        while not self.job.figure_queue.empty():
+            figures.append(self.job.figure_queue.get())
+        if lines:
+            self.log_view.appendPlainText("\n".join(lines))
+        for figure in figures:
+            self.gallery.add_figure(figure)
+        return lines, figures
+
+    def update_status(self):
+        self.status_label.setText(self.job.describe())
+        self.cancel_button.setEnabled(not self.job.done)
+
+
+# =====================================================
+# 任务列表：状态、优先级、并行数
+# =====================================================
+class JobsPanel(QWidget):
+    """open_requested(任务 id)：双击或点 Open 时切换到这个任务的结果页"""
+    open_requested = Signal(int)
+
+    COLUMNS = ["#", "Name", "Priority", "Status", "Queued", "Run"]
+
+    def __init__(self, scheduler: JobScheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        layout = QVBoxLayout(self)
+
+        bar = QHBoxLayout()
+        bar.addWidget(QLabel("Parallel runs:"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(1, 64)
+        self.parallel_spin.setValue(scheduler.max_parallel)
+        self.parallel_spin.setToolTip("Default: min(CPU cores, available memory / per-run memory limit)")
+        self.parallel_spin.valueChanged.connect(scheduler.set_max_parallel)
+        bar.addWidget(self.parallel_spin)
+        bar.addStretch()
+        self.summary_label = QLabel()
+        bar.addWidget(self.summary_label)
+        layout.addLayout(bar)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        layout.addWidget(self.table, 1)
+
+        buttons = QHBoxLayout()
+        self.open_button = QPushButton("Open")
+        self.up_button = QPushButton("Priority +")
+        self.down_button = QPushButton("Priority -")
+        self.cancel_button = QPushButton("Cancel")
+        for button in (self.open_button, self.up_button, self.down_button):
+            buttons.addWidget(button)
+        buttons.addStretch()
+        buttons.addWidget(self.cancel_button)
+        layout.addLayout(buttons)
+
+        self.table.itemDoubleClicked.connect(lambda item: self.open_requested.emit(item.data(Qt.UserRole)))
+        self.open_button.clicked.connect(lambda: self._with_selected(self.open_requested.emit))
+        self.up_button.clicked.connect(lambda: self._change_priority(1))
+        self.down_button.clicked.connect(lambda: self._change_priority(-1))
+        self.cancel_button.clicked.connect(lambda: self._with_selected(self.scheduler.cancel))
+
+    def _with_selected(self, fn):
+        items = self.table.selectedItems()
+        if items:
+            fn(items[0].data(Qt.UserRole))
+
+    def _change_priority(self, delta: int):
+        def change(job_id):
+            job = self.scheduler.get(job_id)
+            if job is not None:
+                self.scheduler.set_priority(job_id, job.priority + delta)
+        self._with_selected(change)
+
+    def refresh(self):
+        selected = None
+        items = self.table.selectedItems()
+        if items:
+            selected = items[0].data(Qt.UserRole)
+        # 运行中、排队中的在前
+        order = {RUNNING: 0, QUEUED: 1}
+        jobs = sorted(self.scheduler.jobs(), key=lambda j: (order.get(j.status, 2), -j.priority, -j.id))
+        self.table.setRowCount(len(jobs))
+        now = time.time()
+        for r, job in enumerate(jobs):
+            waited = (job.started or now) - job.created
+            ran = ((job.finished or now) - job.started) if job.started else None
+            values = [str(job.id), job.name, str(job.priority), job.status, f"{waited:.1f}s",
+                      f"{ran:.1f}s" if ran is not None else ""]
+            for c, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, job.id)
+                self.table.setItem(r, c, item)
+            if job.id == selected:
+                self.table.selectRow(r)
+        n_running = sum(1 for j in jobs if j.status == RUNNING)
+        n_queued = sum(1 for j in jobs if j.status == QUEUED)
+        self.summary_label.setText(f"{n_running} running, {n_queued} queued")
@@ -0,0 +1,191 @@
+"""
+常驻的脚本执行进程（增量运行用）。
+
+用法: python kernel.py [--capture] [--capture-formats png,svg] [--limits JSON]
+
+从 stdin 逐行读取 JSON 命令，在同一个命名空间里执行：
+
+    {"op": "run", "script": "/tmp/x.py", "delete": ["old_var"],
+     "cells": [{"index": 0, "sig": "...", "lineno": 1, "source": "...", "action": "run" | "skip"}]}
+
+action 为 run 的单元按原行号编译执行；skip 的单元不执行，只回放它上次的输出。
+每个执行的单元结束后写回 "<MARKER_PREFIX>cell {"index", "status", "seconds"}"，
+全部结束（或某个单元出错）后处理剩下的图，写回 usage 和 "<MARKER_PREFIX>done {"status", "failed"}"。
+stdin 关闭时退出。图片钩子、资源限制复用 bootstrap.py，同样只能依赖标准库。
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import linecache
+import traceback
+
+import bootstrap
+
+MARKER_PREFIX = bootstrap.MARKER_PREFIX
+CELL_MARKER = MARKER_PREFIX + "cell "
+DONE_MARKER = MARKER_PREFIX + "done "
+
+
+class Tee(io.TextIOBase):
+    """写到原来的流，同时记下当前单元的输出，跳过这个单元时回放"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer_text = []
+
+    def write(self, text):
+        self.buffer_text.append(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def take(self):
+        text = "".join(self.buffer_text)
+        self.buffer_text = []
+        return text
+
+
+def _usage():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF)
+
+
+def report_usage(before):
+    """本次运行的 CPU 时间（差值）和进程的峰值内存"""
+    after = _usage()
+    if after is None:
+        return
+    rss = after.ru_maxrss if sys.platform == "darwin" else after.ru_maxrss * 1024
+    out = sys.__stdout__
+    out.write(bootstrap.USAGE_MARKER + json.dumps({
+        "peak_rss": rss,
+        "cpu_user": after.ru_utime - before.ru_utime,
+        "cpu_sys": after.ru_stime - before.ru_stime,
+    }) + "\n")
+    out.flush()
+
+
+def _send(marker, payload):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.__stdout__.write(marker + json.dumps(payload) + "\n")
+    sys.__stdout__.flush()
+
+
+def _show_figures():
+    """单元都执行完后，把没有 plt.show() 的图也送回去（和 bootstrap 的 atexit 一样）"""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is not None:
+        plt.show()
+
+
+def _print_error(script):
+    """只打印脚本里的调用栈，不包括 kernel 自己的帧"""
+    exc_type, exc, tb = sys.exc_info()
+    while tb is not None and tb.tb_frame.f_code.co_filename != script:
+        tb = tb.tb_next
+    traceback.print_exception(exc_type, exc, tb)
+
+
+class Kernel:
+    def __init__(self):
+        self.namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+        self.outputs = {}  # 单元签名 -> (stdout, stderr)
+        self.stdout = Tee(sys.stdout)
+        self.stderr = Tee(sys.stderr)
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+
+    def run(self, command):
+        script = command["script"]
+        before = _usage()
+        linecache.checkcache(script)
+        self.namespace["__file__"] = script
+        sys.argv = [script]
+        sys.path[0] = os.path.dirname(script)
+        for name in command.get("delete", []):
+            self.namespace.pop(name, None)
+        plt = sys.modules.get("matplotlib.pyplot")
+        if plt is not None:
+            plt.close("all")
+
+        status, failed = "ok", None
+        for cell in command["cells"]:
+            if cell["action"] == "skip":
+                out, err = self.outputs.get(cell["sig"], ("", ""))
+                self.stdout.stream.write(out)
+                self.stderr.stream.write(err)
+                continue
+
+            self.stdout.take()
+            self.stderr.take()
+            t_start = time.perf_counter()
+            cell_status = "ok"
+            try:
+                # 补齐前面的空行，报错和 linecache 的行号与整个脚本一致
+                code = compile("\n" * (cell["lineno"] - 1) + cell["source"], script, "exec")
+                exec(code, self.namespace)
+            except SystemExit as e:
+                # 脚本主动 exit：当作运行结束，后面的单元不再执行
+                if e.code not in (None, 0):
+                    print(e.code if isinstance(e.code, str) else f"SystemExit: {e.code}", file=sys.stderr)
+                    cell_status = "error"
+                else:
+                    cell_status = "exit"
+            except BaseException:
+                _print_error(script)
+                cell_status = "error"
+            self.outputs[cell["sig"]] = (self.stdout.take(), self.stderr.take())
+            _send(CELL_MARKER, {"index": cell["index"], "status": "ok" if cell_status == "exit" else cell_status,
+                                "seconds": time.perf_counter() - t_start})
+            if cell_status != "ok":
+                if cell_status == "error":
+                    status, failed = "error", cell["index"]
+                break
+
+        try:
+            _show_figures()
+        except Exception:
+            traceback.print_exc()
+        if before is not None:
+            report_usage(before)
+        _send(DONE_MARKER, {"status": status, "failed": failed})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="kernel.py")
+    parser.add_argument("--capture", action="store_true")
+    parser.add_argument("--capture-formats", default="png")
+    parser.add_argument("--limits", default=None)
+    args = parser.parse_args(argv)
+
+    if args.limits:
+        bootstrap.apply_limits(json.loads(args.limits))
+    if args.capture:
+        formats = tuple(f.strip() for f in args.capture_formats.split(",") if f.strip())
+        bootstrap.install_figure_hooks(None, True, formats)
+
+    # 命令通道只给 kernel 用，脚本里读 stdin 得到的是空输入
+    commands = sys.stdin
+    sys.stdin = io.StringIO()
+    kernel = Kernel()
+    while True:
+        line = commands.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        command = json.loads(line)
+        if command.get("op") == "run":
+            kernel.run(command)
+
+
+if __name__ == "__main__":
+    main()
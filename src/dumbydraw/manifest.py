@@ -0,0 +1,228 @@
+"""
+目录 / 大量文件的清单：拖进整个实验文件夹时，提示词里不放几千个路径，只放汇总。
+
+    manifest = build_manifest(dirs=["/data/exp1"], files=[...])
+    text = format_manifest(manifest)
+
+- 目录用 os.scandir 在线程池里并行遍历（每个目录一个任务，发现子目录就继续提交），文件大小顺便取到；
+- 清单包括：按扩展名的文件数和总大小、命名模式（路径里的数字换成 *，例如 plate*/well_*.tif ×5000）、
+  每种主要模式的示例路径，以及几个代表文件的探测结果（表格用 prompt.detect_table_files，
+  图片用 pillow 读尺寸，.npy 读数组头）；
+- 各部分都有条数上限，提示词长度和文件数无关。
+本模块不依赖 Qt。
+"""
+import os
+import re
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .filestore import IGNORED_NAMES
+
+
+MAX_EXTENSIONS = 12
+MAX_PATTERNS = 12
+MAX_PROBES = 4
+MAX_ROOTS = 10
+MAX_PREVIEW_CHARS = 1500
+DIGITS = re.compile(r"\d+")
+TABLE_EXTENSIONS = {".csv", ".tsv", ".xlsx", ".xls", ".xlsm", ".xlsb", ".ods"}
+IMAGE_EXTENSIONS = {".tif", ".tiff", ".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
+
+
+def default_workers() -> int:
+    # 遍历目录主要在等文件系统，线程数可以比核数多
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def _list_dir(directory: str) -> Tuple[List[Tuple[str, int]], List[str]]:
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            subdirs.append(entry.path)
+                    elif entry.is_file() and entry.name not in IGNORED_NAMES:
+                        files.append((entry.path, entry.stat().st_size))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+
+def scan_dirs(roots: List[str], workers: Optional[int] = None,
+              should_stop: Optional[Callable[[], bool]] = None) -> List[Tuple[str, int]]:
+    """并行遍历目录，返回按路径排序的 [(文件路径, 大小)]"""
+    results: List[Tuple[str, int]] = []
+    with ThreadPoolExecutor(workers or default_workers()) as pool:
+        pending = {pool.submit(_list_dir, root) for root in roots}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                results.extend(files)
+                if not (should_stop and should_stop()):
+                    pending |= {pool.submit(_list_dir, d) for d in subdirs}
+    results.sort()
+    return results
+
+
+def stat_files(paths: List[str], workers: Optional[int] = None) -> List[Tuple[str, int]]:
+    """并行取一批文件的大小（不存在的文件大小记为 0）"""
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    with ThreadPoolExecutor(workers or default_workers()) as pool:
+        return list(zip(paths, pool.map(size, paths, chunksize=256)))
+
+
+# =====================================================
+# 汇总
+# =====================================================
+def _pattern(path: str, root: Optional[str]) -> str:
+    rel = os.path.relpath(path, root) if root else os.path.basename(path)
+    return DIGITS.sub("*", rel.replace(os.sep, "/"))
+
+
+def _root_of(path: str, roots: List[str]) -> Optional[str]:
+    for root in roots:
+        if path.startswith(root.rstrip(os.sep) + os.sep):
+            return root
+    return None
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower() or "(no ext)"
+
+
+def image_info(path: str) -> Optional[dict]:
+    """图片尺寸和模式（需要 pillow，没有安装时返回 None）"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(path) as image:
+            return {"size": image.size, "mode": image.mode, "frames": getattr(image, "n_frames", 1)}
+    except Exception:
+        return None
+
+
+def probe(path: str) -> Optional[str]:
+    """对一个代表文件做快速探测，返回一段描述；探测不了时返回 None"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TABLE_EXTENSIONS:
+        from .prompt import detect_table_files
+        info = detect_table_files([path]).get(path, {})
+        if "columns" not in info:
+            return None
+        text = f"{info['rows']}行 x {info['columns']}列，前几行：\n{info['preview']}"
+        return text if len(text) <= MAX_PREVIEW_CHARS else text[:MAX_PREVIEW_CHARS] + "\n..."
+    if ext in IMAGE_EXTENSIONS:
+        info = image_info(path)
+        if info is None:
+            return None
+        width, height = info["size"]
+        return f"图片 {width}x{height}，模式 {info['mode']}" + (f"，{info['frames']} 帧" if info["frames"] > 1 else "")
+    if ext == ".npy":
+        from .dataio import npy_header
+        try:
+            header = npy_header(path)
+        except Exception:
+            return None
+        return f"numpy 数组 shape={header['shape']}, dtype={header['dtype']}"
+    return None
+
+
+def build_manifest(dirs: List[str] = (), files: List[str] = (), workers: Optional[int] = None,
+                   probes: int = MAX_PROBES) -> dict:
+    """
+    dirs 递归遍历，files 直接统计；返回
+    {"roots", "count", "size", "extensions": [(扩展名, 个数, 大小)], "patterns": [(模式, 个数, 示例路径)],
+     "samples": [(路径, 探测结果)]}
+    """
+    dirs = [os.path.abspath(d) for d in dirs]
+    entries = scan_dirs(dirs, workers) if dirs else []
+    if files:
+        entries += stat_files(list(files), workers)
+
+    extensions: Dict[str, List[int]] = {}
+    patterns: Dict[str, list] = {}
+    for path, size in entries:
+        ext = extensions.setdefault(_extension(path), [0, 0])
+        ext[0] += 1
+        ext[1] += size
+        root = _root_of(path, dirs)
+        key = (root.rstrip(os.sep) + "/" if root else "") + _pattern(path, root)
+        item = patterns.setdefault(key, [0, path])
+        item[0] += 1
+
+    ranked_ext = sorted(((e, c, s) for e, (c, s) in extensions.items()), key=lambda x: (-x[1], x[0]))
+    ranked_patterns = sorted(((p, c, example) for p, (c, example) in patterns.items()), key=lambda x: (-x[1], x[0]))
+
+    # 代表文件：数量最多的几种能探测的模式，各取第一个
+    samples = []
+    for _pattern_key, _count, example in ranked_patterns:
+        if len(samples) >= probes:
+            break
+        ext = os.path.splitext(example)[1].lower()
+        if ext in TABLE_EXTENSIONS or ext in IMAGE_EXTENSIONS or ext == ".npy":
+            result = probe(example)
+            if result:
+                samples.append((example, result))
+
+    return {
+        "roots": dirs,
+        "count": len(entries),
+        "size": sum(size for _path, size in entries),
+        "largest": max(entries, key=lambda e: e[1]) if entries else None,
+        "extensions": ranked_ext,
+        "patterns": ranked_patterns,
+        "samples": samples,
+    }
+
+
+def manifest_levels(manifest: dict) -> List[str]:
+    """token 预算用的几档清单：完整 / 不带代表文件的探测结果 / 只有最多的几种扩展名和命名"""
+    brief = dict(manifest, samples=[], extensions=manifest["extensions"][:3], patterns=manifest["patterns"][:3])
+    return [format_manifest(manifest), format_manifest(dict(manifest, samples=[])), format_manifest(brief)]
+
+
+def format_manifest(manifest: dict) -> str:
+    """把清单拼成追加到系统提示词里的文字（长度有上限）"""
+    from .download import format_bytes
+
+    if not manifest["count"]:
+        return ""
+    text = "\n\n用户导入的文件较多，下面是汇总清单（不是完整列表，代码里请用 glob / os.walk 按模式查找文件）：\n"
+    roots = manifest["roots"]
+    if roots:
+        text += "目录：" + "、".join(roots[:MAX_ROOTS]) + (f" 等 {len(roots)} 个" if len(roots) > MAX_ROOTS else "") + "\n"
+    text += f"共 {manifest['count']} 个文件，{format_bytes(manifest['size'])}"
+    if manifest["largest"]:
+        text += f"，最大的是 {manifest['largest'][0]}（{format_bytes(manifest['largest'][1])}）"
+    text += "\n"
+
+    text += "按扩展名：\n"
+    for ext, count, size in manifest["extensions"][:MAX_EXTENSIONS]:
+        text += f"  {ext}: {count} 个，{format_bytes(size)}\n"
+    rest = manifest["extensions"][MAX_EXTENSIONS:]
+    if rest:
+        text += f"  其它 {len(rest)} 种扩展名共 {sum(c for _e, c, _s in rest)} 个\n"
+
+    text += "命名模式（数字换成了 *）：\n"
+    for pattern, count, example in manifest["patterns"][:MAX_PATTERNS]:
+        text += f"  {pattern} ×{count}，例如 {example}\n"
+    rest = manifest["patterns"][MAX_PATTERNS:]
+    if rest:
+        text += f"  其它 {len(rest)} 种命名共 {sum(c for _p, c, _e in rest)} 个文件\n"
+
+    for path, result in manifest["samples"]:
+        text += f"\n代表文件：{path}\n{result}\n"
+    return text
@@ -0,0 +1,338 @@
+"""
+本地模拟 LLM 服务：dumbydraw mock-llm
+
+兼容 OpenAI 的 /v1/chat/completions（流式和非流式），按顺序回放录制好的回答，
+包括 DeepSeek-R1 风格的 reasoning_content。首字延迟、生成速度和出错概率都可以配置，
+用来在不花钱、不联网的情况下测“生成 → 运行”整条链路的延迟、取消和流式输出。
+
+    dumbydraw mock-llm --port 8766 --ttft 0.8 --tps 40 --recordings recordings.jsonl
+
+然后把配置里的 baseurl 设为 http://127.0.0.1:8766/v1（或设置环境变量 DUMBYDRAW_BASE_URL，只替换默认接口）。
+
+录制文件每行一个 JSON：
+    {"match": "柱状图", "reasoning": "...", "content": "```python\\n...\\n```"}
+    {"match": "boom", "error": 429}                   # 命中时固定返回错误
+    {"content": "...", "ttft": 0.1, "tps": 200}       # 单条覆盖速度
+match 是用户输入里的子串；没有命中时按用户输入的哈希在不带 match 的条目里固定选一条。
+
+    GET  /v1/models
+    POST /v1/chat/completions
+    GET  /mock/stats        请求数、错误数、中途断开数
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import zlib
+import random
+import socket
+import struct
+import asyncio
+import argparse
+
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+DEFAULT_MODEL = "mock-model"
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+DEFAULT_RECORDING = {
+    "reasoning": "The user wants a simple plot.\nI will draw a sine wave with matplotlib.\n",
+    "content": ("```python\n"
+                "import numpy as np\n"
+                "import matplotlib.pyplot as plt\n"
+                "\n"
+                "# 画一条正弦曲线\n"
+                "x = np.linspace(0, 2 * np.pi, 200)\n"
+                "plt.plot(x, np.sin(x))\n"
+                "plt.title(\"Sine\")\n"
+                "print(\"done\")\n"
+                "plt.show()\n"
+                "```"),
+}
+
+_TOKEN_RE = re.compile(r"\s*\S+|\s+")
+
+
+def split_tokens(text: str) -> List[str]:
+    """粗略按“空白 + 单词”切分，拼回去与原文完全一致"""
+    return _TOKEN_RE.findall(text or "")
+
+
+def load_recordings(path: Optional[str]) -> List[dict]:
+    if not path:
+        return [DEFAULT_RECORDING]
+    recordings = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                recordings.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})")
+    if not recordings:
+        raise ValueError(f"{path}: no recordings")
+    return recordings
+
+
+# =====================================================
+# 服务
+# =====================================================
+class MockLLMServer:
+    def __init__(self, recordings: Optional[List[dict]] = None, ttft: float = 0.5, tps: float = 50.0,
+                 tokens_per_chunk: int = 1, error_rate: float = 0.0, error_status: int = 500,
+                 disconnect_rate: float = 0.0, seed: int = 0, model: str = DEFAULT_MODEL,
+                 reject_stream_options: bool = False):
+        self.recordings = recordings or [DEFAULT_RECORDING]
+        self.ttft = ttft
+        self.tps = tps
+        self.tokens_per_chunk = max(1, tokens_per_chunk)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.disconnect_rate = disconnect_rate
+        self.model = model
+        # 模拟不认 stream_options 的兼容接口：带了这个参数就返回 400
+        self.reject_stream_options = reject_stream_options
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "completed": 0, "errors": 0, "disconnects": 0, "client_aborts": 0}
+        self._server = None
+
+    def pick(self, query: str) -> dict:
+        for recording in self.recordings:
+            if recording.get("match") and recording["match"] in query:
+                return recording
+        fallback = [r for r in self.recordings if not r.get("match")] or self.recordings
+        return fallback[zlib.crc32(query.encode("utf-8")) % len(fallback)]
+
+    # ---------- HTTP ----------
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        address = await self.start(host, port)
+        print(f"🤖 Mock LLM listening on http://{address[0]}:{address[1]}/v1 "
+              f"(ttft={self.ttft}s, {self.tps} tokens/s, {len(self.recordings)} recordings)", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _version = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0) or 0)
+            body = await reader.readexactly(length) if length else b""
+            await self._dispatch(method.upper(), urlsplit(target).path.rstrip("/"), body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.stats["client_aborts"] += 1
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    def _send(writer, status: int, data, extra_headers: str = ""):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"{extra_headers}"
+                f"Connection: close\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    def _send_error(self, writer, status: int, message: str):
+        self.stats["errors"] += 1
+        error_type = "rate_limit_error" if status == 429 else "server_error" if status >= 500 else "invalid_request_error"
+        extra = "Retry-After: 1\r\n" if status == 429 else ""
+        self._send(writer, status, {"error": {"message": message, "type": error_type, "code": status}}, extra)
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer):
+        if path == "/v1/models":
+            return self._send(writer, 200, {"object": "list", "data": [
+                {"id": self.model, "object": "model", "created": 0, "owned_by": "dumbydraw"}]})
+        if path == "/mock/stats":
+            return self._send(writer, 200, self.stats)
+        if path != "/v1/chat/completions":
+            return self._send(writer, 404, {"error": {"message": "not found", "code": 404}})
+        if method != "POST":
+            return self._send(writer, 405, {"error": {"message": "POST required", "code": 405}})
+
+        self.stats["requests"] += 1
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            return self._send_error(writer, 400, "invalid JSON")
+        if self.reject_stream_options and "stream_options" in request:
+            return self._send_error(writer, 400, "Unrecognized request argument supplied: stream_options")
+        messages = request.get("messages") or []
+        query = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        recording = self.pick(str(query))
+        model = request.get("model") or self.model
+
+        if recording.get("error"):
+            return self._send_error(writer, int(recording["error"]), "injected error (recording)")
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self._send_error(writer, self.error_status, "injected error")
+        disconnect = bool(self.disconnect_rate) and self.random.random() < self.disconnect_rate
+
+        ttft = float(recording.get("ttft", self.ttft))
+        tps = float(recording.get("tps", self.tps))
+        reasoning = split_tokens(recording.get("reasoning", ""))
+        content = split_tokens(recording.get("content", ""))
+        usage = {"prompt_tokens": sum(len(split_tokens(str(m.get("content") or ""))) for m in messages),
+                 "completion_tokens": len(reasoning) + len(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not request.get("stream"):
+            await asyncio.sleep(ttft + (len(reasoning) + len(content)) / tps if tps > 0 else ttft)
+            message = {"role": "assistant", "content": "".join(content)}
+            if reasoning:
+                message["reasoning_content"] = "".join(reasoning)
+            self.stats["completed"] += 1
+            return self._send(writer, 200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+                "model": model, "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": usage})
+
+        await self._stream(writer, model, reasoning, content, ttft, tps, disconnect,
+                           include_usage=bool((request.get("stream_options") or {}).get("include_usage")),
+                           usage=usage)
+
+    async def _stream(self, writer, model: str, reasoning: List[str], content: List[str], ttft: float, tps: float,
+                      disconnect: bool, include_usage: bool, usage: dict):
+        """SSE 流：先发 reasoning_content，再发 content，速度按 tps 控制"""
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        await writer.drain()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> bytes:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            data.update(extra)
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        tokens = [("reasoning_content", t) for t in reasoning] + [("content", t) for t in content]
+        cut = len(tokens) // 2 if disconnect else None
+
+        await asyncio.sleep(ttft)
+        writer.write(chunk({"role": "assistant", "content": ""}))
+        start = time.perf_counter()
+        step = self.tokens_per_chunk
+        for i in range(0, len(tokens), step):
+            if cut is not None and i >= cut:
+                # 模拟服务端中途断开：不发 [DONE]，直接重置连接
+                self.stats["disconnects"] += 1
+                sock = writer.get_extra_info("socket")
+                if sock is not None:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                writer.transport.abort()
+                return
+            group = tokens[i:i + step]
+            delta = {}
+            for field, token in group:
+                delta[field] = delta.get(field, "") + token
+            if "reasoning_content" in delta and "content" not in delta:
+                delta["content"] = None
+            writer.write(chunk(delta))
+            await writer.drain()
+            if tps > 0:
+                # 按绝对时间对齐，sleep 的误差不会累积
+                delay = start + (i + len(group)) / tps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+        writer.write(chunk({}, "stop"))
+        if include_usage:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": usage}
+            writer.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+        self.stats["completed"] += 1
+
+
+# =====================================================
+# 命令行
+# =====================================================
+def build_parser(parser: Optional[argparse.ArgumentParser] = None) -> argparse.ArgumentParser:
+    parser = parser or argparse.ArgumentParser(prog="dumbydraw mock-llm")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--recordings", default=None, help="JSONL file of recorded completions")
+    parser.add_argument("--ttft", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=50.0, help="tokens per second (0 = as fast as possible)")
+    parser.add_argument("--tokens-per-chunk", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an HTTP error response")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0,
+                        help="probability of dropping the stream halfway")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model id reported by /v1/models")
+    parser.add_argument("--reject-stream-options", action="store_true",
+                        help="answer 400 to requests that send stream_options, like some compatible servers")
+    return parser
+
+
+def run(args) -> int:
+    from .engine import get_engine
+
+    server = MockLLMServer(
+        recordings=load_recordings(args.recordings),
+        ttft=args.ttft,
+        tps=args.tps,
+        tokens_per_chunk=args.tokens_per_chunk,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed,
+        model=args.model,
+        reject_stream_options=args.reject_stream_options,
+    )
+    engine = get_engine()
+    job = engine.submit(server.serve_forever(args.host, args.port), name="mock-llm")
+    try:
+        job.result()
+    except KeyboardInterrupt:
+        print("🛑 stopping mock LLM")
+        job.cancel()
+    finally:
+        engine.shutdown()
+    return 0
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+大数据量绘图辅助函数，供生成的代码使用：
+
+    from dumbydraw.plotting import plot_line, plot_density
+
+    plot_line(ax, t, signal)          # 自动降采样到约 4000 点再画折线
+    plot_density(ax, x, y, bins=512)  # 散点太多时画成二维直方图（密度图）
+
+全部用 NumPy 向量化实现，千万级数据也能在一秒左右画完。
+"""
+import numpy as np
+
+from typing import Tuple
+
+
+DEFAULT_MAX_POINTS = 4000
+
+
+def _as_xy(x, y):
+    y = np.asarray(y)
+    if x is None:
+        x = np.arange(len(y))
+    else:
+        x = np.asarray(x)
+    if len(x) != len(y):
+        raise ValueError(f"x and y must have the same length, got {len(x)} and {len(y)}")
+    return x, y
+
+
+# =====================================================
+# 折线降采样
+# =====================================================
+def minmax_downsample(x, y, n_out: int = DEFAULT_MAX_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min-max 降采样：把数据等分成 n_out/2 段，每段保留最小值和最大值两个点。
+    能保住所有尖峰，适合信号、仪器曲线。x 为 None 时使用下标。
+    """
+    x, y = _as_xy(x, y)
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return x, y
+
+    n_bins = n_out // 2
+    size = -(-n // n_bins)  # 向上取整
+    pad = n_bins * size - n
+    yf = y.astype(np.float64, copy=False)
+    nan = np.isnan(yf)
+    low = np.where(nan, np.inf, yf)
+    high = np.where(nan, -np.inf, yf)
+    if pad:
+        low = np.concatenate([low, np.full(pad, np.inf)])
+        high = np.concatenate([high, np.full(pad, -np.inf)])
+
+    offsets = np.arange(n_bins) * size
+    i_min = low.reshape(n_bins, size).argmin(axis=1) + offsets
+    i_max = high.reshape(n_bins, size).argmax(axis=1) + offsets
+    idx = np.sort(np.stack([i_min, i_max], axis=1), axis=1).ravel()
+    idx = idx[idx < n]
+    # 单调的段里 min 和 max 可能是同一个点
+    keep = np.concatenate([[True], np.diff(idx) != 0])
+    idx = idx[keep]
+    return x[idx], y[idx]
+
+
+def lttb(x, y, n_out: int = DEFAULT_MAX_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets 降采样，视觉上最接近原曲线。
+    每个桶内的计算是向量化的，循环次数只有 n_out 次。x 为 None 时使用下标。
+    NaN / inf 的点先去掉（否则桶的平均点是 NaN，整桶的面积都算不出来）。
+    """
+    x, y = _as_xy(x, y)
+    if len(y) <= n_out or n_out < 3:
+        return x, y
+
+    xf = x.astype(np.float64, copy=False)
+    yf = y.astype(np.float64, copy=False)
+    valid = np.isfinite(xf) & np.isfinite(yf)
+    if not valid.all():
+        x, y, xf, yf = x[valid], y[valid], xf[valid], yf[valid]
+    n = len(y)
+    if n <= n_out:
+        return x, y
+
+    # 第一个和最后一个点固定保留，中间 n_out-2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # 每个桶的平均点，作为“下一个桶”的代表
+    counts = ends - starts
+    avg_x = np.add.reduceat(xf[1:n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(yf[1:n - 1], starts - 1) / counts
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a_x, a_y = xf[0], yf[0]
+    for i in range(n_out - 2):
+        start, end = starts[i], ends[i]
+        if i + 1 < n_out - 2:
+            c_x, c_y = avg_x[i + 1], avg_y[i + 1]
+        else:
+            c_x, c_y = xf[-1], yf[-1]
+        bx = xf[start:end]
+        by = yf[start:end]
+        # 三角形面积的两倍（省略常数因子）
+        area = np.abs((a_x - c_x) * (by - a_y) - (a_x - bx) * (c_y - a_y))
+        best = start + int(np.argmax(area))
+        idx[i + 1] = best
+        a_x, a_y = xf[best], yf[best]
+
+    return x[idx], y[idx]
+
+
+def downsample(x, y, n_out: int = DEFAULT_MAX_POINTS, method: str = "minmax"):
+    """按 method（"minmax" 或 "lttb"）降采样"""
+    if method == "minmax":
+        return minmax_downsample(x, y, n_out)
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    raise ValueError(f"unknown downsample method: {method}")
+
+
+def plot_line(ax, x, y=None, max_points: int = DEFAULT_MAX_POINTS, method: str = "minmax", **kwargs):
+    """
+    ax.plot 的替代品：点数超过 max_points 时先降采样。
+    只传一个数组时当作 y 处理，与 ax.plot 一致。
+    """
+    if y is None:
+        x, y = None, x
+    x, y = downsample(x, y, max_points, method)
+    return ax.plot(x, y, **kwargs)
+
+
+# =====================================================
+# 散点密度栅格化
+# =====================================================
+def density_image(x, y, bins=512, range=None, weights=None) -> Tuple[np.ndarray, list]:
+    """
+    把散点按二维网格计数（等价于 np.histogram2d，但用 bincount 实现，快很多）。
+    Returns:
+        (counts, extent): counts 形状为 (ny, nx)，行对应 y；extent 可直接传给 imshow
+    """
+    x = np.asarray(x, dtype=np.float64).ravel()
+    y = np.asarray(y, dtype=np.float64).ravel()
+    if len(x) != len(y):
+        raise ValueError(f"x and y must have the same length, got {len(x)} and {len(y)}")
+    nx, ny = (bins, bins) if np.isscalar(bins) else bins
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+        if weights is not None:
+            weights = np.asarray(weights).ravel()[valid]
+
+    if range is None:
+        if len(x) == 0:
+            range = ((0.0, 1.0), (0.0, 1.0))
+        else:
+            range = ((x.min(), x.max()), (y.min(), y.max()))
+    (x0, x1), (y0, y1) = range
+    if x1 == x0:
+        x1 = x0 + 1.0
+    if y1 == y0:
+        y1 = y0 + 1.0
+
+    ix = ((x - x0) * (nx / (x1 - x0))).astype(np.int64)
+    iy = ((y - y0) * (ny / (y1 - y0))).astype(np.int64)
+    # 右边界上的点归到最后一格，与 histogram2d 一致
+    ix[ix == nx] = nx - 1
+    iy[iy == ny] = ny - 1
+    inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+    if not inside.all():
+        ix, iy = ix[inside], iy[inside]
+        if weights is not None:
+            weights = weights[inside]
+
+    counts = np.bincount(iy * nx + ix, weights=weights, minlength=nx * ny).reshape(ny, nx)
+    return counts, [x0, x1, y0, y1]
+
+
+def plot_density(ax, x, y, bins=512, range=None, weights=None, log: bool = True,
+                 cmap: str = "viridis", colorbar: bool = True, **kwargs):
+    """
+    散点图的替代品：先栅格化成密度图再 imshow，图片大小与点数无关。
+    log=True 时使用对数色标（计数为 0 的格子留白）。
+    """
+    from matplotlib.colors import LogNorm
+
+    counts, extent = density_image(x, y, bins=bins, range=range, weights=weights)
+    norm = None
+    if log:
+        counts = np.ma.masked_less_equal(counts, 0)
+        if counts.count():
+            norm = LogNorm(vmin=counts.min(), vmax=counts.max())
+    image = ax.imshow(counts, origin="lower", extent=extent, aspect="auto",
+                      cmap=cmap, norm=norm, interpolation="nearest", **kwargs)
+    if colorbar:
+        ax.figure.colorbar(image, ax=ax, label="count")
+    return image
+
+
+def rasterize_scatter(ax, x, y, max_points: int = 200000, **kwargs):
+    """
+    点数不多时照常画散点，超过 max_points 时改用 plot_density。
+    普通散点也会 rasterized=True，保存 PDF/SVG 时不会生成百万个矢量对象。
+    """
+    if len(x) <= max_points:
+        kwargs.setdefault("rasterized", True)
+        return ax.scatter(x, y, **kwargs)
+    density_kwargs = {k: kwargs[k] for k in ("bins", "range", "weights", "log", "cmap", "colorbar") if k in kwargs}
+    return plot_density(ax, x, y, **density_kwargs)
@@ -0,0 +1,334 @@
+import os
+import sys
+
+from typing import Callable, Dict, List, Optional
+
+
+# =========================================
+# 系统信息获取
+#==========================================
+def get_sys_info():
+    venv_path = sys.prefix
+    # print(f"当前虚拟环境路径: {venv_path}")
+    executable = sys.executable
+    # print(f"Python解释器地址: {executable}")
+    os_info = sys.platform
+    # print(f"操作系统是{os_info}")
+    conda_env_path = os.environ.get('CONDA_PREFIX', None)
+    if conda_env_path:
+        conda_env_path = f"CONDA_PREFIX是{conda_env_path}"
+
+    info = (f"\n用户当前平台信息：\n\n当前虚拟环境路径: {venv_path}\n Python解释器地址: {executable}\n 操作系统是{os_info}\n{conda_env_path}")
+    print(info)
+    return info
+
+
+# =========================================
+# 系统提示词
+#==========================================
+def build_system_prompt(sys_info: str) -> str:
+    """生成代码用的基础系统提示词"""
+    return f"""你是一个python绘图代码生成工具，你能根据用户的输入直接生成代码。
+你输出的内容只能有完整的代码，不能有代码之外的其它东西。
+输出必须是 markdown ``` ``` 包裹的代码，之外不能有任何说明，说明只能是代码里的注释。
+禁止 if __name__ == "__main__",代码结尾不要带plt.close()，即使保存了图片，也要plt.show().
+尽量只有一次plt.show(), 若图少于4，尽量合成一张大图
+除非用户指定了其它语言或者字体，否则务必使用英文作为图注、图题。中文一定要注意字体。
+代码中的注释与用户输入的语言一致，但是代码中的print("")不能是中文。
+注意用户输入的第几第几是人类语言，是从1开始，而不是python的从0开始
+你代码中可以用python内置工具以及以下的第三方工具：
+matplotlib==3.7.5
+seaborn
+pandas
+openpyxl
+pillow
+requests
+biopython
+numpy
+scipy
+cartopy
+不在上表的第三方包也可以直接 import，程序会在运行前检查（用户开启了自动安装时会装好）。
+代码里禁止安装任何包：不要调用 pip（包括 subprocess、os.system、try/except ImportError 里安装）。
+如果需要处理双端测序NGS数据，你需要自行写相应的代码实现，并一定要处理测序数据中间overlap而不能直接简单相加
+数据点很多（超过10万）时，不要直接 ax.plot / ax.scatter 原始数据，改用本程序自带的辅助模块：
+from dumbydraw.plotting import plot_line, plot_density, rasterize_scatter, minmax_downsample, lttb
+plot_line(ax, x, y, max_points=4000, method="minmax")  # 折线自动降采样，method 可选 "minmax"（保留尖峰）或 "lttb"
+plot_density(ax, x, y, bins=512, log=True)  # 大量散点画成二维密度图
+rasterize_scatter(ax, x, y)  # 点少时普通散点，点多时自动改成密度图
+minmax_downsample(x, y, n_out) / lttb(x, y, n_out)  # 只降采样，返回 (x, y)
+
+{sys_info}
+"""
+
+
+CONNECTION_TEST_PROMPT = """你是一个python绘图代码生成工具，你能根据用户的输入直接生成代码。
+           你输出的内容只能有代码，不能有代码之外的其它东西。
+           输出必须是 markdown ``` ``` 包裹的代码。
+           禁止 if __name__ == "__main__",代码结尾不要带plt.close()，即使保存了图片，也要plt.show()。尽量只有一个plt.show(),这样我才能把图都显示出来
+           除非用户指定了其它语言或者字体，否则务必使用英文作为图注、图题。
+           代码中的注释与用户输入的语言一致
+           """
+
+
+# =========================================
+# 用户文件检测
+#==========================================
+TABLE_EXTENSIONS = ['.csv', '.xlsx', '.xls', '.xlsm', '.xlsb', '.ods', '.tsv']
+BINARY_ARRAY_EXTENSIONS = ['.npy', '.bin', '.dat', '.raw']
+
+FILE_INFO_HEADER = "\n\n用户上传的文件信息如下：\n"
+
+LARGE_DATA_GUIDE = """
+注意：标记为“大文件”的数据可能比内存还大，禁止 pd.read_csv / pd.read_excel / np.load 整个文件，
+改用本程序自带的数据访问模块（不要自己实现）：
+from dumbydraw.dataio import iter_chunks, groupby_aggregate, column_stats, sample_rows, memmap_array
+for chunk in iter_chunks(path, chunksize=1_000_000, columns=[...]):  # 逐块 DataFrame，只读需要的列
+    ...
+groupby_aggregate(path, by="列名", agg={"数值列": ["mean", "std", "count"]})  # 分块分组统计，支持 sum/count/min/max/mean/std/var
+column_stats(path, columns=[...])  # 分块 count/mean/std/min/max
+sample_rows(path, n=200_000)  # 均匀抽样后再画散点
+memmap_array(path, dtype="float32", shape=None)  # 二进制数组 / .npy 的内存映射，切片访问
+画长序列时再配合 dumbydraw.plotting 的 plot_line / plot_density。
+"""
+
+
+def detect_table_files(files: List[str]) -> Dict[str, dict]:
+    """
+    检测列表中的文件是否是表格文件，并读取前15行内容
+    返回包含表格信息的字典
+    """
+    # pandas / numpy 较重，第一次检测文件时才 import，不拖慢窗口显示
+    import pandas as pd
+    from .dataio import is_large, file_size, estimate_rows, npy_header
+
+    table_info = {}
+
+    for file_path in files:
+        # 检查文件扩展名是否是常见的表格文件
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if file_ext in TABLE_EXTENSIONS and is_large(file_path):
+            # 大文件只读前15行，行数按文件大小估算
+            try:
+                print(f"📊 检测到大表格文件: {file_path}")
+                if file_ext in ['.csv', '.tsv']:
+                    df = pd.read_csv(file_path, nrows=15, sep='\t' if file_ext == '.tsv' else ',')
+                    num_rows = f"约{estimate_rows(file_path)}"
+                else:
+                    df = pd.read_excel(file_path, nrows=15, engine='odf' if file_ext == '.ods' else 'openpyxl')
+                    num_rows = "未知"
+                table_info[file_path] = {
+                    'path': file_path,
+                    'rows': num_rows,
+                    'columns': df.shape[1],
+                    'names': [str(c) for c in df.columns],
+                    'preview': df.to_string(index=False),
+                    'size': file_size(file_path),
+                    'large': True
+                }
+            except Exception as e:
+                print(f"⚠️ 读取表格文件 {file_path} 时出错: {e}")
+                table_info[file_path] = {'path': file_path, 'size': file_size(file_path), 'large': True}
+        elif file_ext in BINARY_ARRAY_EXTENSIONS and os.path.isfile(file_path):
+            info = {'path': file_path, 'size': file_size(file_path), 'large': is_large(file_path)}
+            if file_ext == '.npy':
+                try:
+                    info['array'] = npy_header(file_path)
+                except Exception as e:
+                    print(f"⚠️ 读取数组头 {file_path} 时出错: {e}")
+            table_info[file_path] = info
+        elif file_ext in TABLE_EXTENSIONS:
+            try:
+                print(f"📊 检测到表格文件: {file_path}")
+
+                # 根据文件扩展名选择读取方式
+                if file_ext == '.csv':
+                    df = pd.read_csv(file_path)
+                elif file_ext in ['.xlsx', '.xls', '.xlsm', '.xlsb']:
+                    # Excel文件读取第一个工作表
+                    df = pd.read_excel(file_path, engine='openpyxl')
+                elif file_ext == '.ods':
+                    # ODS文件
+                    df = pd.read_excel(file_path, engine='odf')
+                elif file_ext == '.tsv':
+                    # TSV文件
+                    df = pd.read_csv(file_path, sep='\t')
+                else:
+                    continue
+
+                # 获取表格信息
+                num_rows, num_cols = df.shape
+
+                # 将DataFrame转换为字符串表示
+                df_str = df.head(15).to_string(index=False)
+
+                table_info[file_path] = {
+                    'path': file_path,
+                    'rows': num_rows,
+                    'columns': num_cols,
+                    'names': [str(c) for c in df.columns],
+                    'preview': df_str
+                }
+
+                print(f"✅ 成功读取表格文件: {file_path} ({num_rows}行, {num_cols}列)")
+
+            except Exception as e:
+                print(f"⚠️ 读取表格文件 {file_path} 时出错: {e}")
+                # 如果文件不是有效的表格，继续下一个文件
+                continue
+        else:
+            table_info[file_path] = {
+                'path': file_path
+            }
+    return table_info
+
+
+PREVIEW_ROWS = 15
+SHORT_PREVIEW_ROWS = 5
+MAX_COLUMN_NAMES = 60
+
+
+def describe_file(file_path: str, info: dict, preview_rows: int = PREVIEW_ROWS) -> str:
+    """
+    一个文件的描述；preview_rows 是表格预览的行数（最多 15 行），
+    为 0 时不放预览，只列列名（token 预算不够时用）
+    """
+    text = f"\n文件：{file_path}\n"
+    if info.get('large'):
+        text += f"大文件：{info['size'] / 1024 ** 2:.0f} MB，必须用 dumbydraw.dataio 分块或内存映射读取\n"
+    if 'array' in info:
+        text += f"numpy 数组：shape={info['array']['shape']}, dtype={info['array']['dtype']}\n"
+    if 'rows' in info:
+        text += f"数据维度：{info['rows']}行 x {info['columns']}列\n"
+        if preview_rows >= PREVIEW_ROWS:
+            text += f"前15行数据预览：\n{info['preview']}\n"
+        elif preview_rows > 0:
+            # 预览第一行是列名
+            lines = info['preview'].splitlines()[:preview_rows + 1]
+            text += f"前{preview_rows}行数据预览：\n" + "\n".join(lines) + "\n"
+        elif info.get('names'):
+            names = info['names']
+            text += "列名：" + ", ".join(names[:MAX_COLUMN_NAMES])
+            text += f" 等 {len(names)} 列\n" if len(names) > MAX_COLUMN_NAMES else "\n"
+    return text
+
+
+def format_file_info(table_info: Dict[str, dict], echo: bool = True) -> str:
+    """把 detect_table_files 的结果拼成追加到系统提示词里的文字"""
+    if not table_info:
+        return ""
+    text = FILE_INFO_HEADER
+    for file_path, info in table_info.items():
+        text += describe_file(file_path, info)
+        if echo:
+            print(f"\n文件：{file_path}\n")
+            if 'rows' in info:
+                print(f"前15行数据预览：\n{info['preview']}\n")
+            else:
+                print(f"{file_path}非表格数据")
+    if any(info.get('large') for info in table_info.values()):
+        text += LARGE_DATA_GUIDE
+    return text
+
+
+def file_sections(table_info: Dict[str, dict], query: str = "") -> list:
+    """每个文件一段可以缩短的描述（完整预览 / 5 行预览 / 只列列名），按和需求的相关程度打分"""
+    from .budget import PromptSection, relevance
+
+    sections = []
+    for file_path, info in table_info.items():
+        if 'rows' in info:
+            levels = [describe_file(file_path, info, rows) for rows in (PREVIEW_ROWS, SHORT_PREVIEW_ROWS, 0)]
+        else:
+            levels = [describe_file(file_path, info)]
+        sections.append(PromptSection(file_path, levels, relevance(query, file_path, info.get('names', ()))))
+    return sections
+
+
+# 超过这么多文件时不再逐个列出，改成汇总清单（见 manifest.py）
+MAX_LISTED_FILES = 20
+
+
+def describe_inputs(paths: List[str], echo: bool = True, query: str = "", budget: Optional[int] = None,
+                    log: Callable[[str], None] = print) -> str:
+    """
+    导入的文件和目录 -> 追加到系统提示词里的文字：文件少时逐个检测（detect_table_files），
+    目录和大量文件汇总成清单，提示词长度不随文件数增长。
+    budget（token 数）给定时按和 query 的相关程度缩短或省略各个文件的描述，总长度不超过预算（见 budget.py）；
+    有文件被缩短或省略时不管 echo 都用 log 写一行，列出是哪些文件
+    """
+    from .manifest import build_manifest, format_manifest
+    from .dataio import LARGE_FILE_BYTES
+
+    dirs, files = [], []
+    for path in paths:
+        (dirs if os.path.isdir(path) else files).append(path)
+    table_info = {}
+    if len(files) <= MAX_LISTED_FILES:
+        table_info = detect_table_files(files)
+        files = []
+    manifest = build_manifest(dirs, files) if dirs or files else None
+    if manifest is not None and echo:
+        print(f"🗂️ 文件清单：{manifest['count']} 个文件，{len(manifest['extensions'])} 种扩展名，"
+              f"{len(manifest['patterns'])} 种命名")
+
+    if budget is None:
+        text = format_file_info(table_info, echo)
+        if manifest is not None:
+            text += format_manifest(manifest)
+    else:
+        text = _budgeted_file_info(table_info, manifest, query, budget, echo, log)
+        if any(info.get('large') for info in table_info.values()):
+            text += LARGE_DATA_GUIDE
+
+    if (manifest is not None and manifest["largest"] and manifest["largest"][1] >= LARGE_FILE_BYTES
+            and LARGE_DATA_GUIDE not in text):
+        text += LARGE_DATA_GUIDE
+    return text
+
+
+def _budgeted_file_info(table_info: Dict[str, dict], manifest: Optional[dict], query: str, budget: int,
+                        echo: bool, log: Callable[[str], None] = print) -> str:
+    from .budget import PromptSection, allocate, estimate_tokens
+    from .manifest import manifest_levels
+
+    sections = file_sections(table_info, query)
+    if manifest is not None and manifest["count"]:
+        # 清单里的内容都是汇总，排在相关的文件后面
+        sections.append(PromptSection("manifest", manifest_levels(manifest), 1.0))
+    if not sections:
+        return ""
+    chosen, dropped = allocate(sections, budget - estimate_tokens(FILE_INFO_HEADER))
+    text = FILE_INFO_HEADER + chosen if table_info else chosen
+    if dropped:
+        names = [os.path.basename(s.key) if s.key != "manifest" else "文件汇总清单" for s in dropped]
+        text += f"\n另有 {len(dropped)} 个文件篇幅所限没有列出详细信息：" + "、".join(names[:MAX_LISTED_FILES])
+        text += " 等\n" if len(names) > MAX_LISTED_FILES else "\n"
+
+    full = sum(1 for s in sections if s.level == 0)
+    minimal = sum(1 for s in sections if s.level is not None and s.level > 0 and s.level == len(s.levels) - 1)
+    short = len(sections) - len(dropped) - full - minimal
+    if short or minimal or dropped or echo:
+        log(f"📐 文件信息约 {estimate_tokens(text)} tokens（上限 {budget}）：{full} 个完整，"
+            f"{short} 个缩短，{minimal} 个只列概要，{len(dropped)} 个省略")
+    shortened = [os.path.basename(s.key) if s.key != "manifest" else "文件汇总清单"
+                 for s in sections if s.level is not None and s.level > 0]
+    if shortened:
+        log("📐 缩短了预览：" + "、".join(shortened[:MAX_LISTED_FILES]) + (" 等" if len(shortened) > MAX_LISTED_FILES else ""))
+    if dropped:
+        log("📐 省略了详细信息：" + "、".join(names[:MAX_LISTED_FILES]) + (" 等" if len(names) > MAX_LISTED_FILES else ""))
+    if echo:
+        print(text.strip())
+    return text
+
+
+def build_edit_query(user_query: str, original_code: str, edit_query: str) -> str:
+    """修改代码时发给 AI 的用户输入"""
+    return f"你需要修改代码，这是原始需求：{user_query}, 这是原始代码：{original_code},这是修改的需求：{edit_query}"
+
+
+def build_optimize_query(user_query: str, original_code: str, profile_summary: str) -> str:
+    """分析模式跑完后，请 AI 针对热点优化代码"""
+    return (f"你需要优化代码的运行速度，这是原始需求：{user_query}, 这是原始代码：{original_code},"
+            f"这是实际运行的性能分析结果（L后面是代码行号）：\n{profile_summary}\n"
+            f"请重点改写耗时最多的部分（例如把 python 循环改成 numpy/pandas 向量化、只读取需要的列、"
+            f"大数据用 dumbydraw.plotting 降采样），输出的图和结果必须与原来一致")
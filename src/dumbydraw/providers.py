@@ -0,0 +1,351 @@
+"""
+多个 AI 接口（provider）之间按实测延迟路由，首个 token 迟迟不来时再发一个备用请求（hedged request）。
+
+    router = Router.from_config(load_config())
+    code, provider = await router.run(call, on_line=print)   # call(provider, on_first_token, on_line, stats)
+    router.rank()                                             # 按预计耗时排好的接口
+    await router.probe(call)                                  # 连接测试：所有接口各发一次，记录测速
+
+配置：界面里的 baseurl / model / api_key 是默认接口，另外的接口写在 "providers" 里：
+    "providers": [{"name": "deepseek", "baseurl": "https://api.deepseek.com/v1", "model": "deepseek-chat",
+                   "api_key": "..."}],
+    "routing": {"hedge": true, "hedge_percentile": 90}
+
+每个接口记录最近 MAX_SAMPLES 次的首 token 延迟（TTFT）和生成速度（tokens/s），
+保存在 ~/.dumbydraw/endpoints.json，跨会话累积。选接口时按「TTFT 中位数 + EXPECTED_TOKENS / 速度」
+排序，没有测过的排在测过的后面，连续失败的接口冷却 COOLDOWN 秒。
+等待首 token 的期限是该接口 TTFT 的 hedge_percentile 分位数（样本不够时用 DEFAULT_HEDGE_DELAY），
+超时后向排名下一个的接口发同样的请求，谁先出 token 就用谁，另一个取消；请求出错时换下一个接口重试。
+本模块不依赖 Qt。
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import data_path, default_baseurl
+
+
+STATS_FILE = "endpoints.json"
+MAX_SAMPLES = 50
+MIN_SAMPLES = 5
+EXPECTED_TOKENS = 800
+CHARS_PER_TOKEN = 3
+DEFAULT_HEDGE_DELAY = 10.0
+MIN_HEDGE_DELAY = 1.5
+MAX_HEDGE_DELAY = 30.0
+HEDGE_PERCENTILE = 90
+MAX_FAILURES = 2
+COOLDOWN = 120.0
+# 速度的指数滑动平均系数
+TPS_ALPHA = 0.3
+
+
+def percentile(values: List[float], p: float) -> float:
+    """线性插值的分位数，p 取 0~100"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Provider:
+    def __init__(self, name: str, baseurl: str, model: str, api_key: str):
+        self.name = name
+        self.baseurl = baseurl
+        self.model = model
+        self.api_key = api_key
+
+    @property
+    def key(self) -> str:
+        """测速记录按 地址 + 模型 区分（同一个地址的不同模型速度差很多）"""
+        return f"{self.baseurl}|{self.model}"
+
+    def __repr__(self):
+        return f"Provider({self.name!r}, {self.model!r})"
+
+
+class EndpointStats:
+    """一个接口的测速记录"""
+
+    def __init__(self, ttft=(), tps: Optional[float] = None, failures: int = 0, last_failure: float = 0.0,
+                 requests: int = 0):
+        self.ttft = deque(ttft, maxlen=MAX_SAMPLES)
+        self.tps = tps
+        self.failures = failures  # 连续失败次数
+        self.last_failure = last_failure
+        self.requests = requests
+
+    def healthy(self, now: Optional[float] = None) -> bool:
+        if self.failures < MAX_FAILURES:
+            return True
+        # 冷却时间过了再给一次机会
+        return (now or time.time()) - self.last_failure > COOLDOWN
+
+    def measured(self) -> bool:
+        return bool(self.ttft)
+
+    def expected_seconds(self) -> float:
+        """按中位 TTFT 和平均速度估计一次典型生成的耗时"""
+        ttft = percentile(list(self.ttft), 50)
+        return ttft + (EXPECTED_TOKENS / self.tps if self.tps else 0.0)
+
+    def hedge_delay(self, p: float = HEDGE_PERCENTILE) -> float:
+        if len(self.ttft) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, percentile(list(self.ttft), p)))
+
+    def record(self, ttft: Optional[float], tokens: int = 0, seconds: float = 0.0):
+        self.requests += 1
+        self.failures = 0
+        if ttft is not None:
+            self.ttft.append(ttft)
+        # 生成阶段（首 token 之后）的速度
+        gen_seconds = seconds - (ttft or 0.0)
+        if tokens > 0 and gen_seconds > 0:
+            tps = tokens / gen_seconds
+            self.tps = tps if self.tps is None else (1 - TPS_ALPHA) * self.tps + TPS_ALPHA * tps
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.last_failure = time.time()
+
+    def summary(self) -> str:
+        if not self.measured():
+            return "未测速"
+        text = f"TTFT p50 {percentile(list(self.ttft), 50):.2f}s / p90 {percentile(list(self.ttft), 90):.2f}s"
+        if self.tps:
+            text += f"，{self.tps:.0f} tok/s"
+        if self.failures:
+            text += f"，连续失败 {self.failures} 次"
+        return text
+
+    def to_dict(self) -> dict:
+        return {"ttft": list(self.ttft), "tps": self.tps, "failures": self.failures,
+                "last_failure": self.last_failure, "requests": self.requests}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EndpointStats":
+        return cls(data.get("ttft", ()), data.get("tps"), int(data.get("failures", 0)),
+                   float(data.get("last_failure", 0.0)), int(data.get("requests", 0)))
+
+
+class _Attempt:
+    """发给某个接口的一次请求；成为赢家之前它的输出先缓存起来，避免两个请求的输出交错"""
+
+    def __init__(self, provider: Provider, on_line: Callable[[str], None]):
+        self.provider = provider
+        self.on_line = on_line
+        self.lines: List[str] = []
+        self.winner = False
+        self.t0 = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.first = asyncio.get_event_loop().create_future()
+        self.stats: dict = {}
+        self.task: Optional[asyncio.Future] = None
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.t0
+            if not self.first.done():
+                self.first.set_result(self)
+
+    def line(self, text: str):
+        if self.winner:
+            self.on_line(text)
+        else:
+            self.lines.append(text)
+
+    def win(self):
+        self.winner = True
+        for text in self.lines:
+            self.on_line(text)
+        self.lines.clear()
+
+
+# call(provider, on_first_token, on_line, stats) -> 生成的文本；stats 里可以填 completion_tokens
+Call = Callable[[Provider, Callable[[], None], Callable[[str], None], dict], Awaitable[str]]
+
+
+class Router:
+    def __init__(self, providers: List[Provider], hedge: bool = True, hedge_percentile: float = HEDGE_PERCENTILE,
+                 stats_path: Optional[str] = None):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.stats_path = stats_path or data_path(STATS_FILE)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, EndpointStats] = self._load()
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "Router":
+        """界面里填的 baseurl / model / api_key 作为默认接口，排在 "providers" 前面"""
+        providers = []
+        baseurl = default_baseurl(cfg)
+        if cfg.get("model") or baseurl:
+            providers.append(Provider("default", baseurl, cfg.get("model", ""), cfg.get("api_key", "")))
+        for i, item in enumerate(cfg.get("providers") or []):
+            provider = Provider(item.get("name") or f"provider{i + 1}", item.get("baseurl", ""),
+                                item.get("model", ""), item.get("api_key", ""))
+            if all(p.key != provider.key for p in providers):
+                providers.append(provider)
+        routing = cfg.get("routing") or {}
+        return cls(providers, bool(routing.get("hedge", True)),
+                   float(routing.get("hedge_percentile", HEDGE_PERCENTILE)))
+
+    # ---------- 测速记录 ----------
+    def _load(self) -> Dict[str, EndpointStats]:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                return {key: EndpointStats.from_dict(data) for key, data in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self):
+        with self._lock:
+            data = {key: stats.to_dict() for key, stats in self.stats.items()}
+        tmp = self.stats_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.stats_path)
+        except OSError:
+            pass
+
+    def stats_for(self, provider: Provider) -> EndpointStats:
+        with self._lock:
+            return self.stats.setdefault(provider.key, EndpointStats())
+
+    def record(self, provider: Provider, ttft: Optional[float], tokens: int = 0, seconds: float = 0.0):
+        self.stats_for(provider).record(ttft, tokens, seconds)
+        self._save()
+
+    def record_failure(self, provider: Provider):
+        self.stats_for(provider).record_failure()
+        self._save()
+
+    # ---------- 选接口 ----------
+    def rank(self) -> List[Provider]:
+        """健康且测过速的按预计耗时排序，其次是没测过的（按配置顺序），最后是冷却中的"""
+        now = time.time()
+
+        def order(item):
+            index, provider = item
+            stats = self.stats_for(provider)
+            if not stats.healthy(now):
+                return 2, index, 0.0
+            if not stats.measured():
+                return 1, index, 0.0
+            return 0, stats.expected_seconds(), index
+
+        return [p for _i, p in sorted(enumerate(self.providers), key=order)]
+
+    def hedge_delay(self, provider: Provider) -> float:
+        return self.stats_for(provider).hedge_delay(self.hedge_percentile)
+
+    def _finish(self, attempt: _Attempt, text: str):
+        seconds = time.perf_counter() - attempt.t0
+        # 服务端没有返回用量时按字符数粗略估计
+        tokens = int(attempt.stats.get("completion_tokens") or len(text) // CHARS_PER_TOKEN)
+        self.record(attempt.provider, attempt.ttft, tokens, seconds)
+
+    async def run(self, call: Call, on_line: Optional[Callable[[str], None]] = None,
+                  log: Callable[[str], None] = print) -> Tuple[str, Provider]:
+        """
+        按排名请求；等首 token 超过期限时向下一个接口发备用请求，先出 token 的胜出，
+        出错的换下一个接口。返回 (生成的文本, 实际使用的接口)
+        """
+        if not self.providers:
+            raise ValueError("no provider configured")
+        emit = on_line or (lambda line: print(line, flush=True))
+        pending = self.rank()
+        live: List[_Attempt] = []
+        last_error: Optional[BaseException] = None
+
+        def start(provider: Provider) -> _Attempt:
+            attempt = _Attempt(provider, emit)
+            attempt.task = asyncio.ensure_future(call(provider, attempt.first_token, attempt.line, attempt.stats))
+            live.append(attempt)
+            return attempt
+
+        winner: Optional[_Attempt] = None
+        hedged = False
+        try:
+            start(pending.pop(0))
+            while winner is None:
+                if not live:
+                    if not pending:
+                        raise last_error or RuntimeError("all providers failed")
+                    log(f"🔁 改用 {pending[0].name} ({pending[0].model})")
+                    start(pending.pop(0))
+                    continue
+                timeout = None
+                if self.hedge and not hedged and pending:
+                    deadline = live[0].t0 + self.hedge_delay(live[0].provider)
+                    timeout = max(0.0, deadline - time.perf_counter())
+                waits = [a.first for a in live] + [a.task for a in live]
+                done, _ = await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    backup = pending.pop(0)
+                    log(f"⏱️ {live[0].provider.name} {timeout:.1f}s 内没有返回首个 token，"
+                        f"同时请求 {backup.name} ({backup.model})")
+                    start(backup)
+                    continue
+                # 先出 token（或直接完成）的胜出
+                for attempt in live:
+                    if attempt.first.done() or (attempt.task.done() and not attempt.task.exception()):
+                        winner = attempt
+                        break
+                if winner is None:
+                    for attempt in [a for a in live if a.task.done()]:
+                        live.remove(attempt)
+                        last_error = attempt.task.exception()
+                        self.record_failure(attempt.provider)
+                        log(f"⚠️ {attempt.provider.name} 请求失败: {last_error}")
+
+            for attempt in live:
+                if attempt is not winner:
+                    attempt.task.cancel()
+            if len(live) > 1:
+                log(f"🏁 使用 {winner.provider.name} 的结果")
+            winner.win()
+            try:
+                text = await winner.task
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.record_failure(winner.provider)
+                raise
+            self._finish(winner, text)
+            return text, winner.provider
+        finally:
+            for attempt in live:
+                if not attempt.task.done():
+                    attempt.task.cancel()
+
+    async def probe(self, call: Call, log: Callable[[str], None] = print) -> List[Tuple[Provider, Optional[str]]]:
+        """所有接口同时各请求一次（连接测试用），记录测速；返回 [(接口, 错误信息或 None)]"""
+        async def one(provider: Provider):
+            attempt = _Attempt(provider, lambda line: None)
+            try:
+                text = await call(provider, attempt.first_token, attempt.line, attempt.stats)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record_failure(provider)
+                log(f"❌ {provider.name} ({provider.model}): {e}")
+                return provider, str(e)
+            self._finish(attempt, text)
+            log(f"📶 {provider.name} ({provider.model}): {self.stats_for(provider).summary()}")
+            return provider, None
+
+        return list(await asyncio.gather(*(one(p) for p in self.providers)))
@@ -0,0 +1,131 @@
+"""
+从历史记录里检索成功运行过的 (需求, 代码)，作为少样本示例加进系统提示词。
+
+完全离线：BM25 打分，中文按相邻两字切分，英文和代码按单词切分，不需要向量模型。
+
+    index = ExampleIndex(get_history())
+    system_prompt += format_examples(index.search("画性别和成绩的显著性柱状图", k=2))
+"""
+import re
+import math
+
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .history import HistoryStore
+
+
+DEFAULT_EXAMPLES = 2
+# 每个示例代码最多放这么多字符，避免提示词过长
+MAX_EXAMPLE_CHARS = 3000
+# 低于这个分数的结果和当前需求关系不大，不加进提示词
+MIN_SCORE = 1.0
+
+_TOKEN_RE = re.compile(r"[a-z_][a-z0-9_]*|\d+|[㐀-鿿]+")
+_CJK_RE = re.compile(r"[㐀-鿿]")
+
+
+def tokenize(text: str) -> List[str]:
+    """英文和代码按单词，中文连续字符按相邻两字（单字单独成词）"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(token):
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif len(token) > 1:
+            tokens.append(token)
+    return tokens
+
+
+class BM25:
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if documents else 0.0
+        df = Counter()
+        for tf in self.term_freqs:
+            df.update(tf.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query: List[str]) -> List[float]:
+        terms = [t for t in set(query) if t in self.idf]
+        result = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            result.append(score)
+        return result
+
+
+class ExampleIndex:
+    """历史记录的检索索引；历史有新的成功记录时自动重建"""
+
+    def __init__(self, store: HistoryStore, limit: int = 5000):
+        self.store = store
+        self.limit = limit
+        self._version = None
+        self._examples: List[dict] = []
+        self._bm25: Optional[BM25] = None
+
+    def _refresh(self):
+        version = self.store.successful_version()
+        if version == self._version:
+            return
+        examples, seen = [], set()
+        for entry in self.store.successful(self.limit):
+            key = (entry["instruction"] or entry["query"]).strip()
+            if not key or not entry["code"].strip() or key in seen:
+                continue
+            seen.add(key)
+            examples.append(entry)
+        # 需求的权重比代码里的标识符高
+        documents = [tokenize(e["query"] + " " + e["instruction"]) * 2 + tokenize(e["code"]) for e in examples]
+        self._examples = examples
+        self._bm25 = BM25(documents)
+        self._version = version
+
+    def search(self, query: str, k: int = DEFAULT_EXAMPLES, min_score: float = MIN_SCORE) -> List[dict]:
+        if k <= 0:
+            return []
+        self._refresh()
+        if not self._examples:
+            return []
+        scores = self._bm25.scores(tokenize(query))
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [dict(self._examples[i], score=scores[i]) for i in ranked[:k] if scores[i] >= min_score]
+
+
+def format_examples(examples: List[dict], max_chars: int = MAX_EXAMPLE_CHARS) -> str:
+    """把检索结果拼成追加到系统提示词的文字"""
+    if not examples:
+        return ""
+    text = "\n\n以下是之前成功运行过的类似需求和代码，可以参考写法，但文件路径和列名以本次用户输入为准：\n"
+    for n, example in enumerate(examples, 1):
+        code = example["code"].strip()
+        if len(code) > max_chars:
+            code = code[:max_chars] + "\n# ...（省略）"
+        request = example["query"].strip()
+        if example["instruction"]:
+            request += f"\n修改要求：{example['instruction'].strip()}"
+        text += f"\n示例{n} 需求：{request}\n```python\n{code}\n```\n"
+    return text
+
+
+_indexes: Dict[int, ExampleIndex] = {}
+
+
+def find_examples(store: HistoryStore, query: str, k: int = DEFAULT_EXAMPLES) -> str:
+    """检索并格式化；同一个 store 复用索引"""
+    index = _indexes.get(id(store))
+    if index is None or index.store is not store:
+        index = _indexes[id(store)] = ExampleIndex(store)
+    return format_examples(index.search(query, k))
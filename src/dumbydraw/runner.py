@@ -0,0 +1,623 @@
+import os
+import sys
+import json
+import queue
+import time
+import signal
+import asyncio
+
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+from .cache import ResultCache, referenced_paths, dynamic_paths, fingerprint
+from .cells import KernelState, RunPlan, split_cells, plan_run
+from .config import data_path
+from .deps import DependencyResolver
+from .workspace import Workspace, get_workspace
+from .engine import get_engine, run_process, terminate_process, _pump, STREAM_LIMIT
+
+
+BOOTSTRAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bootstrap.py")
+KERNEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernel.py")
+# 与 bootstrap.MARKER_PREFIX 保持一致：子进程用这一前缀把图片、资源统计写回 stdout
+MARKER_PREFIX = "\x1edumbydraw:"
+FIGURE_MARKER = MARKER_PREFIX + "figure "
+RUN_LOG_FILE = "runs.jsonl"
+
+
+class ResourceLimits:
+    """
+    子进程资源限制，0 或 None 表示不限制。
+    memory_mb / cpu_seconds / open_files 在子进程里用 setrlimit 实现（仅 POSIX），
+    wall_seconds 由父进程计时，超时后结束子进程
+    """
+
+    def __init__(self, memory_mb=None, cpu_seconds=None, open_files=None, wall_seconds=None):
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.open_files = open_files
+        self.wall_seconds = wall_seconds
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "ResourceLimits":
+        """读取配置里的 "limits": {"memory_mb": 8192, "cpu_seconds": 600, ...}"""
+        limits = cfg.get("limits") or {}
+        return cls(**{k: limits.get(k) for k in ("memory_mb", "cpu_seconds", "open_files", "wall_seconds")})
+
+    def rlimits(self) -> dict:
+        return {k: v for k, v in (("memory_mb", self.memory_mb), ("cpu_seconds", self.cpu_seconds),
+                                  ("open_files", self.open_files)) if v}
+
+    def describe(self) -> str:
+        parts = []
+        if self.memory_mb:
+            parts.append(f"内存 {self.memory_mb} MB")
+        if self.cpu_seconds:
+            parts.append(f"CPU {self.cpu_seconds}s")
+        if self.open_files:
+            parts.append(f"文件数 {self.open_files}")
+        if self.wall_seconds:
+            parts.append(f"超时 {self.wall_seconds}s")
+        return ", ".join(parts) or "无限制"
+
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_env(**extra) -> dict:
+    """子进程环境变量：强制 utf-8 和无缓冲输出，并保证生成的代码能 import dumbydraw 的辅助模块"""
+    env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+    if os.path.basename(PACKAGE_PARENT) not in ("site-packages", "dist-packages"):
+        # 从源码运行时包不在 site-packages 里
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (PACKAGE_PARENT, env.get("PYTHONPATH")) if p)
+    env.update({k: str(v) for k, v in extra.items()})
+    return env
+
+
+def script_command(script_path: str, figure_path: Optional[str] = None, python_exe: Optional[str] = None,
+                   capture: bool = False, capture_formats: str = "png",
+                   limits: Optional[ResourceLimits] = None, report_usage: bool = False,
+                   profile: bool = False) -> List[str]:
+    """
+    生成运行脚本的命令行。都通过 bootstrap.py 启动：
+    给了 figure_path 时强制 Agg 后端，plt.show() 改为保存图片；
+    capture=True 时把图片字节通过 stdout 送回来（见 parse_marker_line）；
+    limits 在子进程里设置 rlimit，report_usage=True 时子进程退出前送回资源占用；
+    profile=True 时用 cProfile + 行采样分析脚本，退出前送回热点
+    """
+    python_exe = python_exe or sys.executable
+    command = [python_exe, BOOTSTRAP_PATH]
+    if figure_path:
+        command += ["--save-figures", figure_path]
+    if capture:
+        command += ["--capture", "--capture-formats", capture_formats]
+    if limits and limits.rlimits():
+        command += ["--limits", json.dumps(limits.rlimits())]
+    if report_usage:
+        command += ["--report-usage"]
+    if profile:
+        command += ["--profile"]
+    return command + [script_path]
+
+
+def parse_marker_line(line: str) -> Optional[Tuple[str, dict]]:
+    """
+    如果这一行是 bootstrap 送回的数据，返回 (类型, 内容)，否则返回 None。
+    图片的 png / svg / thumb 字段解码为 bytes
+    """
+    if not line.startswith(MARKER_PREFIX):
+        return None
+    kind, _, payload = line[len(MARKER_PREFIX):].partition(" ")
+    data = json.loads(payload)
+    if kind == "figure":
+        import base64
+        for key in ("thumb", "png", "svg"):
+            if key in data:
+                data[key] = base64.b64decode(data[key])
+    return kind, data
+
+
+def parse_figure_line(line: str) -> Optional[dict]:
+    """如果这一行是子进程送回的图片，解码成 dict，否则返回 None"""
+    parsed = parse_marker_line(line)
+    if parsed and parsed[0] == "figure":
+        return parsed[1]
+    return None
+
+
+def describe_exit(return_code: int) -> str:
+    """把被信号杀死的负返回码翻译成信号名"""
+    if return_code < 0:
+        try:
+            name = signal.Signals(-return_code).name
+        except ValueError:
+            name = str(-return_code)
+        hint = {"SIGXCPU": "（超过 CPU 时间限制）", "SIGKILL": "（可能被系统 OOM 杀死）"}.get(name, "")
+        return f"被信号 {name} 终止{hint}"
+    return f"返回码: {return_code}"
+
+
+def format_usage(stats: dict) -> str:
+    parts = [f"墙钟 {stats['wall']:.2f}s"]
+    if stats.get("peak_rss") is not None:
+        parts.append(f"峰值内存 {stats['peak_rss'] / 1024 ** 2:.1f} MB")
+    if stats.get("cpu_user") is not None:
+        parts.append(f"CPU user {stats['cpu_user']:.2f}s / sys {stats['cpu_sys']:.2f}s")
+    return ", ".join(parts)
+
+
+def format_profile(profile: dict, top: int = 10) -> str:
+    """把 bootstrap 送回的分析结果整理成按耗时排序的热点摘要"""
+    lines = [f"⏱️ 性能分析：总耗时 {profile['total']:.2f}s（{profile['samples']} 个采样）", "热点代码行："]
+    for item in profile["lines"][:top]:
+        lines.append(f"  L{item['line']:<5} {item['seconds']:7.2f}s {item['percent']:5.1f}%  {item['source'][:100]}")
+    lines.append("热点函数（按自身耗时）：")
+    for item in profile["functions"][:top]:
+        location = f"{os.path.basename(item['file'])}:{item['line']}" if item["line"] else item["file"]
+        lines.append(f"  {item['tottime']:7.2f}s  累计 {item['cumtime']:7.2f}s  x{item['ncalls']:<7} "
+                     f"{item['function']} ({location})")
+    return "\n".join(lines)
+
+
+def record_run(stats: dict):
+    """把一次运行的资源统计追加到 ~/.dumbydraw/runs.jsonl，供之后分析"""
+    try:
+        with open(data_path(RUN_LOG_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(stats, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+
+# =====================================================
+# 常驻 kernel（增量运行）
+# =====================================================
+class KernelSession:
+    """
+    一个常驻的 kernel.py 子进程和它命名空间的状态（cells.KernelState），只在 engine 事件循环里使用。
+    启动参数（解释器、图片格式、资源限制）变了、进程退出、运行超时或被取消时重新开始，状态清空
+    """
+
+    def __init__(self):
+        self.state = KernelState()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.command: Optional[List[str]] = None
+        self.script_path: Optional[str] = None
+        self._tasks = []
+        self._done: Optional[asyncio.Future] = None
+        self._results: List[dict] = []
+        self._on_stdout = self._on_stderr = None
+
+    @staticmethod
+    def build_command(python_exe: Optional[str] = None, capture: bool = False, capture_formats: str = "png",
+                      limits: Optional[ResourceLimits] = None) -> List[str]:
+        command = [python_exe or sys.executable, KERNEL_PATH]
+        if capture:
+            command += ["--capture", "--capture-formats", capture_formats]
+        if limits and limits.rlimits():
+            command += ["--limits", json.dumps(limits.rlimits())]
+        return command
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, command: List[str], env: Optional[dict] = None):
+        await self.close()
+        self.process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, env=env, limit=STREAM_LIMIT)
+        self.command = command
+        self._tasks = [
+            asyncio.ensure_future(_pump(self.process.stdout, self._dispatch_stdout)),
+            asyncio.ensure_future(_pump(self.process.stderr, self._dispatch_stderr)),
+            asyncio.ensure_future(self._watch(self.process)),
+        ]
+
+    async def close(self):
+        """结束 kernel 进程，命名空间状态随之失效"""
+        process, self.process = self.process, None
+        self.state.reset()
+        if process is not None:
+            await terminate_process(process)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.script_path:
+            get_workspace().remove(self.script_path)
+            self.script_path = None
+
+    async def run(self, plan: RunPlan, code: str, command: List[str], on_stdout, on_stderr,
+                  env: Optional[dict] = None, on_start=None) -> dict:
+        """
+        按 plan 执行，返回 {"status": "ok" | "error" | "exited", "failed": 出错单元, "returncode": ..}。
+        脚本先写进固定的临时文件，报错时的调用栈能显示源码行
+        """
+        if not self.alive or command != self.command:
+            await self.start(command, env)
+            # 新进程里什么都没有，按空状态重新计划
+            plan = plan_run(plan.cells, self.state)
+        if on_start:
+            on_start(self.process)
+        if self.script_path is None:
+            self.script_path = get_workspace().new_file("kernel_", ".py")
+        with open(self.script_path, "w", encoding="utf-8") as f:
+            f.write(code)
+        get_workspace().update(self.script_path, busy=True)
+
+        self._results = []
+        self._on_stdout, self._on_stderr = on_stdout, on_stderr
+        self._done = asyncio.get_event_loop().create_future()
+        message = {
+            "op": "run",
+            "script": self.script_path,
+            "delete": plan.delete,
+            "cells": [{"index": c.index, "sig": c.sig, "lineno": c.lineno, "source": c.source,
+                       "action": plan.actions[c.index]} for c in plan.cells],
+        }
+        self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+        result = await self._done
+        if result["status"] == "exited":
+            await self.close()
+        else:
+            self.state.update(plan, self._results)
+        result["plan"] = plan
+        return result
+
+    def _dispatch_stdout(self, line: str):
+        parsed = parse_marker_line(line) if line.startswith(MARKER_PREFIX) else None
+        if parsed and parsed[0] == "cell":
+            self._results.append(parsed[1])
+        elif parsed and parsed[0] == "done":
+            if self._done is not None and not self._done.done():
+                self._done.set_result(parsed[1])
+        elif self._on_stdout:
+            self._on_stdout(line)
+
+    def _dispatch_stderr(self, line: str):
+        if self._on_stderr:
+            self._on_stderr(line)
+
+    async def _watch(self, process):
+        returncode = await process.wait()
+        # 等管道里剩下的输出读完
+        await asyncio.sleep(0.1)
+        if self._done is not None and not self._done.done():
+            self._done.set_result({"status": "exited", "failed": None, "returncode": returncode})
+
+
+# =====================================================
+# stdout / stderr 行缓冲重定向
+# =====================================================
+class EmittingStream:
+    def __init__(self, log_queue: queue.Queue):
+        self.log_queue = log_queue
+        self._buffer = ""
+
+    def write(self, text):
+        if not text:
+            return
+
+        self._buffer += text
+
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            if line.strip():
+                self.log_queue.put(line)
+
+    def flush(self):
+        if self._buffer.strip():
+            self.log_queue.put(self._buffer)
+        self._buffer = ""
+
+
+# =====================================================
+# 代码执行 Worker（在后台进程中执行代码）
+# =====================================================
+class CodeRunner:
+    # 每次运行保留的输出行数（写进历史记录）
+    OUTPUT_TAIL_LINES = 5000
+
+    def __init__(self, log_queue: queue.Queue, figure_queue: Optional[queue.Queue] = None,
+                 limits: Optional[ResourceLimits] = None, profile_queue: Optional[queue.Queue] = None,
+                 done_queue: Optional[queue.Queue] = None, cache: Optional[ResultCache] = None,
+                 deps: Optional[DependencyResolver] = None, workspace: Optional[Workspace] = None):
+        self.log_queue = log_queue
+        # 给了 figure_queue 时用 Agg 捕获图片，而不是在子进程里弹出窗口
+        self.figure_queue = figure_queue
+        # 分析模式运行结束后，热点摘要放进 profile_queue（主线程可以拿去让 AI 优化）
+        self.profile_queue = profile_queue
+        # 每次运行结束（包括失败、超时、取消）把统计和输出放进 done_queue
+        self.done_queue = done_queue
+        # 运行协程结束时（子进程或 kernel 已经结束）调用 on_finished(canceled)，调度器用它释放并行名额
+        self.on_finished: Optional[Callable[[bool], None]] = None
+        # 给了 cache 时，代码和输入都没变的运行直接回放上次的结果
+        self.cache = cache
+        # 给了 deps 时运行前检查 import 的第三方包，缺的先装好
+        self.deps = deps
+        # 脚本、捕获的图片和输出写进会话工作目录（见 workspace.py），按大小上限自动回收
+        self.workspace = workspace or get_workspace()
+        self.limits = limits or ResourceLimits()
+        # 增量运行用的常驻 kernel，第一次增量运行时创建
+        self.kernel: Optional[KernelSession] = None
+        self.last_stats: Optional[dict] = None
+        self.last_profile: Optional[dict] = None
+        self._usage: Optional[dict] = None
+        self._output = deque(maxlen=self.OUTPUT_TAIL_LINES)
+        self._figures: List[dict] = []
+        self.process = None
+        self.running = False
+        self._stop_flag = False
+        self._job = None
+
+    def run_code_in_background(self, code: str, profile: bool = False, tag=None,
+                               inputs: Optional[List[str]] = None, use_cache: bool = True,
+                               incremental: bool = False):
+        """
+        在后台进程中执行代码（提交到 engine 事件循环），profile=True 时同时做性能分析。
+        tag 原样带回 done_queue（例如历史记录 id）；inputs 为输入文件，参与缓存 key；
+        use_cache=False 时不读缓存、强制重新运行（结果仍会写入缓存）；
+        incremental=True 时在常驻 kernel 里只重新执行改动过的单元（见 cells.py），不走缓存。
+        一个 CodeRunner 同时只运行一个脚本，返回 engine 的 Job；正在运行时返回 None。
+        需要排队、并行运行多个脚本时用 scheduler.JobScheduler，每个任务一个 CodeRunner
+        """
+        if self.running:
+            self.log_queue.put("⚠️ 已有代码在运行，本次运行请求被忽略")
+            return None
+
+        self.running = True
+        self._stop_flag = False
+        self._job = get_engine().submit(self._execute_code(code, profile, tag, inputs or [], use_cache, incremental),
+                                        limit="cpu", name="run")
+        return self._job
+
+    async def _execute_code(self, code: str, profile: bool = False, tag=None,
+                            inputs: Optional[List[str]] = None, use_cache: bool = True,
+                            incremental: bool = False):
+        """实际执行代码的协程"""
+        run_dir = None
+        canceled = False
+        loop = asyncio.get_event_loop()
+        try:
+            if self.deps is not None:
+                await self.deps.ensure(code, self.log_queue.put)
+            # 分析模式要的是完整一次运行的耗时，不做增量
+            if incremental and not profile and await self._execute_incremental(code, tag):
+                return
+            # 分析模式要的是真实耗时，不走缓存；列目录、拼接路径的代码读了哪些文件看不出来，也不走缓存
+            cache_key = None
+            if self.cache is not None and not profile and not dynamic_paths(code):
+                cache_key = self.cache.key(code, inputs or [], options={"capture": self.figure_queue is not None})
+                if use_cache:
+                    cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+                    if cached is not None:
+                        self._replay_cached(cached, tag)
+                        return
+            watched = referenced_paths(code)
+            before = fingerprint(watched)
+
+            run_dir = self.workspace.new_run()
+            temp_file_path = os.path.join(run_dir, "script.py")
+            with open(temp_file_path, "w", encoding="utf-8") as f:
+                f.write(code)
+
+            self.log_queue.put(f"📝 脚本已保存: {temp_file_path}")
+
+            python_exe = sys.executable
+            self.log_queue.put(f"🐍 使用Python解释器: {python_exe}")
+
+            if self._stop_flag:
+                self.log_queue.put("⏹️ 代码执行已被取消")
+                self._cleanup_run_dir(run_dir)
+                return
+
+            self.log_queue.put(f"⏹️ 代码正在后台运行...（资源限制: {self.limits.describe()}）")
+            self._usage = None
+            self._output.clear()
+            self._figures = []
+            t_start = time.perf_counter()
+            status = "ok"
+            return_code = None
+            try:
+                return_code = await asyncio.wait_for(run_process(
+                    script_command(temp_file_path, python_exe=python_exe, capture=self.figure_queue is not None,
+                                   limits=self.limits, report_usage=True, profile=profile),
+                    on_stdout=self._on_stdout,
+                    on_stderr=self._on_stderr,
+                    env=child_env(),
+                    on_start=self._set_process,
+                ), self.limits.wall_seconds or None)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                self.log_queue.put(f"⏰ 运行超过 {self.limits.wall_seconds}s，已终止")
+            except asyncio.CancelledError:
+                status = "canceled"
+                raise
+            finally:
+                self._finish_stats(code, t_start, return_code, status, tag)
+                if status != "canceled":
+                    await loop.run_in_executor(None, self._save_artifacts, run_dir)
+
+            if return_code == 0:
+                self.log_queue.put("✅ 代码执行完成")
+                if cache_key is not None and status == "ok":
+                    await loop.run_in_executor(None, self._store_result, cache_key, watched, before)
+            elif return_code is not None:
+                self.log_queue.put(f"❌ 代码执行失败，{describe_exit(return_code)}")
+
+        except asyncio.CancelledError:
+            canceled = True
+            self.log_queue.put("⏹️ 代码执行已停止")
+            if run_dir:
+                self._cleanup_run_dir(run_dir)
+            raise
+        except Exception as e:
+            self.log_queue.put(f"❌ 执行代码时发生错误: {e}")
+        finally:
+            self.running = False
+            self.process = None
+            self._job = None
+            if self.on_finished is not None:
+                self.on_finished(canceled)
+
+    async def _execute_incremental(self, code: str, tag=None) -> bool:
+        """在常驻 kernel 里增量运行；代码有语法错误时返回 False，交给普通运行报错"""
+        try:
+            cells = split_cells(code)
+        except (SyntaxError, ValueError):
+            return False
+        if self.kernel is None:
+            self.kernel = KernelSession()
+        plan = plan_run(cells, self.kernel.state)
+        if plan.skipped:
+            saved = sum(self.kernel.state.seconds.get(c.sig, 0.0) for c in plan.skipped)
+            self.log_queue.put(f"⚡ 增量运行：执行 {len(plan.executed)} 个单元，跳过 {len(plan.skipped)} 个"
+                               f"（上次耗时约 {saved:.2f}s）；需要从头运行请点 Stop 重置 kernel")
+        else:
+            self.log_queue.put(f"⚡ 增量运行：常驻 kernel 执行全部 {len(cells)} 个单元"
+                               f"（资源限制: {self.limits.describe()}）")
+
+        self._usage = None
+        self._output.clear()
+        self._figures = []
+        t_start = time.perf_counter()
+        status = "ok"
+        return_code = None
+        command = KernelSession.build_command(capture=self.figure_queue is not None, limits=self.limits)
+        try:
+            result = await asyncio.wait_for(self.kernel.run(
+                plan, code, command, self._on_stdout, self._on_stderr, env=child_env(), on_start=self._set_process,
+            ), self.limits.wall_seconds or None)
+            if result["status"] == "exited":
+                return_code = result["returncode"] or 1
+                self.log_queue.put(f"❌ kernel 进程退出，{describe_exit(return_code)}，下次运行重新开始")
+            else:
+                return_code = 0 if result["status"] == "ok" else 1
+                executed = len(result["plan"].executed)
+                if executed != len(plan.executed):
+                    self.log_queue.put(f"⚡ kernel 是新启动的，执行了全部 {executed} 个单元")
+        except asyncio.TimeoutError:
+            status = "timeout"
+            self.log_queue.put(f"⏰ 运行超过 {self.limits.wall_seconds}s，已终止 kernel")
+            await self.kernel.close()
+        except asyncio.CancelledError:
+            status = "canceled"
+            await self.kernel.close()
+            raise
+        finally:
+            self._finish_stats(code, t_start, return_code, status, tag)
+
+        if return_code == 0:
+            self.log_queue.put("✅ 代码执行完成")
+        elif return_code is not None and result["status"] != "exited":
+            failed = result["plan"].cells[result["failed"]] if result["failed"] is not None else None
+            where = f"第 {failed.lineno} 行开始的单元出错" if failed else "出错"
+            self.log_queue.put(f"❌ 代码执行失败，{where}；修改后再运行会从这里继续")
+        return True
+
+    def reset_kernel(self):
+        """结束常驻 kernel，下次增量运行从头开始"""
+        if self.kernel is not None and self.kernel.process is not None:
+            get_engine().submit(self.kernel.close(), name="kernel-close")
+            self.log_queue.put("🔄 kernel 已重置")
+
+    def _store_result(self, cache_key: str, watched: List[str], before: dict):
+        """成功运行后写缓存：代码引用的路径里运行前后没变的是输入，新建或改写的是输出"""
+        after = fingerprint(watched)
+        inputs = {path: value for path, value in before.items() if after.get(path) == value}
+        outputs = [path for path, value in after.items() if before.get(path) != value]
+        for figure in self._figures:
+            if figure.get("path") and figure["path"] not in outputs and os.path.isfile(figure["path"]):
+                outputs.append(figure["path"])
+        self.cache.put(cache_key, "\n".join(self._output), self.last_stats["wall"], self._figures, outputs, inputs)
+
+    def _replay_cached(self, cached: dict, tag=None):
+        """回放缓存的输出和图片，恢复缺失的生成文件"""
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(cached["created"]))
+        self.log_queue.put(f"♻️ 代码和输入文件都没有变，使用 {when} 的运行结果（当时耗时 {cached['wall']:.2f}s）；"
+                           f"需要重新运行请勾选 Fresh run")
+        for line in cached["output"].split("\n") if cached["output"] else []:
+            self.log_queue.put(line)
+        if self.figure_queue is not None:
+            for figure in cached["figures"]:
+                self.figure_queue.put(figure)
+        for path in ResultCache.restore_files(cached):
+            self.log_queue.put(f"📂 已从缓存恢复文件: {path}")
+        self.log_queue.put("✅ 代码执行完成（缓存）")
+        stats = {"time": time.time(), "status": "ok", "returncode": 0, "wall": 0.0, "cached": True}
+        self.last_stats = stats
+        if self.done_queue is not None:
+            self.done_queue.put(dict(stats, tag=tag, output=cached["output"]))
+
+    def _finish_stats(self, code: str, t_start: float, return_code, status: str, tag=None):
+        """汇总资源统计，写进日志和 runs.jsonl"""
+        stats = {
+            "time": time.time(),
+            "status": status,
+            "returncode": return_code,
+            "wall": time.perf_counter() - t_start,
+            "code_chars": len(code),
+            "limits": self.limits.rlimits(),
+        }
+        if self._usage:
+            stats.update(self._usage)
+        self.last_stats = stats
+        self.log_queue.put(f"📈 {format_usage(stats)}")
+        record_run(stats)
+        if self.done_queue is not None:
+            self.done_queue.put(dict(stats, tag=tag, output="\n".join(self._output)))
+
+    def _on_stdout(self, line: str):
+        parsed = parse_marker_line(line)
+        if parsed is None:
+            self._output.append(line)
+            self.log_queue.put(line)
+            return
+        kind, data = parsed
+        if kind == "usage":
+            self._usage = data
+        elif kind == "profile":
+            summary = format_profile(data)
+            self.last_profile = data
+            self.log_queue.put(summary)
+            if self.profile_queue is not None:
+                self.profile_queue.put(summary)
+        elif kind == "figure" and self.figure_queue is not None:
+            self._figures.append(data)
+            self.figure_queue.put(data)
+            self.log_queue.put(f"🖼️ 捕获图片 #{data['index']} ({data['size'][0]}x{data['size'][1]})")
+
+    def _on_stderr(self, line: str):
+        line = f"❌ {line}"
+        self._output.append(line)
+        self.log_queue.put(line)
+
+    def _set_process(self, process):
+        self.process = process
+
+    def _save_artifacts(self, run_dir: str):
+        """运行结束后把输出和捕获的图片写进运行目录，并更新工作目录的索引"""
+        try:
+            with open(os.path.join(run_dir, "output.log"), "w", encoding="utf-8") as f:
+                f.write("\n".join(self._output))
+            for figure in self._figures:
+                for fmt in ("png", "svg"):
+                    if fmt in figure:
+                        with open(os.path.join(run_dir, f"figure_{figure.get('index', 0)}.{fmt}"), "wb") as f:
+                            f.write(figure[fmt])
+        except OSError as e:
+            self.log_queue.put(f"⚠️ 无法保存运行结果: {e}")
+        self.workspace.update(run_dir)
+
+    def _cleanup_run_dir(self, run_dir: str):
+        """取消的运行不保留"""
+        self.workspace.remove(run_dir)
+        self.log_queue.put(f"🗑️ 运行目录已删除: {run_dir}")
+
+    def stop_execution(self):
+        """停止正在执行的代码"""
+        if self.running:
+            self._stop_flag = True
+            if self._job:
+                self._job.cancel()
+                self.log_queue.put("⏹️ 正在停止代码执行...")
@@ -0,0 +1,247 @@
+"""
+运行任务调度：多个脚本可以同时排队、并行运行，每个任务有自己的日志和图片队列。
+
+    scheduler = JobScheduler(make_runner)          # make_runner(job) -> CodeRunner
+    job = scheduler.submit(code, name="Run #1", priority=0, profile=False)
+    ... job.log_queue / job.figure_queue 由界面轮询 ...
+    scheduler.cancel(job.id)
+
+- 同时运行的任务数默认按 CPU 核数和可用内存（每个任务按资源限制里的 memory_mb 估算）决定；
+- 排队的任务按优先级（大的先）再按提交顺序启动；
+- 同一个 resource 的任务互斥（例如共用一个增量运行 kernel 的任务），轮到它但资源被占用时继续排队。
+本模块不依赖 Qt。
+"""
+import os
+import sys
+import time
+import heapq
+import queue
+import itertools
+import threading
+
+from typing import Callable, Dict, List, Optional
+
+from .engine import get_engine
+
+
+# 没有设置内存限制时，每个任务按这么多内存估算并行数
+DEFAULT_JOB_MEMORY_MB = 1024
+# 结束的任务最多保留这么多个（日志、图片在任务里，太多会占内存）
+MAX_FINISHED_JOBS = 50
+
+QUEUED, RUNNING = "queued", "running"
+FINISHED = ("ok", "error", "timeout", "canceled")
+
+
+def available_memory() -> Optional[int]:
+    """当前可用内存（字节），取不到时返回 None。优先用 psutil（可选依赖）"""
+    try:
+        import psutil
+        return int(psutil.virtual_memory().available)
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/meminfo", "r") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            return None
+    return None
+
+
+def default_parallelism(memory_per_job_mb: Optional[float] = None) -> int:
+    """min(CPU 核数, 可用内存 / 每个任务的内存)，至少为 1"""
+    cpus = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is None:
+        return max(1, cpus)
+    per_job = (memory_per_job_mb or DEFAULT_JOB_MEMORY_MB) * 1024 ** 2
+    return max(1, min(cpus, int(memory // per_job)))
+
+
+class RunJob:
+    """一次排队 / 运行的脚本；options 原样传给 CodeRunner.run_code_in_background"""
+
+    def __init__(self, job_id: int, code: str, name: str = "", priority: int = 0, tag=None,
+                 resource: Optional[str] = None, **options):
+        self.id = job_id
+        self.code = code
+        self.name = name or f"Run #{job_id}"
+        self.priority = priority
+        self.tag = tag
+        self.resource = resource
+        self.options = options
+        self.log_queue: queue.Queue = queue.Queue()
+        self.figure_queue: queue.Queue = queue.Queue()
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.stats: Optional[dict] = None
+        self.runner = None
+        self.engine_job = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def describe(self) -> str:
+        if self.status == QUEUED:
+            return f"{self.name} 排队中（优先级 {self.priority}）"
+        if self.status == RUNNING:
+            return f"{self.name} 运行中 {time.time() - self.started:.0f}s"
+        wall = self.stats.get("wall") if self.stats else None
+        return f"{self.name} {self.status}" + (f" {wall:.2f}s" if wall is not None else "")
+
+
+class JobScheduler:
+    """线程安全：submit / cancel 可以在 Qt 主线程调用，任务结束的回调在 engine 线程"""
+
+    def __init__(self, make_runner: Callable[[RunJob], object], max_parallel: Optional[int] = None,
+                 on_change: Optional[Callable[[RunJob], None]] = None):
+        self.make_runner = make_runner
+        self.max_parallel = max_parallel or default_parallelism()
+        # 运行任务在 engine 里属于 "cpu" 组，并行数以调度器为准
+        get_engine().set_limit("cpu", self.max_parallel)
+        # 任务状态变化（排队、开始、结束）时调用，在调用 submit / cancel 的线程或 engine 线程里
+        self.on_change = on_change
+        self._lock = threading.RLock()
+        self._heap: List[tuple] = []
+        self._jobs: Dict[int, RunJob] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+
+    # ---------- 提交 / 取消 ----------
+    def submit(self, code: str, name: str = "", priority: int = 0, tag=None,
+               resource: Optional[str] = None, **options) -> RunJob:
+        with self._lock:
+            job = RunJob(next(self._ids), code, name, priority, tag, resource, **options)
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, next(self._seq), job.id))
+            self._prune()
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job_id: int):
+        """排队的任务直接移除，运行中的任务结束子进程"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return
+            if job.status == QUEUED:
+                job.status = "canceled"
+                job.finished = time.time()
+                self._heap = [item for item in self._heap if item[2] != job_id]
+                heapq.heapify(self._heap)
+                job.log_queue.put("⏹️ 已取消（没有开始运行）")
+            elif job.runner is not None:
+                job.runner.stop_execution()
+                return
+        self._notify(job)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job.id)
+
+    def set_priority(self, job_id: int, priority: int):
+        """调整排队中任务的优先级"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return
+            job.priority = priority
+            self._heap = [item if item[2] != job_id else (-priority, item[1], job_id) for item in self._heap]
+            heapq.heapify(self._heap)
+        self._notify(job)
+
+    def set_max_parallel(self, n: int):
+        with self._lock:
+            self.max_parallel = max(1, int(n))
+            get_engine().set_limit("cpu", self.max_parallel)
+        self._dispatch()
+
+    # ---------- 查询 ----------
+    def jobs(self) -> List[RunJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id: int) -> Optional[RunJob]:
+        return self._jobs.get(job_id)
+
+    def running(self) -> List[RunJob]:
+        return [job for job in self.jobs() if job.status == RUNNING]
+
+    def queued(self) -> List[RunJob]:
+        return [job for job in self.jobs() if job.status == QUEUED]
+
+    @property
+    def busy(self) -> bool:
+        return any(not job.done for job in self.jobs())
+
+    # ---------- 调度 ----------
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            busy_resources = {job.resource for job in self._jobs.values() if job.status == RUNNING and job.resource}
+            n_running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            waiting = []
+            while self._heap and n_running < self.max_parallel:
+                item = heapq.heappop(self._heap)
+                job = self._jobs[item[2]]
+                if job.resource and job.resource in busy_resources:
+                    waiting.append(item)
+                    continue
+                job.status = RUNNING
+                job.started = time.time()
+                if job.resource:
+                    busy_resources.add(job.resource)
+                n_running += 1
+                started.append(job)
+            for item in waiting:
+                heapq.heappush(self._heap, item)
+
+        for job in started:
+            job.runner = self.make_runner(job)
+            # 运行协程的 finally 里（子进程或 kernel 已经结束）才释放名额，取消时不会提前启动下一个任务
+            job.runner.on_finished = lambda canceled, job=job: self._finished(job, canceled)
+            job.engine_job = job.runner.run_code_in_background(job.code, tag=job.tag, **job.options)
+            self._notify(job)
+            if job.engine_job is None:
+                self._finished(job)
+            else:
+                # 协程还没开始就被取消时不会走到 finally，由 engine 的完成回调兜底
+                job.engine_job.add_done_callback(lambda engine_job, job=job: self._finished(job, engine_job.cancelled()))
+
+    def _finished(self, job: RunJob, canceled: bool = False):
+        with self._lock:
+            if job.done:
+                return
+            stats = getattr(job.runner, "last_stats", None)
+            if canceled:
+                status = "canceled"
+            elif stats is None:
+                status = "error"
+            else:
+                status = stats.get("status", "ok")
+                if status == "ok" and stats.get("returncode") != 0:
+                    status = "error"
+            job.stats = stats
+            job.status = status
+            job.finished = time.time()
+        self._notify(job)
+        self._dispatch()
+
+    def _prune(self):
+        finished = sorted((job for job in self._jobs.values() if job.done), key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def _notify(self, job: RunJob):
+        if self.on_change is not None:
+            try:
+                self.on_change(job)
+            except Exception as e:
+                print(f"⚠️ 任务状态回调出错: {e}")
@@ -0,0 +1,546 @@
+"""
+本地 HTTP 任务服务：dumbydraw serve
+
+一台机器上跑一个服务进程，持有 API 配置和所有重量级依赖，
+其它客户端（包括图形界面）只提交任务、读取日志和结果。
+
+    POST /generate          {"query": "...", "files": [...], "run": false}  -> {"id": ...}
+    POST /run               {"code": "..."}                                 -> {"id": ...}
+    GET  /jobs              所有任务的状态
+    GET  /jobs/<id>         任务状态
+    GET  /jobs/<id>/result  任务结果（代码、返回码、图片文件名）
+    GET  /jobs/<id>/events  日志流（Server-Sent Events）
+    GET  /jobs/<id>/files/<name>  任务产生的图片
+    POST /jobs/<id>/cancel  取消任务
+    GET  /health
+
+/run 会执行任意 Python 代码，所以每个请求都要带 Authorization: Bearer <token>。
+token 取自 --token 或配置里的 "server_token"，都没有时启动时随机生成，写进 ~/.dumbydraw/server_token，
+同一台机器上的 ServerClient（包括图形界面）会自动读取。默认只监听本机，监听其它地址要加 --allow-remote。
+服务跑在 engine 的 asyncio 事件循环上，本模块不能 import PySide6。
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import secrets
+import argparse
+import ipaddress
+import tempfile
+
+from collections import OrderedDict
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from .config import load_config, data_path, default_baseurl
+from .engine import get_engine, run_process
+from .generator import generate
+from .prompt import get_sys_info, build_system_prompt, describe_inputs
+from .runner import script_command, child_env
+from .validate import validate_code
+from .providers import Router
+from .budget import TokenBudget
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TOKEN_FILE = "server_token"
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+# =====================================================
+# 访问令牌
+# =====================================================
+def load_token(cfg: Optional[dict] = None) -> str:
+    """配置里的 "server_token"，没有时读本机服务启动时写下的 ~/.dumbydraw/server_token"""
+    cfg = load_config() if cfg is None else cfg
+    if cfg.get("server_token"):
+        return cfg["server_token"]
+    try:
+        with open(data_path(TOKEN_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def save_token(token: str) -> str:
+    """写进 ~/.dumbydraw/server_token（只有自己能读），返回文件路径"""
+    path = data_path(TOKEN_FILE)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return path
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# =====================================================
+# 任务
+# =====================================================
+class ServerJob:
+    def __init__(self, kind: str, params: dict, workdir: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.workdir = os.path.join(workdir, self.id)
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.logs: List[str] = []
+        self.result: dict = {}
+        self.error = ""
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "canceled")
+
+    def log(self, line: str):
+        self.logs.append(line)
+        for q in self._subscribers:
+            q.put_nowait(line)
+
+    def subscribe(self) -> asyncio.Queue:
+        """订阅日志：先补发已有日志，任务结束时收到 None"""
+        q = asyncio.Queue()
+        for line in self.logs:
+            q.put_nowait(line)
+        if self.done:
+            q.put_nowait(None)
+        else:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        if q in self._subscribers:
+            self._subscribers.remove(q)
+
+    def finish(self, status: str, error: str = ""):
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+        for q in self._subscribers:
+            q.put_nowait(None)
+        self._subscribers.clear()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "log_lines": len(self.logs),
+        }
+
+
+# =====================================================
+# 任务队列 + worker 池
+# =====================================================
+class JobServer:
+    def __init__(self, baseurl: str, model: str, api_key: str,
+                 workers: int = 4, max_jobs: int = 1000, workdir: Optional[str] = None,
+                 router: Optional[Router] = None, budget: Optional[TokenBudget] = None,
+                 token: Optional[str] = None):
+        self.baseurl = baseurl
+        self.model = model
+        self.api_key = api_key
+        # 多个接口时按测速路由；请求里指定了 model 的不路由
+        self.router = router
+        self.budget = budget or TokenBudget()
+        # 所有请求都要带这个 token；不传时随机生成
+        self.token = token or secrets.token_urlsafe(24)
+        self.workers = max(1, workers)
+        self.max_jobs = max_jobs
+        self.workdir = workdir or tempfile.mkdtemp(prefix="dumbydraw_serve_")
+        self.base_prompt = build_system_prompt(get_sys_info())
+        self.jobs: "OrderedDict[str, ServerJob]" = OrderedDict()
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._server = None
+
+    # ---------- 任务管理 ----------
+    def submit(self, kind: str, params: dict) -> ServerJob:
+        job = ServerJob(kind, params, self.workdir)
+        self.jobs[job.id] = job
+        self._evict()
+        self.queue.put_nowait(job)
+        return job
+
+    def cancel(self, job: ServerJob):
+        if job.status == "queued":
+            job.finish("canceled")
+        elif job.status == "running" and job.task:
+            job.task.cancel()
+
+    def _evict(self):
+        """只保留最近 max_jobs 个任务，先丢弃已结束的旧任务"""
+        while len(self.jobs) > self.max_jobs:
+            for job_id, job in self.jobs.items():
+                if job.done:
+                    del self.jobs[job_id]
+                    shutil.rmtree(job.workdir, ignore_errors=True)
+                    break
+            else:
+                break
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            if job.done:
+                continue
+            job.status = "running"
+            job.started = time.time()
+            job.task = asyncio.ensure_future(self._execute(job))
+            try:
+                await job.task
+                job.finish("done" if job.result.get("returncode", 0) == 0 else "failed")
+            except asyncio.CancelledError:
+                if job.task.cancelled():
+                    job.log("⏹️ canceled")
+                    job.finish("canceled")
+                else:
+                    # worker 自身被取消（服务关闭）
+                    job.finish("canceled")
+                    raise
+            except Exception as e:
+                job.log(f"❌ {e}")
+                job.finish("failed", str(e))
+
+    async def _execute(self, job: ServerJob):
+        engine = get_engine()
+        os.makedirs(job.workdir, exist_ok=True)
+        params = job.params
+
+        if job.kind == "generate":
+            loop = asyncio.get_event_loop()
+            budget = self.budget.available(self.base_prompt, params["query"])
+            file_info = await loop.run_in_executor(None, lambda: describe_inputs(
+                params.get("files", []), echo=False, query=params["query"], budget=budget,
+                log=lambda line: loop.call_soon_threadsafe(job.log, line)))
+            system_prompt = self.base_prompt + file_info
+            job.log(self.budget.summary(system_prompt, params["query"]))
+            async with engine.limiter("llm"):
+                job.log("🚀 generating")
+                llm, metrics = {}, []
+                code = await generate(self.baseurl, params.get("model") or self.model, self.api_key,
+                                      params["query"], system_prompt, on_line=job.log, stats=llm,
+                                      router=None if params.get("model") else self.router,
+                                      on_metrics=metrics.append)
+                job.log(f"📈 {metrics[-1].status_text()}")
+                job.result["llm"] = llm.get("metrics")
+        else:
+            code = params["code"]
+
+        check = validate_code(code, params.get("files", []), cwd=job.workdir)
+        check.report(job.log)
+        code = job.result["code"] = check.code
+        if job.kind == "generate" and not params.get("run"):
+            return
+        if not check.ok:
+            raise ValueError(f"code rejected by static check: {'; '.join(str(i) for i in check.errors)}")
+
+        script_path = os.path.join(job.workdir, "script.py")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(code)
+
+        async with engine.limiter("cpu"):
+            job.log("▶ running")
+            return_code = await run_process(
+                script_command(script_path, figure_path=os.path.join(job.workdir, "figure.png")),
+                on_stdout=job.log,
+                on_stderr=lambda line: job.log(f"❌ {line}"),
+                env=child_env(MPLBACKEND="Agg"),
+                cwd=job.workdir,
+            )
+        job.result["returncode"] = return_code
+        job.result["figures"] = sorted(name for name in os.listdir(job.workdir) if name.startswith("figure"))
+
+    # ---------- HTTP ----------
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        address = await self.start(host, port)
+        print(f"🌐 DumbyDraw server listening on http://{address[0]}:{address[1]} ({self.workers} workers)", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _version = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0) or 0)
+            body = await reader.readexactly(length) if length else b""
+            if not self._authorized(headers):
+                return self._send_json(writer, 401, {"error": "missing or invalid token"})
+            await self._dispatch(method.upper(), urlsplit(target).path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except ConnectionError:
+                pass
+
+    def _authorized(self, headers: dict) -> bool:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), self.token.encode())
+
+    @staticmethod
+    def _send(writer, status: int, body: bytes, content_type: str):
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    def _send_json(self, writer, status: int, data):
+        self._send(writer, status, json.dumps(data, ensure_ascii=False).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer):
+        parts = [p for p in path.split("/") if p]
+
+        if parts == ["health"]:
+            queued = sum(1 for j in self.jobs.values() if j.status == "queued")
+            running = sum(1 for j in self.jobs.values() if j.status == "running")
+            return self._send_json(writer, 200, {"status": "ok", "queued": queued, "running": running,
+                                                 "workers": self.workers, "model": self.model})
+
+        if parts in (["generate"], ["run"]):
+            if method != "POST":
+                return self._send_json(writer, 405, {"error": "POST required"})
+            try:
+                params = json.loads(body or b"{}")
+            except ValueError:
+                return self._send_json(writer, 400, {"error": "invalid JSON"})
+            required = "query" if parts[0] == "generate" else "code"
+            if not isinstance(params, dict) or not isinstance(params.get(required), str):
+                return self._send_json(writer, 400, {"error": f"'{required}' is required"})
+            files = params.get("files", [])
+            if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+                return self._send_json(writer, 400, {"error": "'files' must be a list of paths"})
+            if not isinstance(params.get("model") or "", str):
+                return self._send_json(writer, 400, {"error": "'model' must be a string"})
+            job = self.submit(parts[0], params)
+            return self._send_json(writer, 202, {"id": job.id, "status": job.status})
+
+        if parts == ["jobs"]:
+            return self._send_json(writer, 200, [job.to_dict() for job in self.jobs.values()])
+
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return self._send_json(writer, 404, {"error": "unknown job"})
+            rest = parts[2:]
+            if not rest:
+                return self._send_json(writer, 200, job.to_dict())
+            if rest == ["result"]:
+                if not job.done:
+                    return self._send_json(writer, 409, {"error": "job not finished", "status": job.status})
+                return self._send_json(writer, 200, dict(job.to_dict(), **job.result))
+            if rest == ["cancel"] and method == "POST":
+                self.cancel(job)
+                return self._send_json(writer, 200, job.to_dict())
+            if rest == ["events"]:
+                return await self._stream_events(job, writer)
+            if len(rest) == 2 and rest[0] == "files":
+                name = os.path.basename(rest[1])
+                file_path = os.path.join(job.workdir, name)
+                if not os.path.isfile(file_path):
+                    return self._send_json(writer, 404, {"error": "no such file"})
+                with open(file_path, "rb") as f:
+                    data = f.read()
+                ctype = "image/svg+xml" if name.endswith(".svg") else "image/png"
+                return self._send(writer, 200, data, ctype)
+
+        self._send_json(writer, 404, {"error": "not found"})
+
+    async def _stream_events(self, job: ServerJob, writer):
+        """Server-Sent Events：每行日志一个 log 事件，结束时发 end 事件"""
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        q = job.subscribe()
+        try:
+            while True:
+                line = await q.get()
+                if line is None:
+                    break
+                data = "\n".join(f"data: {part}" for part in line.split("\n"))
+                writer.write(f"event: log\n{data}\n\n".encode("utf-8"))
+                await writer.drain()
+            end = json.dumps({"status": job.status}, ensure_ascii=False)
+            writer.write(f"event: end\ndata: {end}\n\n".encode("utf-8"))
+        finally:
+            job.unsubscribe(q)
+
+
+# =====================================================
+# 客户端
+# =====================================================
+class ServerClient:
+    """同步客户端，图形界面和脚本都可以用；token 默认用 load_token() 读到的"""
+
+    def __init__(self, url: str, timeout: float = 30, token: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.token = token if token is not None else load_token()
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None):
+        import requests
+        response = requests.request(method, self.url + path, json=payload, headers=self.headers,
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def generate(self, query: str, files: Optional[List[str]] = None, run: bool = False,
+                 model: Optional[str] = None) -> str:
+        payload = {"query": query, "files": files or [], "run": run}
+        if model:
+            payload["model"] = model
+        return self._request("POST", "/generate", payload)["id"]
+
+    def run(self, code: str) -> str:
+        return self._request("POST", "/run", {"code": code})["id"]
+
+    def status(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{job_id}/result")
+
+    def cancel(self, job_id: str) -> dict:
+        return self._request("POST", f"/jobs/{job_id}/cancel")
+
+    def events(self, job_id: str):
+        """逐条产出 (event, data)，任务结束后停止"""
+        import requests
+        response = requests.get(f"{self.url}/jobs/{job_id}/events", headers=self.headers, stream=True,
+                                timeout=(self.timeout, None))
+        response.raise_for_status()
+        event, data = "message", []
+        for raw in response.iter_lines(decode_unicode=True):
+            if raw is None:
+                continue
+            if raw == "":
+                if data:
+                    yield event, "\n".join(data)
+                event, data = "message", []
+                continue
+            if raw.startswith("event:"):
+                event = raw[6:].strip()
+            elif raw.startswith("data:"):
+                data.append(raw[5:][1:] if raw[5:].startswith(" ") else raw[5:])
+        response.close()
+
+
+# =====================================================
+# 命令行
+# =====================================================
+def build_parser(parser: Optional[argparse.ArgumentParser] = None) -> argparse.ArgumentParser:
+    parser = parser or argparse.ArgumentParser(prog="dumbydraw serve")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow listening on a non-loopback address (clients still need the token)")
+    parser.add_argument("--token", default=None,
+                        help="shared access token (default: config 'server_token', otherwise generated)")
+    parser.add_argument("--workers", type=int, default=4, help="jobs processed at the same time")
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--cpu-concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--api-key", default=None)
+    return parser
+
+
+def run(args) -> int:
+    cfg = load_config()
+    if not is_loopback(args.host) and not args.allow_remote:
+        print(f"⛔ refusing to listen on {args.host}: /run executes arbitrary code, "
+              f"pass --allow-remote to expose the server", file=sys.stderr)
+        return 2
+    token = args.token or cfg.get("server_token") or secrets.token_urlsafe(24)
+    print(f"🔑 access token saved to {save_token(token)}", flush=True)
+    server = JobServer(
+        baseurl=args.base_url or default_baseurl(cfg),
+        model=args.model or cfg.get("model", ""),
+        api_key=args.api_key or cfg.get("api_key", ""),
+        workers=args.workers,
+        router=None if args.base_url or args.model else Router.from_config(cfg),
+        budget=TokenBudget.from_config(cfg),
+        token=token,
+    )
+    engine = get_engine()
+    engine.set_limit("llm", args.llm_concurrency)
+    engine.set_limit("cpu", args.cpu_concurrency)
+    job = engine.submit(server.serve_forever(args.host, args.port), name="serve")
+    try:
+        job.result()
+    except KeyboardInterrupt:
+        print("🛑 stopping server")
+        job.cancel()
+    finally:
+        engine.shutdown()
+    return 0
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
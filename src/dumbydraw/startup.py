@@ -0,0 +1,126 @@
+"""
+启动速度：窗口先显示，pandas / numpy / openai 等重量级模块在后台线程预热。
+
+    dumbydraw --startup-profile     # 打印 import 耗时分解、首次绘制和预热完成时间
+
+分析模式会用 python -X importtime 重新启动一次程序，预热完成后自动退出。
+本模块不能 import PySide6 或任何重量级依赖。
+"""
+import os
+import sys
+import time
+import asyncio
+import importlib
+import subprocess
+
+from typing import Dict, List, Optional, Tuple
+
+
+PROFILE_ENV = "DUMBYDRAW_STARTUP_PROFILE"
+MARKER = "dumbydraw-startup:"
+# 第一次生成代码 / 检测表格时才需要，窗口显示后在后台先 import
+WARM_UP_MODULES = ["numpy", "pandas", "openai", "dumbydraw.dataio", "dumbydraw.deepseek"]
+
+
+def profiling() -> bool:
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+def mark(name: str):
+    """分析模式下记录一个时间点（写到原始 stderr，和 -X importtime 的输出按顺序交错）"""
+    if profiling():
+        stream = sys.__stderr__
+        stream.write(f"{MARKER}{name} {time.time():.6f}\n")
+        stream.flush()
+
+
+async def warm_up(modules: Optional[List[str]] = None):
+    """在线程池里逐个 import，缺少的可选依赖直接跳过"""
+    loop = asyncio.get_event_loop()
+    for name in modules or WARM_UP_MODULES:
+        try:
+            await loop.run_in_executor(None, importlib.import_module, name)
+        except ImportError:
+            pass
+    mark("warm-up-done")
+
+
+# =====================================================
+# -X importtime 输出解析
+# =====================================================
+def parse_importtime(lines: List[str]) -> Tuple[List[dict], Dict[str, float]]:
+    """
+    Returns:
+        (imports, marks): imports 为每个模块的 {"name", "self"(秒), "phase"}，
+        phase 是它之前最近的 mark 名称；marks 为 {mark 名称: time.time()}
+    """
+    imports = []
+    marks = {}
+    phase = "start"
+    for line in lines:
+        if line.startswith(MARKER):
+            name, _, stamp = line[len(MARKER):].strip().rpartition(" ")
+            marks[name] = float(stamp)
+            phase = name
+            continue
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 表头
+        imports.append({"name": fields[2].strip(), "self": int(fields[0]) / 1e6, "phase": phase})
+    return imports, marks
+
+
+def group_by_package(imports: List[dict]) -> List[Tuple[str, float, int]]:
+    """
+    按顶层包汇总 self 时间，返回 [(包名, 秒, 模块数)]，耗时多的在前。
+    后台线程里的 import 会和主线程交错，-X importtime 的缩进层级不可靠，所以不用 cumulative
+    """
+    totals: Dict[str, List[float]] = {}
+    for item in imports:
+        package = item["name"].split(".", 1)[0]
+        entry = totals.setdefault(package, [0.0, 0])
+        entry[0] += item["self"]
+        entry[1] += 1
+    return sorted(((name, t, int(n)) for name, (t, n) in totals.items()), key=lambda x: x[1], reverse=True)
+
+
+def format_report(imports: List[dict], marks: Dict[str, float], t0: float, top: int = 15) -> str:
+    lines = ["⏱️ Startup profile"]
+    for name, label in (("qt-ready", "QApplication created"), ("window-shown", "window shown"),
+                        ("first-paint", "first paint"), ("warm-up-done", "background warm-up finished")):
+        if name in marks:
+            lines.append(f"  {label:<30} {marks[name] - t0:8.3f}s")
+
+    before = [i for i in imports if i["phase"] in ("start", "qt-ready")]
+    after = [i for i in imports if i["phase"] not in ("start", "qt-ready")]
+    for title, group in (("Imports before the window is shown", before), ("Imports after the window is shown", after)):
+        if not group:
+            continue
+        total = sum(i["self"] for i in group)
+        lines.append(f"\n{title} ({total:.3f}s in {len(group)} modules, top {top} packages):")
+        for package, seconds, count in group_by_package(group)[:top]:
+            lines.append(f"  {seconds * 1e3:9.1f}ms  {package} ({count} modules)")
+    return "\n".join(lines)
+
+
+def profile_startup(argv: List[str], top: int = 15) -> int:
+    """用 -X importtime 启动一次图形界面，预热结束后退出并打印报告"""
+    from .runner import child_env
+
+    env = child_env(**{PROFILE_ENV: "1"})
+    command = [sys.executable, "-X", "importtime", "-m", "dumbydraw"] + list(argv)
+    t0 = time.time()
+    proc = subprocess.run(command, env=env, stderr=subprocess.PIPE, text=True, errors="replace")
+    lines = proc.stderr.splitlines()
+    imports, marks = parse_importtime(lines)
+    if not imports:
+        # 没有 importtime 输出说明启动失败，原样打出错误
+        sys.stderr.write(proc.stderr)
+        return proc.returncode or 1
+    print(format_report(imports, marks, t0, top))
+    if proc.returncode:
+        errors = [line for line in lines if not line.startswith(("import time:", MARKER))]
+        print("\n⚠️ GUI exited with code {}:\n{}".format(proc.returncode, "\n".join(errors[-20:])))
+    return proc.returncode
@@ -0,0 +1,228 @@
+"""
+每次调用 AI 接口的性能数据：首个思考 token / 首个输出 token 的时间、思考和输出的 token 数、
+生成速度、总耗时、提示词大小。
+
+    metrics = LLMMetrics(model="deepseek-ai/DeepSeek-R1", provider="default", prompt_chars=len(prompt))
+    metrics.reasoning(text)      # 每收到一段思考内容
+    metrics.content(text)        # 每收到一段输出内容
+    metrics.finish(usage)        # 结束；usage 是服务端返回的用量（可以没有）
+    metrics.status_text()        # 状态栏显示的一行
+    record_metrics(metrics)      # 追加到 ~/.dumbydraw/llm_metrics.jsonl
+
+token 数优先用服务端返回的用量（completion_tokens，以及 reasoning_tokens），
+没有返回时按收到的 chunk 数估计（流式接口基本是一个 token 一个 chunk）。
+dumbydraw metrics 按接口和模型汇总 llm_metrics.jsonl，比较不同服务商的真实速度。本模块不依赖 Qt。
+"""
+import json
+import time
+import argparse
+
+from typing import Dict, List, Optional
+
+from .config import data_path
+
+
+METRICS_FILE = "llm_metrics.jsonl"
+
+
+class LLMMetrics:
+    def __init__(self, model: str = "", provider: str = "", prompt_chars: int = 0):
+        """provider 是 providers.Provider 的名字，直接调用时是接口地址"""
+        self.model = model
+        self.provider = provider
+        self.prompt_chars = prompt_chars
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        # 相对开始时间的秒数
+        self.first_reasoning: Optional[float] = None
+        self.first_content: Optional[float] = None
+        self.reasoning_tokens = 0
+        self.content_tokens = 0
+        self.prompt_tokens: Optional[int] = None
+        self.total: Optional[float] = None
+        self.status = "running"
+        self.error = ""
+
+    def begin(self):
+        """从真正发出请求时开始计时（不算 import SDK、建立客户端的时间）"""
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return self.total if self.total is not None else time.perf_counter() - self.t0
+
+    @property
+    def first_token(self) -> Optional[float]:
+        times = [t for t in (self.first_reasoning, self.first_content) if t is not None]
+        return min(times) if times else None
+
+    def reasoning(self, text: str):
+        if self.first_reasoning is None:
+            self.first_reasoning = time.perf_counter() - self.t0
+        self.reasoning_tokens += 1
+
+    def content(self, text: str):
+        if self.first_content is None:
+            self.first_content = time.perf_counter() - self.t0
+        self.content_tokens += 1
+
+    def completion_tokens(self) -> int:
+        return self.reasoning_tokens + self.content_tokens
+
+    def tokens_per_second(self) -> Optional[float]:
+        """首个 token 之后的生成速度"""
+        first = self.first_token
+        if first is None:
+            return None
+        seconds = self.elapsed() - first
+        return self.completion_tokens() / seconds if seconds > 0 else None
+
+    def finish(self, usage: Optional[dict] = None, status: str = "ok", error: str = ""):
+        if self.total is not None:
+            return
+        self.total = time.perf_counter() - self.t0
+        self.status = status
+        self.error = error
+        if not usage:
+            return
+        self.prompt_tokens = usage.get("prompt_tokens", self.prompt_tokens)
+        completion = usage.get("completion_tokens")
+        if not completion:
+            return
+        reasoning = usage.get("reasoning_tokens")
+        if reasoning is None:
+            # 服务端只给了总数：按收到的 chunk 比例分给思考和输出
+            counted = self.completion_tokens()
+            reasoning = round(completion * self.reasoning_tokens / counted) if counted else 0
+        self.reasoning_tokens = int(reasoning)
+        self.content_tokens = int(completion) - self.reasoning_tokens
+
+    def to_dict(self) -> dict:
+        tps = self.tokens_per_second()
+        return {
+            "time": self.started,
+            "provider": self.provider,
+            "model": self.model,
+            "status": self.status,
+            "error": self.error,
+            "prompt_chars": self.prompt_chars,
+            "prompt_tokens": self.prompt_tokens,
+            "ttft_reasoning": self.first_reasoning,
+            "ttft_content": self.first_content,
+            "reasoning_tokens": self.reasoning_tokens,
+            "content_tokens": self.content_tokens,
+            "tokens_per_s": round(tps, 2) if tps else None,
+            "total_s": self.elapsed(),
+        }
+
+    def status_text(self) -> str:
+        """例如：DeepSeek-R1 · 思考 1.2s · 输出 6.3s · 412+356 tok · 48 tok/s · 14.0s"""
+        parts = [self.model.split("/")[-1] or "AI"]
+        # 接口名只在配置了多个接口时有意义；没有名字时 provider 是地址，不显示
+        if self.provider and self.provider != "default" and "://" not in self.provider:
+            parts[0] += f"@{self.provider}"
+        if self.first_token is None:
+            parts.append(f"等待首个 token {self.elapsed():.1f}s")
+        else:
+            if self.first_reasoning is not None:
+                parts.append(f"思考 {self.first_reasoning:.1f}s")
+            if self.first_content is not None:
+                parts.append(f"输出 {self.first_content:.1f}s")
+            parts.append(f"{self.reasoning_tokens}+{self.content_tokens} tok" if self.reasoning_tokens
+                         else f"{self.content_tokens} tok")
+            tps = self.tokens_per_second()
+            if tps:
+                parts.append(f"{tps:.0f} tok/s")
+            parts.append(f"{self.elapsed():.1f}s")
+        if self.status not in ("ok", "running"):
+            parts.append(self.status)
+        return " · ".join(parts)
+
+
+def record_metrics(metrics: LLMMetrics, path: Optional[str] = None):
+    """追加一条记录到 ~/.dumbydraw/llm_metrics.jsonl"""
+    try:
+        with open(path or data_path(METRICS_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+
+def load_metrics(path: Optional[str] = None) -> List[dict]:
+    records = []
+    try:
+        with open(path or data_path(METRICS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def _median(values: List[float]) -> Optional[float]:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def summarize(records: List[dict]) -> List[dict]:
+    """按 (接口, 模型) 汇总：请求数、成功数，以及首 token、速度和总耗时的中位数"""
+    groups: Dict[tuple, List[dict]] = {}
+    for record in records:
+        groups.setdefault((record.get("provider") or "", record.get("model") or ""), []).append(record)
+    rows = []
+    for (provider, model), items in groups.items():
+        ok = [r for r in items if r.get("status") == "ok"]
+        first = [min(t for t in (r.get("ttft_reasoning"), r.get("ttft_content")) if t is not None)
+                 for r in ok if r.get("ttft_reasoning") is not None or r.get("ttft_content") is not None]
+        rows.append({
+            "provider": provider,
+            "model": model,
+            "requests": len(items),
+            "ok": len(ok),
+            "ttft_s": _median(first),
+            "ttft_content_s": _median([r.get("ttft_content") for r in ok]),
+            "tokens_per_s": _median([r.get("tokens_per_s") for r in ok]),
+            "total_s": _median([r.get("total_s") for r in ok]),
+        })
+    rows.sort(key=lambda r: (r["total_s"] is None, r["total_s"] or 0))
+    return rows
+
+
+# =====================================================
+# 命令行：dumbydraw metrics
+# =====================================================
+def build_parser(parser: Optional[argparse.ArgumentParser] = None) -> argparse.ArgumentParser:
+    parser = parser or argparse.ArgumentParser(prog="dumbydraw metrics")
+    parser.add_argument("--file", default=None, help=f"metrics file (default: ~/.dumbydraw/{METRICS_FILE})")
+    parser.add_argument("--last", type=int, default=0, help="only the last N requests")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    return parser
+
+
+def run(args) -> int:
+    records = load_metrics(args.file)
+    if args.last:
+        records = records[-args.last:]
+    rows = summarize(records)
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return 0
+    if not rows:
+        print(f"no records in {args.file or data_path(METRICS_FILE)}")
+        return 0
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-".rjust(int(spec.split(".")[0]))
+
+    print(f"{'provider':<12} {'model':<36} {'ok/n':>8} {'ttft':>7} {'content':>8} {'tok/s':>7} {'total':>7}")
+    for row in rows:
+        print(f"{row['provider'][:12]:<12} {row['model'][-36:]:<36} {str(row['ok']) + '/' + str(row['requests']):>8} "
+              f"{fmt(row['ttft_s'], '7.2f')} {fmt(row['ttft_content_s'], '8.2f')} "
+              f"{fmt(row['tokens_per_s'], '7.0f')} {fmt(row['total_s'], '7.1f')}")
+    return 0
@@ -0,0 +1,373 @@
+"""
+运行前的静态检查：在当前进程里编译、按系统提示词的规则检查 AST、核对读取的文件路径，
+不用启动 Python 解释器就能发现大部分生成代码的问题，能自动修的直接修。
+
+    result = validate_code(code, files=["/data/a.csv"])
+    result.code       # 修复后的代码
+    result.errors     # 修不了的问题，不应该运行
+    result.fixed      # 自动修复的问题
+
+检查项：
+- 语法错误（AI 在代码块外多写了说明文字时，取出其中的 python 代码块）；
+- if __name__ == "__main__"：去掉判断，把里面的代码移到顶层；
+- 顶层的 plt.close()：删掉（会让截图钩子拿不到图）；
+- 读取不存在的文件：文件名和导入的文件相同时替换成导入文件的完整路径，否则报错；
+- 代码里 pip install、print 中文：只提示。
+本模块只用标准库，不依赖 Qt，几毫秒内完成。
+"""
+import os
+import re
+import ast
+
+from typing import List, Optional, Tuple
+
+
+ERROR, WARNING = "error", "warning"
+
+# 第一个参数是要读取的文件的函数，按导入展开后的完整名字匹配（pd.read_csv → pandas.read_csv、
+# from PIL import Image 后的 Image.open → PIL.Image.open）；load、read 这类裸名字常常是用户自己的函数，不检查。
+# 只检查字符串字面量的参数
+READ_FUNCTIONS = {
+    "open", "io.open", "pandas.ExcelFile",
+    "numpy.load", "numpy.loadtxt", "numpy.genfromtxt", "numpy.fromfile", "numpy.memmap",
+    "openpyxl.load_workbook", "PIL.Image.open", "matplotlib.pyplot.imread", "matplotlib.image.imread",
+    "imageio.imread", "imageio.v2.imread", "imageio.v3.imread", "cv2.imread",
+    "dumbydraw.dataio.iter_chunks", "dumbydraw.dataio.groupby_aggregate", "dumbydraw.dataio.column_stats",
+    "dumbydraw.dataio.sample_rows", "dumbydraw.dataio.memmap_array",
+}
+READ_PREFIXES = ("pandas.read_",)
+# 代码没有写 import 时按惯用的别名展开
+DEFAULT_ALIASES = {"pd": "pandas", "np": "numpy", "plt": "matplotlib.pyplot"}
+PATH_KEYWORDS = ("filepath_or_buffer", "io", "file", "fname", "filename", "path", "filepath")
+FILE_LIKE = re.compile(r"[\\/]|\.[A-Za-z0-9]{1,5}$")
+FENCE = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.S)
+CJK = re.compile(r"[一-鿿]")
+
+
+class Issue:
+    def __init__(self, line: int, rule: str, message: str, severity: str = ERROR, fixed: bool = False):
+        self.line = line
+        self.rule = rule
+        self.message = message
+        self.severity = severity
+        self.fixed = fixed
+
+    def __str__(self):
+        where = f"L{self.line} " if self.line else ""
+        return f"{where}{self.message}"
+
+    def __repr__(self):
+        return f"Issue({self.line}, {self.rule!r}, {self.severity}, fixed={self.fixed})"
+
+
+class ValidationResult:
+    def __init__(self, code: str, issues: List[Issue]):
+        self.code = code
+        self.issues = issues
+
+    @property
+    def errors(self) -> List[Issue]:
+        return [i for i in self.issues if i.severity == ERROR and not i.fixed]
+
+    @property
+    def warnings(self) -> List[Issue]:
+        return [i for i in self.issues if i.severity == WARNING]
+
+    @property
+    def fixed(self) -> List[Issue]:
+        return [i for i in self.issues if i.fixed]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def report(self, log, fixed: bool = True, warnings: bool = True, errors: bool = True):
+        """把结果写进日志（log 为 print 或 queue.put 之类的单参数函数）"""
+        if fixed:
+            for issue in self.fixed:
+                log(f"🔧 已自动修复: {issue}")
+        if warnings:
+            for issue in self.warnings:
+                log(f"⚠️ {issue}")
+        if errors:
+            for issue in self.errors:
+                log(f"❌ {issue}")
+
+
+# =====================================================
+# 按行列替换源码
+# =====================================================
+def _offsets(code: str) -> List[int]:
+    starts, pos = [], 0
+    for line in code.splitlines(keepends=True):
+        starts.append(pos)
+        pos += len(line)
+    starts.append(pos)
+    return starts
+
+
+def _char_offset(code: str, starts: List[int], lineno: int, col: int) -> int:
+    """ast 的 col_offset 是 UTF-8 字节数，换算成字符下标"""
+    line_start = starts[lineno - 1]
+    line = code[line_start:starts[lineno]] if lineno < len(starts) else code[line_start:]
+    return line_start + len(line.encode("utf-8")[:col].decode("utf-8", "ignore"))
+
+
+def _apply_edits(code: str, edits: List[Tuple[int, int, str]]) -> str:
+    """edits: (开始下标, 结束下标, 替换文字)，互不重叠"""
+    for start, end, text in sorted(edits, reverse=True):
+        code = code[:start] + text + code[end:]
+    return code
+
+
+def _node_span(code: str, starts: List[int], node: ast.AST, whole_lines: bool = False) -> Tuple[int, int]:
+    if whole_lines:
+        return starts[node.lineno - 1], starts[min(node.end_lineno, len(starts) - 1)]
+    return (_char_offset(code, starts, node.lineno, node.col_offset),
+            _char_offset(code, starts, node.end_lineno, node.end_col_offset))
+
+
+# =====================================================
+# 各项检查
+# =====================================================
+def _dotted(node: ast.AST) -> str:
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _import_aliases(tree: ast.Module) -> dict:
+    """导入的名字 → 完整的模块路径（import pandas as pd、from PIL import Image）"""
+    aliases = dict(DEFAULT_ALIASES)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            for alias in node.names:
+                aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+    return aliases
+
+
+def _qualified(func: ast.AST, aliases: dict) -> str:
+    name = _dotted(func)
+    head, dot, rest = name.partition(".")
+    return aliases[head] + dot + rest if head in aliases else name
+
+
+def _is_read(name: str) -> bool:
+    return name in READ_FUNCTIONS or name.startswith(READ_PREFIXES)
+
+
+def _pyplot_names(tree: ast.Module) -> set:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == "matplotlib.pyplot":
+                    names.add(alias.asname or "matplotlib.pyplot")
+        elif isinstance(node, ast.ImportFrom) and node.module == "matplotlib" and node.level == 0:
+            for alias in node.names:
+                if alias.name == "pyplot":
+                    names.add(alias.asname or "pyplot")
+    return names
+
+
+def _is_main_guard(node: ast.AST) -> bool:
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    test = node.test
+    sides = [test.left] + list(test.comparators)
+    return (len(test.ops) == 1 and isinstance(test.ops[0], ast.Eq)
+            and any(isinstance(s, ast.Name) and s.id == "__name__" for s in sides)
+            and any(isinstance(s, ast.Constant) and s.value == "__main__" for s in sides))
+
+
+def _unwrap_main(code: str, starts: List[int], node: ast.If) -> Tuple[int, int, str]:
+    """去掉 if 判断，body 按第一行的缩进减少一层；else 分支不会在脚本里执行，一起删掉"""
+    body_start = starts[node.body[0].lineno - 1]
+    body_end = starts[min(node.body[-1].end_lineno, len(starts) - 1)]
+    body = code[body_start:body_end]
+    indent = re.match(r"[ \t]*", body).group(0)
+    lines = [line[len(indent):] if line.startswith(indent) else line
+             for line in body.splitlines(keepends=True)]
+    start, end = _node_span(code, starts, node, whole_lines=True)
+    text = "".join(lines)
+    if not text.endswith("\n"):
+        text += "\n"
+    return start, end, text
+
+
+def _path_argument(call: ast.Call) -> Optional[ast.Constant]:
+    if call.args:
+        arg = call.args[0]
+    else:
+        arg = next((kw.value for kw in call.keywords if kw.arg in PATH_KEYWORDS), None)
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+        return arg
+    return None
+
+
+def _writes(call: ast.Call, name: str) -> bool:
+    """open(path, "w") 之类写文件的调用不检查"""
+    if name not in ("open", "io.open"):
+        return False
+    mode = call.args[1] if len(call.args) > 1 else next((kw.value for kw in call.keywords if kw.arg == "mode"), None)
+    return isinstance(mode, ast.Constant) and isinstance(mode.value, str) and any(c in mode.value for c in "wax")
+
+
+def _match_file(path: str, files: List[str]) -> Optional[str]:
+    base = os.path.basename(path.replace("\\", "/"))
+    matches = [f for f in files if os.path.basename(f) == base]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _written_paths(tree: ast.Module) -> set:
+    """在别的调用里出现过的字符串（df.to_csv("x.csv")、open("x.csv", "w")），脚本可能先生成再读取"""
+    written = set()
+    aliases = _import_aliases(tree)
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _qualified(node.func, aliases)
+        if _is_read(name) and not _writes(node, name):
+            continue
+        for arg in list(node.args) + [kw.value for kw in node.keywords]:
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                written.add(arg.value)
+    return written
+
+
+def _check_paths(code: str, starts: List[int], tree: ast.Module, files: List[str], cwd: str,
+                 issues: List[Issue], edits: list, repair: bool):
+    written = _written_paths(tree)
+    aliases = _import_aliases(tree)
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _qualified(node.func, aliases)
+        if not _is_read(name) or _writes(node, name):
+            continue
+        arg = _path_argument(node)
+        if arg is None:
+            continue
+        path = arg.value
+        if not path or "://" in path or "\n" in path or not FILE_LIKE.search(path) or path in written:
+            continue
+        full = os.path.join(cwd, os.path.expanduser(path))
+        if os.path.exists(full):
+            continue
+        replacement = _match_file(path, files)
+        if replacement is not None and repair:
+            start, end = _node_span(code, starts, arg)
+            edits.append((start, end, repr(replacement)))
+            issues.append(Issue(arg.lineno, "path", f"文件 {path} 不存在，改成导入的 {replacement}", fixed=True))
+        elif replacement is not None:
+            issues.append(Issue(arg.lineno, "path", f"文件 {path} 不存在，导入的文件是 {replacement}"))
+        else:
+            issues.append(Issue(arg.lineno, "path", f"读取的文件 {path} 不存在，也不在导入的文件列表里"))
+
+
+def _check_rules(code: str, starts: List[int], tree: ast.Module, issues: List[Issue], edits: list, repair: bool):
+    pyplot = _pyplot_names(tree)
+    for node in tree.body:
+        if _is_main_guard(node):
+            if repair:
+                edits.append(_unwrap_main(code, starts, node))
+            issues.append(Issue(node.lineno, "main-guard", '不允许 if __name__ == "__main__"', fixed=repair))
+        elif (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+              and _dotted(node.value.func).rpartition(".")[0] in pyplot
+              and _dotted(node.value.func).endswith(".close")):
+            if repair:
+                start, end = _node_span(code, starts, node)
+                line_start, line_end = _node_span(code, starts, node, whole_lines=True)
+                # 单独一行时整行删掉，和别的语句写在同一行（a; plt.close()）时换成 pass
+                alone = code[line_start:line_end].strip() == code[start:end].strip()
+                edits.append((line_start, line_end, "") if alone else (start, end, "pass"))
+            issues.append(Issue(node.lineno, "plt-close", "不允许顶层的 plt.close()", fixed=repair))
+
+
+def _check_hints(tree: ast.Module, issues: List[Issue]):
+    """只提示、不修改的规则"""
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = _dotted(node.func)
+        if func in ("print",):
+            text = " ".join(a.value for a in ast.walk(node) if isinstance(a, ast.Constant) and isinstance(a.value, str))
+            if CJK.search(text):
+                issues.append(Issue(node.lineno, "print-cjk", "print 里有中文（界面日志可能乱码）", WARNING))
+        elif func.rsplit(".", 1)[-1] in ("system", "run", "call", "check_call", "check_output", "Popen", "main"):
+            text = " ".join(str(a.value) for a in ast.walk(node) if isinstance(a, ast.Constant))
+            if "pip" in text and "install" in text:
+                issues.append(Issue(node.lineno, "pip", "代码里安装了包（缺的依赖在运行前检查，不需要）", WARNING))
+
+
+def _extract_fenced(code: str) -> Optional[str]:
+    blocks = FENCE.findall(code)
+    return max(blocks, key=len) if blocks else None
+
+
+# =====================================================
+# 入口
+# =====================================================
+def validate_code(code: str, files: Optional[List[str]] = None, cwd: Optional[str] = None,
+                  repair: bool = True) -> ValidationResult:
+    """检查（repair=True 时顺便修复）代码；files 为导入的文件列表，cwd 为脚本运行时的工作目录"""
+    files = list(files or [])
+    cwd = cwd or os.getcwd()
+    issues: List[Issue] = []
+
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError) as e:
+        fenced = _extract_fenced(code) if repair else None
+        if fenced is not None:
+            try:
+                tree = ast.parse(fenced)
+            except (SyntaxError, ValueError):
+                fenced = None
+        if fenced is None:
+            line = getattr(e, "lineno", 0) or 0
+            issues.append(Issue(line, "syntax", f"语法错误: {getattr(e, 'msg', e)}"))
+            return ValidationResult(code, issues)
+        issues.append(Issue(0, "syntax", "代码块外有多余的文字，只保留代码", fixed=True))
+        code = fenced
+
+    # 先修结构（main 判断、plt.close），重新解析后再查路径，两次修改的位置不会重叠；
+    # 去掉 main 判断后里面的代码到了顶层（例如判断里的 plt.close()），所以结构要重新查到没有修改为止
+    for _ in range(3):
+        before = code
+        code, tree = _repair(code, tree, issues, lambda c, st, t, e: _check_rules(c, st, t, issues, e, repair))
+        if code == before:
+            break
+    _check_hints(tree, issues)
+    code, tree = _repair(code, tree, issues,
+                         lambda c, st, t, e: _check_paths(c, st, t, files, cwd, issues, e, repair))
+    try:
+        compile(code, "<generated>", "exec")
+    except (SyntaxError, ValueError) as e:
+        # ast 能解析但编译不过（例如函数外的 return / yield）
+        issues.append(Issue(getattr(e, "lineno", 0) or 0, "syntax", f"语法错误: {getattr(e, 'msg', e)}"))
+    return ValidationResult(code, issues)
+
+
+def _repair(code: str, tree: ast.Module, issues: List[Issue], check) -> Tuple[str, ast.Module]:
+    """运行一项检查并应用它的修改；修改后解析不了时保留原代码，这一轮的问题改回没修复"""
+    n_before = len(issues)
+    edits: list = []
+    check(code, _offsets(code), tree, edits)
+    if not edits:
+        return code, tree
+    repaired = _apply_edits(code, edits)
+    try:
+        return repaired, ast.parse(repaired)
+    except (SyntaxError, ValueError):
+        for issue in issues[n_before:]:
+            issue.fixed = False
+        return code, tree
@@ -0,0 +1,210 @@
+"""
+本次会话的工作目录：运行的脚本、捕获的图片和输出都放在 ~/.dumbydraw/workspace 下，不再散落在系统临时目录。
+
+    ws = get_workspace()
+    run_dir = ws.new_run()                      # <会话>/run_0001/，写脚本、图片、输出
+    path = ws.new_file("kernel_", ".py")        # 单个文件
+    ws.update(run_dir)                          # 写完后更新大小和最近使用时间
+    ws.collect()                                # 垃圾回收，返回 (删掉的条目数, 释放的字节数)
+
+每个会话目录里有 index.json，记录各条目的大小、创建和最近使用时间，它的修改时间就是会话的心跳。垃圾回收：
+- 本会话的条目总大小超过上限时，按最近使用时间从早到晚删除（正在使用的不删）；
+- 别的会话心跳超过 STALE_HOURS 没有更新（程序已经退出或崩溃）时整个删除；
+- 顺便清理旧版本留在系统临时目录里的 dumbydraw_upgrade_* / dumbydraw_kernel_*。
+界面运行时每 GC_INTERVAL 秒在后台回收一次；退出时（atexit）删除本会话的目录。本模块只用标准库。
+"""
+import os
+import glob
+import json
+import time
+import atexit
+import shutil
+import asyncio
+import tempfile
+import itertools
+import threading
+
+from typing import Dict, Optional, Tuple
+
+from .config import data_path
+
+
+WORKSPACE_DIR = "workspace"
+INDEX = "index.json"
+DEFAULT_MAX_MB = 1024
+GC_INTERVAL = 600
+STALE_HOURS = 6
+# 旧版本直接用系统临时目录时留下的文件
+LEGACY_PATTERNS = ("dumbydraw_upgrade_*", "dumbydraw_kernel_*.py")
+
+
+def path_size(path: str) -> int:
+    """文件或整个目录的字节数"""
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    total = 0
+    for directory, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                continue
+    return total
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class Workspace:
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_MB * 1024 ** 2):
+        self.root = root or data_path(WORKSPACE_DIR)
+        self.max_bytes = max_bytes
+        self.session_dir = os.path.join(self.root, time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        # 条目名 -> {"size", "created", "used", "busy"}
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._closed = False
+        os.makedirs(self.session_dir, exist_ok=True)
+        self._save_index()
+
+    # ---------- 分配 ----------
+    def _register(self, name: str, busy: bool):
+        now = time.time()
+        with self._lock:
+            self.entries[name] = {"size": 0, "created": now, "used": now, "busy": busy}
+
+    def new_run(self, prefix: str = "run") -> str:
+        """新的运行目录；在 update(path) 之前算作正在使用，不会被回收"""
+        os.makedirs(self.session_dir, exist_ok=True)
+        while True:
+            name = f"{prefix}_{next(self._counter):04d}"
+            path = os.path.join(self.session_dir, name)
+            if not os.path.exists(path):
+                break
+        os.makedirs(path)
+        self._register(name, busy=True)
+        return path
+
+    def new_file(self, prefix: str = "", suffix: str = "") -> str:
+        """新的空文件（例如增量运行 kernel 反复覆盖的脚本），算作正在使用，直到 update(path, busy=False)"""
+        os.makedirs(self.session_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self.session_dir)
+        os.close(fd)
+        self._register(os.path.basename(path), busy=True)
+        return path
+
+    def update(self, path: str, busy: bool = False):
+        """写完以后更新大小和最近使用时间，顺便写心跳"""
+        name = os.path.basename(path)
+        size = path_size(path)
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return
+            entry.update(size=size, used=time.time(), busy=busy)
+        self._save_index()
+
+    def remove(self, path: str):
+        with self._lock:
+            self.entries.pop(os.path.basename(path), None)
+        _remove(path)
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(entry["size"] for entry in self.entries.values())
+
+    def _save_index(self):
+        with self._lock:
+            data = {"pid": os.getpid(), "heartbeat": time.time(), "entries": dict(self.entries)}
+        tmp = os.path.join(self.session_dir, INDEX + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, os.path.join(self.session_dir, INDEX))
+        except OSError:
+            pass
+
+    # ---------- 回收 ----------
+    def collect(self) -> Tuple[int, int]:
+        """按大小上限回收本会话的条目，删除过期的其它会话；返回 (删掉的条目数, 释放的字节数)"""
+        removed, freed = 0, 0
+        with self._lock:
+            entries = sorted(((e["used"], name, e["size"]) for name, e in self.entries.items() if not e["busy"]))
+            total = sum(e["size"] for e in self.entries.values())
+        for _used, name, size in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(os.path.join(self.session_dir, name))
+            total -= size
+            removed += 1
+            freed += size
+        if not self._closed:
+            self._save_index()
+
+        deadline = time.time() - STALE_HOURS * 3600
+        for entry in os.scandir(self.root) if os.path.isdir(self.root) else []:
+            if not entry.is_dir() or entry.path == self.session_dir:
+                continue
+            index = os.path.join(entry.path, INDEX)
+            try:
+                heartbeat = os.path.getmtime(index if os.path.exists(index) else entry.path)
+            except OSError:
+                continue
+            if heartbeat < deadline:
+                freed += path_size(entry.path)
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+
+        for pattern in LEGACY_PATTERNS:
+            for path in glob.glob(os.path.join(tempfile.gettempdir(), pattern)):
+                try:
+                    if os.path.getmtime(path) < deadline:
+                        freed += path_size(path)
+                        _remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed, freed
+
+    async def gc_loop(self, interval: float = GC_INTERVAL):
+        """在 engine 里定期回收（文件操作放进线程池）"""
+        loop = asyncio.get_event_loop()
+        while not self._closed:
+            await loop.run_in_executor(None, self.collect)
+            await asyncio.sleep(interval)
+
+    def close(self):
+        """退出时调用：删除本会话的目录，再回收一次过期的会话"""
+        if self._closed:
+            return
+        self._closed = True
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+        try:
+            self.collect()
+        except OSError:
+            pass
+
+
+_workspace: Optional[Workspace] = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace() -> Workspace:
+    """进程内共用的 Workspace，第一次使用时创建，并在退出时清理"""
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = Workspace()
+            atexit.register(_workspace.close)
+        return _workspace
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# 测试写的运行记录、缓存、token 等放进临时目录，不碰 ~/.dumbydraw（要在 import dumbydraw 之前设置）
+os.environ["DUMBYDRAW_HOME"] = tempfile.mkdtemp(prefix="dumbydraw_test_")
+os.environ.pop("DUMBYDRAW_BASE_URL", None)
@@ -0,0 +1,113 @@
+"""cache.ResultCache：命中、输入变了不命中、列目录 / 拼接路径的代码不缓存、按最近使用时间淘汰"""
+import os
+import time
+
+import pytest
+
+from dumbydraw.cache import ResultCache, dynamic_paths, fingerprint, referenced_paths
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 10_000
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def store(cache, key, inputs=None, output="done"):
+    cache.put(key, output, 0.5, [{"index": 1, "png": PNG}], [], inputs or {})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(root=str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / "data.csv"
+    write(path, "x,y\n1,2\n")
+    return str(path)
+
+
+def test_hit_when_code_and_inputs_unchanged(cache, data):
+    code = f"import pandas as pd\ndf = pd.read_csv({data!r})\nprint('done')\n"
+    key = cache.key(code, [data])
+    store(cache, key, fingerprint(referenced_paths(code)))
+
+    assert cache.key(code, [data]) == key
+    entry = cache.get(key)
+    assert entry["output"] == "done"
+    assert entry["figures"][0]["png"] == PNG
+    assert cache.key(code + "\n", [data]) != key
+
+
+def test_imported_input_change_changes_key(cache, data):
+    code = "print('done')\n"
+    key = cache.key(code, [data])
+    st = os.stat(data)
+    os.utime(data, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.key(code, [data]) != key
+
+    touched = cache.key(code, [data])
+    write(data, "x,y\n1,2\n3,4\n")
+    os.utime(data, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.key(code, [data]) != touched
+
+
+@pytest.mark.parametrize("change", ["mtime", "size"])
+def test_referenced_input_change_is_a_miss(cache, data, change):
+    code = f"open({data!r}).read()\n"
+    key = cache.key(code, [])
+    store(cache, key, fingerprint(referenced_paths(code)))
+
+    st = os.stat(data)
+    if change == "mtime":
+        os.utime(data, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    else:
+        write(data, "x,y\n1,2\n3,4\n")
+        os.utime(data, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert cache.get(key) is None
+    # 过期的条目直接删掉
+    assert not os.path.exists(os.path.join(cache.root, key))
+
+
+@pytest.mark.parametrize("code", [
+    "import glob\nfiles = glob.glob('/data/*.csv')\n",
+    "import os\nfor root, dirs, files in os.walk('/data'):\n    pass\n",
+    "import os\nnames = os.listdir('/data')\n",
+    "import os\npath = os.path.join(folder, name)\n",
+    "import pandas as pd\nfor i in range(3):\n    pd.read_csv(f'/data/part_{i}.csv')\n",
+    "path = '/data/%s.csv' % name\n",
+    "path = '/data/{}.csv'.format(name)\n",
+    "from pathlib import Path\npath = Path(folder) / 'x.csv'\n",
+])
+def test_dynamic_paths_bypass(code):
+    assert dynamic_paths(code)
+
+
+@pytest.mark.parametrize("code", [
+    "import pandas as pd\ndf = pd.read_csv('/data/a.csv')\nprint(f'mean {df.x.mean():.2f}')\n",
+    "import os\npath = os.path.join('/data', 'a.csv')\n",
+    "print(', '.join(columns))\n",
+])
+def test_literal_paths_are_cacheable(code):
+    assert not dynamic_paths(code)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(root=str(tmp_path / "cache"), max_bytes=10 ** 9)
+    now = time.time()
+    for n, key in enumerate(["old", "middle", "new"]):
+        store(cache, key)
+        os.utime(os.path.join(cache.root, key, "manifest.json"), (now - 100 + n, now - 100 + n))
+    # 读一次 "old"，它变成最近使用的
+    assert cache.get("old") is not None
+
+    per_entry = cache.size() // 3
+    cache.max_bytes = per_entry * 2 + per_entry // 2
+    cache.evict()
+    remaining = {os.path.basename(entry_dir) for _, _, entry_dir in cache.entries()}
+    assert remaining == {"old", "new"}
+    assert cache.size() <= cache.max_bytes
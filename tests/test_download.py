@@ -0,0 +1,121 @@
+"""download.download_file 对着本地的 ETag / Range HTTP 服务：断线续传、304、本地文件损坏后重新下载"""
+import os
+import asyncio
+import hashlib
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dumbydraw.download import DownloadError, download_file
+
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+ETAG = '"v1-' + hashlib.sha256(PAYLOAD).hexdigest()[:16] + '"'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """支持 If-None-Match、Range + If-Range；server.cut_at 设置时发到这么多字节就断开连接（只断一次）"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", ETAG) == ETAG:
+            start = int(range_header.split("=")[1].split("-")[0])
+        body = PAYLOAD[start:]
+        if start:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if server.cut_at is not None:
+            cut, server.cut_at = server.cut_at, None
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def file_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    server.requests = []
+    server.cut_at = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/main.zip"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def download(url, directory):
+    return asyncio.run(download_file(url, str(directory), "main.zip", timeout=10))
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_resume_after_connection_cut(file_server, tmp_path):
+    file_server.cut_at = 1024 * 1024
+    with pytest.raises(DownloadError):
+        download(file_server.url, tmp_path)
+    part = tmp_path / "main.zip.part"
+    kept = part.stat().st_size
+    assert 0 < kept < len(PAYLOAD)
+
+    result = download(file_server.url, tmp_path)
+    assert result.changed
+    assert result.resumed_from == kept
+    assert file_server.requests[-1]["Range"] == f"bytes={kept}-"
+    assert file_server.requests[-1]["If-Range"] == ETAG
+    assert read(result.path) == PAYLOAD
+    assert result.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert not part.exists()
+
+
+def test_not_modified_uses_local_file(file_server, tmp_path):
+    first = download(file_server.url, tmp_path)
+    assert first.changed
+
+    second = download(file_server.url, tmp_path)
+    assert not second.changed
+    assert file_server.requests[-1]["If-None-Match"] == ETAG
+    assert read(second.path) == PAYLOAD
+
+
+def test_corrupt_local_file_is_downloaded_again(file_server, tmp_path):
+    first = download(file_server.url, tmp_path)
+    with open(first.path, "r+b") as f:
+        f.seek(100)
+        f.write(b"corrupted")
+
+    result = download(file_server.url, tmp_path)
+    assert result.changed
+    # 第一次带条件得到 304，核对 sha256 不一致后不带条件重新下载
+    assert "If-None-Match" in file_server.requests[-2]
+    assert "If-None-Match" not in file_server.requests[-1]
+    assert read(result.path) == PAYLOAD
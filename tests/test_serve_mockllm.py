@@ -0,0 +1,47 @@
+"""端到端：dumbydraw serve 用 dumbydraw mock-llm 生成代码并运行，客户端通过 HTTP 取日志和结果"""
+import pytest
+import requests
+
+from dumbydraw.engine import get_engine
+from dumbydraw.mockllm import MockLLMServer
+from dumbydraw.server import JobServer, ServerClient
+
+
+@pytest.fixture
+def servers(tmp_path):
+    engine = get_engine()
+    mock = MockLLMServer(ttft=0.05, tps=2000)
+    mock_host, mock_port = engine.submit(mock.start(port=0)).result(10)
+    server = JobServer(f"http://{mock_host}:{mock_port}/v1", "mock-model", "x", workers=2,
+                       workdir=str(tmp_path / "serve"))
+    host, port = engine.submit(server.start(port=0)).result(10)
+    yield server, f"http://{host}:{port}", mock
+    engine.submit(server.stop()).result(10)
+    engine.submit(mock.stop()).result(10)
+
+
+def test_generate_and_run(servers):
+    server, url, mock = servers
+    client = ServerClient(url, token=server.token)
+
+    job_id = client.generate("画一条正弦曲线", run=True)
+    events = list(client.events(job_id))
+    assert events[-1] == ("end", '{"status": "done"}')
+    logs = [data for event, data in events if event == "log"]
+    assert "done" in logs
+
+    result = client.result(job_id)
+    assert result["status"] == "done"
+    assert result["returncode"] == 0
+    assert "np.sin" in result["code"]
+    assert result["figures"]
+    assert mock.stats["completed"] == 1
+
+
+def test_requests_need_the_token(servers):
+    server, url, _mock = servers
+    assert requests.get(url + "/health", timeout=10).status_code == 401
+    wrong = ServerClient(url, token="wrong")
+    with pytest.raises(requests.HTTPError):
+        wrong.run("print(1)")
+    assert ServerClient(url, token=server.token).health()["status"] == "ok"
@@ -0,0 +1,49 @@
+"""不认 stream_options 的兼容接口：第一次 400 后去掉参数重试，之后同一个接口的请求直接不带"""
+import asyncio
+
+import pytest
+
+from openai import BadRequestError
+
+from dumbydraw.deepseek import DeepSeek
+from dumbydraw.engine import get_engine
+from dumbydraw.mockllm import MockLLMServer
+
+
+@pytest.fixture
+def strict_llm():
+    engine = get_engine()
+    mock = MockLLMServer(recordings=[{"content": "```python\nprint(1)\n```"}],
+                         ttft=0.0, tps=0, reject_stream_options=True)
+    host, port = engine.submit(mock.start(port=0)).result(10)
+    yield mock, f"http://{host}:{port}/v1"
+    engine.submit(mock.stop()).result(10)
+
+
+def ask(base_url, query):
+    # generator 每次请求都新建 DeepSeek，这里也一样
+    client = DeepSeek(base_url, "x")
+    return asyncio.run(client.aget_response(query, model="mock-model", echo=False))
+
+
+def test_retry_without_stream_options_once_per_endpoint(strict_llm):
+    mock, base_url = strict_llm
+    assert "print(1)" in ask(base_url, "画图")
+    assert mock.stats["requests"] == 2
+
+    assert "print(1)" in ask(base_url, "再画一张")
+    assert "print(1)" in DeepSeek(base_url, "x").get_response("同步", model="mock-model")
+    assert mock.stats["requests"] == 4
+
+
+def test_other_bad_requests_are_not_retried():
+    # 接受 stream_options 的接口因为别的原因（例如提示词太长）返回 400：不重试
+    engine = get_engine()
+    mock = MockLLMServer(recordings=[{"match": "too long", "error": 400}], ttft=0.0, tps=0)
+    host, port = engine.submit(mock.start(port=0)).result(10)
+    try:
+        with pytest.raises(BadRequestError):
+            ask(f"http://{host}:{port}/v1", "prompt too long")
+        assert mock.stats["requests"] == 1
+    finally:
+        engine.submit(mock.stop()).result(10)